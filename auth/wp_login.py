@@ -1,14 +1,13 @@
 import sys
 import os
 # Add main project directory to path
-base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(base_dir)
 # Add config directory to path
 sys.path.append(os.path.join(base_dir, 'config'))
 
-import mysql.connector
 from mysql.connector import Error
-from config import SERVER_CONFIG
+from network.db_pool import get_pool
 import hashlib
 import logging
 
@@ -23,41 +22,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger('WP_LOGIN')
 
-def get_db_connection():
-    """Create and return a database connection"""
-    try:
-        connection = mysql.connector.connect(
-            host=SERVER_CONFIG['wp_db_host'],
-            user=SERVER_CONFIG['wp_db_user'],
-            password=SERVER_CONFIG['wp_db_password'],
-            database=SERVER_CONFIG['wp_db_name'],
-            port=SERVER_CONFIG['wp_db_port']
-        )
-        return connection
-    except Error as e:
-        logger.error(f"Database connection error: {e}")
-        return None
-
 def wp_login(username: str, password: str) -> dict:
     """
     Authenticate user against WordPress database
     Returns user data if successful, None otherwise
     """
-    connection = get_db_connection()
-    if not connection:
-        return None
-
     try:
-        cursor = connection.cursor(dictionary=True)
-        
         # Get user data
         query = """
             SELECT ID, user_login, user_pass, user_email, display_name 
             FROM wp_users 
             WHERE user_login = %s
         """
-        cursor.execute(query, (username,))
-        user = cursor.fetchone()
+        user = get_pool().query_one('wp_login', query, (username,))
         
         if not user:
             logger.debug(f"User not found: {username}")
@@ -79,10 +56,6 @@ def wp_login(username: str, password: str) -> dict:
     except Error as e:
         logger.error(f"Database query error: {e}")
         return None
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
 
 def verify_password(password: str, wp_hash: str) -> bool:
     """
@@ -3,7 +3,13 @@ DATABASE_CONFIG = {
     'db_host': 'localhost',
     'db_user': 'wp',
     'db_password': 'wp',
-    'db_name': 'wp'
+    'db_name': 'wp',
+    'db_port': 3306,
+    'charset': 'utf8mb4',
+    'connect_timeout': 10,
+    'pool_size': 20,      # connections per process, shared by every module
+    'pool_timeout': 10,   # seconds to wait for a free connection
+    'max_statements': 64  # prepared statements kept per connection
 }
 
 # Server configuration
@@ -11,20 +17,84 @@ SERVER_CONFIG = {
     'host': '127.0.0.1',
     'udp_port1': 50000,
     'udp_port2': 50001,
+    # Port pairs leased to matches; leases expire if a match is never ended.
+    # Kept clear of udp_port1/2, the shared pair used when the range runs out
+    'udp_port_range': (50002, 51001),
+    'udp_lease_timeout': 2 * 60 * 60,
     'tcp_port': 5739,
     'proxy_port': 5740,
+    'api_port': 5741,  # HTTP API; tcp_port belongs to the lobby protocol
     'max_players': 22,
+    'max_players_per_team': 11,
+    'io_engine': 'threaded',  # 'threaded' or 'asyncio'
+    # Graceful restart: the successor process restores this snapshot, clients
+    # get restart_drain_timeout seconds to move over and restored players
+    # restart_reconnect_grace seconds to reconnect before their slot is freed
+    'restart_snapshot_path': 'lobby_snapshot.json',
+    'restart_drain_timeout': 10,
+    'restart_reconnect_grace': 60,
+    # Worker mode: this many processes share the lobby port via SO_REUSEPORT
+    # and keep lobby and session state in one SQLite file
+    'workers': 1,
+    'lobby_store_path': 'lobby_state.db',
+    'worker_stats_interval': 2,
+    # Background monitoring samples for /api/status and /api/status/history:
+    # one every metrics_interval seconds, the last metrics_history kept
+    'metrics_interval': 5,
+    'metrics_history': 720,
+    # /api/admin/players and /api/admin/bans: rows per page by default and at most
+    'admin_page_size': 100,
+    'admin_max_page_size': 1000,
+    # /api/admin/logs: most lines one tail request returns, how long a
+    # follow=1 stream stays open and how many may be open at once
+    'log_tail_max_lines': 10000,
+    'log_follow_timeout': 300,
+    'log_max_followers': 8,
+    # HTTP API serving. 'production' handles connections on a fixed pool of
+    # threads with keep-alive, timeouts and a draining shutdown;
+    # 'development' is werkzeug's thread-per-request server
+    'api_server': {
+        'mode': 'production',
+        'threads': 16,
+        'backlog': 64,            # connections waiting for a thread before 503s
+        'request_timeout': 30,
+        'keepalive_timeout': 5,
+        'shutdown_timeout': 10
+    },
+    # /api/events: lobby, match and player counts pushed to Server-Sent Events
+    # subscribers at most once per interval seconds; unchanged streams get a
+    # keepalive comment. The production API server writes to all subscribers
+    # from one thread; the development one holds a thread per subscriber for
+    # at most timeout seconds, after which the browser reconnects
+    'event_stream': {
+        'interval': 1.0,
+        'keepalive': 15,
+        'max_subscribers': 1024,
+        'retry': 3000,            # reconnect delay suggested to clients, in ms
+        'timeout': 300
+    },
+    # Match changes are appended to <path>.journal and compacted into
+    # <path>.snapshot every match_compact_interval seconds; fsync each record
+    # to survive power loss as well as crashes
+    'match_compact_interval': 300,
+    'match_journal_fsync': False,
+    # 'journal' keeps matches in memory backed by the journal above; 'sqlite'
+    # keeps them in <path>.db with indexed status and player lookups
+    'match_store': 'journal',
+    # Journal store: matches ended more than match_archive_after seconds ago
+    # move to compressed <path>.archive.NNNN.z segments and leave memory
+    'match_archive_after': 24 * 60 * 60,
+    'match_archive_segment_size': 64 * 1024 * 1024,
     'positions': [
         'GK', 'LB', 'CB1', 'CB2', 'RB',
         'LM', 'CM1', 'CM2', 'RM',
         'ST1', 'ST2'
-    ],
-    # WordPress database configuration
-    'wp_db_host': 'localhost',
-    'wp_db_user': 'wp',
-    'wp_db_password': 'wp',
-    'wp_db_name': 'wp',
-    'wp_db_port': 3306
+    ]
+}
+
+# Matchmaking configuration
+MATCHMAKING_CONFIG = {
+    'default_lobby_id': 'default'  # Lobby used when join_lobby carries no lobby_id
 }
 
 # Network configuration
@@ -34,6 +104,41 @@ NETWORK_CONFIG = {
         'certfile': 'certs/server.crt',
         'keyfile': 'certs/server.key'
     },
+    # TCP message framing shared by the lobby, game and NetworkManager sockets
+    'framing': 'newline',  # 'newline' or 'length' (4-byte big-endian prefix)
+    'buffer_size': 65536,
+    'max_frame_size': 1024 * 1024,
+    # Bounded per-connection send queues; what to do when a client falls behind
+    'send_queue_size': 256,
+    'slow_consumer_policy': 'drop',  # 'drop', 'coalesce' or 'disconnect'
+    # Lobby admission control: concurrent connection cap, per-IP connection
+    # rate and per-connection message rate (tokens per second, burst size)
+    'max_connections': 1024,
+    'connect_rate_per_ip': 5,
+    'connect_burst_per_ip': 20,
+    'message_rate': 50,
+    'message_burst': 100,
+    # Idle connection reaper: connections that have not identified a player
+    # within handshake_timeout seconds, or sent nothing for idle_timeout
+    # seconds, are closed and their lobby place is freed. Players wait
+    # quietly in a lobby and older clients never 'ping', so lobby sessions
+    # use lobby_idle_timeout (0: never reaped for silence) and dead lobby
+    # peers are found by TCP keepalive probes instead: the first after
+    # keepalive_idle quiet seconds, then every keepalive_interval seconds,
+    # giving up after keepalive_count unanswered
+    'handshake_timeout': 30,
+    'idle_timeout': 300,
+    'lobby_idle_timeout': 0,
+    'keepalive_idle': 60,
+    'keepalive_interval': 10,
+    'keepalive_count': 5,
+    'reaper_tick': 1.0,
+    # The STUN and DNS servers run on their own and serve /metrics on these
+    # ports (0 disables); the lobby and game servers serve it on their APIs
+    'metrics_ports': {
+        'stun': 9478,
+        'dns': 9053
+    },
     'stun_servers': [
         'stun1.l.google.com:19302',
         'stun2.l.google.com:19302'
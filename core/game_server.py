@@ -19,10 +19,14 @@ import json
 import sys
 import time
 from typing import Dict, Optional
-from config import SERVER_CONFIG
+from config import SERVER_CONFIG, NETWORK_CONFIG
 from match_statistics import MatchStatistics
 from match_state import MatchStateManager
 from network_manager import NetworkManager
+from network.message_framing import FrameDecoder, FrameError
+from network.metrics_registry import CONTENT_TYPE, REGISTRY
+from network.timer_wheel import IdleReaper
+from network.wire_format import get_format, negotiate_first_message, wire_format_ack
 from match_coordinator import MatchCoordinator
 import ssl
 from datetime import datetime
@@ -39,6 +43,14 @@ logging.basicConfig(
 logging.getLogger().setLevel(logging.DEBUG)  # Ensure root logger is set to DEBUG
 logger = logging.getLogger('PES_GAME_SERVER')
 
+# Hot-path instrumentation, exported at /metrics
+GAME_CONNECTIONS = REGISTRY.counter('pes_game_connections_total', 'Game connections accepted').labels()
+GAME_ACCEPT_SECONDS = REGISTRY.histogram('pes_game_accept_seconds',
+                                         'Time to accept a game connection, TLS handshake included').labels()
+GAME_PARSE_SECONDS = REGISTRY.histogram('pes_game_parse_seconds', 'Time to decode one game message').labels()
+GAME_DISPATCH_SECONDS = REGISTRY.histogram('pes_game_dispatch_seconds', 'Time to handle one game message').labels()
+GAME_BROADCAST_SECONDS = REGISTRY.histogram('pes_game_broadcast_seconds', 'Time to broadcast a match state').labels()
+
 class GameServer:
     def __init__(self):
         self.matches = {}
@@ -53,6 +65,7 @@ class GameServer:
         self.app.add_url_rule('/login', 'login', self.handle_login, methods=['POST'])
         self.app.add_url_rule('/logout', 'logout', self.handle_logout, methods=['POST'])
         self.app.add_url_rule('/check_session', 'check_session', self.check_session, methods=['GET'])
+        self.app.add_url_rule('/metrics', 'metrics', self.get_metrics, methods=['GET'])
         
         logger.info("Game Server initializing...")
         
@@ -69,6 +82,17 @@ class GameServer:
         )
         self.context = self._setup_ssl_context()
         self.lobbies = {}
+        # Closes game connections from clients that crashed or went silent
+        self.reaper = IdleReaper(
+            self.reap_connection,
+            idle_timeout=NETWORK_CONFIG['idle_timeout'],
+            handshake_timeout=NETWORK_CONFIG['handshake_timeout'],
+            tick=NETWORK_CONFIG['reaper_tick'],
+            name='game-reaper'
+        )
+        REGISTRY.gauge('pes_game_connections', 'Open game connections').set_function(
+            lambda: self.reaper.stats()['tracked'])
+        REGISTRY.gauge('pes_game_matches', 'Matches on the game server').set_function(lambda: len(self.matches))
     
     def _setup_ssl_context(self):
         context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
@@ -181,41 +205,85 @@ class GameServer:
             
             # Start admin server thread
             threading.Thread(target=self.run_admin_server, daemon=True).start()
+            self.reaper.start()
             
             while True:
                 client, address = self.game_socket.accept()
+                accepted = time.perf_counter()
                 ssl_client = self.context.wrap_socket(client, server_side=True)
                 threading.Thread(target=self.handle_client, args=(ssl_client, address)).start()
+                GAME_CONNECTIONS.inc()
+                GAME_ACCEPT_SECONDS.observe(time.perf_counter() - accepted)
                 
         except Exception as e:
             logging.error(f"Server error: {e}")
             sys.exit(1)
             
     def handle_client(self, client, address):
+        decoder = FrameDecoder(
+            NETWORK_CONFIG['framing'],
+            buffer_size=NETWORK_CONFIG['buffer_size'],
+            max_frame_size=NETWORK_CONFIG['max_frame_size']
+        )
+        # JSON until the first message negotiates another wire format
+        wire = get_format('json', NETWORK_CONFIG['framing'])
+        negotiated = False
+        player = None  # (player_id, match_id) once the client names them
+        self.reaper.register(client)
         try:
             logger.info(f"Game connection from {address}")
-            while True:
-                data = client.recv(1024)
-                if not data:
-                    break
-                self.process_game_data(client, json.loads(data.decode()))
-                if b'TEAMPLAYLOBBY' in data:
-                    response = {
-                        'status': 'lobby_created',
-                        'lobby_id': len(self.lobbies) + 1,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                    response_json = json.dumps(response)
-                    client.send(('HTTP/1.1 200 OK\r\n'
-                                 'Content-Type: application/json\r\n'
-                                 'Access-Control-Allow-Origin: *\r\n'
-                                 'Content-Length: ' + str(len(response_json)) + '\r\n'
-                                 '\r\n' + response_json).encode('utf-8'))
+            while decoder.recv_from(client):
+                self.reaper.touch(client)
+                for frame in decoder.frames():
+                    data = frame.tobytes()
+                    started = time.perf_counter()
+                    message = wire.decode(data)
+                    GAME_PARSE_SECONDS.observe(time.perf_counter() - started)
+                    if player is None and isinstance(message, dict) and message.get('player_id') and message.get('match_id'):
+                        player = (message['player_id'], message['match_id'])
+                        self.reaper.established(client)
+                    if not negotiated:
+                        negotiated = True
+                        chosen = negotiate_first_message(message, NETWORK_CONFIG['framing'])
+                        if chosen:
+                            client.sendall(wire.encode(wire_format_ack(chosen)))
+                            wire = chosen
+                            decoder.switch_framing(wire.framing)
+                            if message.get('type') == 'wire_format':
+                                continue
+                    with GAME_DISPATCH_SECONDS.time():
+                        self.process_game_data(client, message)
+                    if b'TEAMPLAYLOBBY' in data:
+                        response = {
+                            'status': 'lobby_created',
+                            'lobby_id': len(self.lobbies) + 1,
+                            'timestamp': datetime.now().isoformat()
+                        }
+                        response_json = json.dumps(response)
+                        client.send(('HTTP/1.1 200 OK\r\n'
+                                     'Content-Type: application/json\r\n'
+                                     'Access-Control-Allow-Origin: *\r\n'
+                                     'Content-Length: ' + str(len(response_json)) + '\r\n'
+                                     '\r\n' + response_json).encode('utf-8'))
+        except FrameError as e:
+            logging.warning(f"Dropping game client {address}: {e}")
         except Exception as e:
             logging.error(f"Client error {address}: {e}")
         finally:
+            self.reaper.unregister(client)
+            if player:
+                # Frees the position; the player can take it back with handle_reconnect
+                self.handle_disconnect(*player)
             client.close()
 
+    def reap_connection(self, client, idle):
+        """Unblock the reader of a connection the reaper found idle so it cleans up"""
+        logging.warning(f"Closing game connection idle for {idle:.0f}s")
+        try:
+            client.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
     def process_game_data(self, client, data):
         try:
             match_id = data.get('match_id')
@@ -340,11 +408,12 @@ class GameServer:
 
     def broadcast_match_state(self, match_id: str):
         if match_id in self.match_states:
-            self.network.broadcast({
-                'type': 'match_state_update',
-                'match_id': match_id,
-                'state': self.match_states[match_id].get_state_summary()
-            })
+            with GAME_BROADCAST_SECONDS.time():
+                self.network.broadcast({
+                    'type': 'match_state_update',
+                    'match_id': match_id,
+                    'state': self.match_states[match_id].get_state_summary()
+                })
 
     def finish_match(self, match_id: str):
         if match_id in self.matches:
@@ -435,6 +504,9 @@ class GameServer:
                 })
         return jsonify({'authenticated': False}), 401
 
+    def get_metrics(self):
+        return make_response(REGISTRY.render(), 200, {'Content-Type': CONTENT_TYPE})
+
     def run_admin_server(self):
         """Run the admin server to handle status requests"""
         while True:
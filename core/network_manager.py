@@ -8,20 +8,25 @@ sys.path.append(os.path.join(base_dir, 'config'))
 
 import socket
 import threading
-import json
 import logging
 from typing import Dict, Callable, Optional
 from config import NETWORK_CONFIG
+from network.message_framing import FrameDecoder, FrameError
+from network.outbound_queue import OutboundStats, QueuedConnection, SendPump
+from network.wire_format import get_format, negotiate_first_message, wire_format_ack
 
 class NetworkManager:
     def __init__(self, host: str, port: int, error_handler: Optional[Callable] = None):
         self.host = host
         self.port = port
-        self.clients: Dict[str, socket.socket] = {}
+        self.clients: Dict[str, QueuedConnection] = {}
         self.handlers = {}
         self.error_handler = error_handler
         self.logger = logging.getLogger('network_manager')
         self.running = True
+        self.outbound_stats = OutboundStats()
+        self.send_pump = SendPump('network-send-pump')
+        self.wire = get_format('json', NETWORK_CONFIG['framing'])  # until a client negotiates another
         
     def start(self):
         """Start the network manager and listen for connections"""
@@ -36,7 +41,14 @@ class NetworkManager:
                 try:
                     client, address = self.server_socket.accept()
                     client_id = self.generate_client_id(address)
-                    self.clients[client_id] = client
+                    self.clients[client_id] = QueuedConnection(
+                        client,
+                        self.send_pump,
+                        NETWORK_CONFIG['send_queue_size'],
+                        NETWORK_CONFIG['slow_consumer_policy'],
+                        self.outbound_stats,
+                        name=client_id
+                    )
                     threading.Thread(target=self.handle_client, 
                                   args=(client_id, client)).start()
                 except Exception as e:
@@ -52,24 +64,54 @@ class NetworkManager:
         
     def handle_client(self, client_id: str, client: socket.socket):
         """Handle individual client connections"""
+        decoder = FrameDecoder(
+            NETWORK_CONFIG['framing'],
+            buffer_size=NETWORK_CONFIG['buffer_size'],
+            max_frame_size=NETWORK_CONFIG['max_frame_size']
+        )
+        connection = self.clients.get(client_id, client)
+        negotiated = False
         while self.running:
             try:
-                data = client.recv(NETWORK_CONFIG['buffer_size'])
-                if not data:
+                if not decoder.recv_from(client):
                     break
                     
-                message = json.loads(data.decode())
-                if 'type' in message and message['type'] in self.handlers:
-                    self.handlers[message['type']](message, client)
+                for frame in decoder.frames():
+                    try:
+                        message = (getattr(connection, 'wire', None) or self.wire).decode(frame)
+                    except ValueError:
+                        self.logger.error(f"Invalid message from client {client_id}")
+                        continue
+                    if not negotiated:
+                        negotiated = True
+                        if self.negotiate_wire_format(connection, decoder, message):
+                            continue
+                    if isinstance(message, dict) and message.get('type') in self.handlers:
+                        self.handlers[message['type']](message, connection)
                     
-            except json.JSONDecodeError:
-                self.logger.error(f"Invalid JSON from client {client_id}")
+            except FrameError as e:
+                self.logger.error(f"Invalid frame from client {client_id}: {e}")
+                break
             except Exception as e:
                 self.logger.error(f"Error handling client {client_id}: {e}")
                 break
                 
         self.disconnect_client(client_id)
         
+    def negotiate_wire_format(self, connection, decoder: FrameDecoder, message) -> bool:
+        """Switch a connection to the wire format its first message asked for.
+
+        Returns True if the message carried nothing but the negotiation.
+        """
+        wire = negotiate_first_message(message, NETWORK_CONFIG['framing'])
+        if wire is None:
+            return False
+        connection.send(self.wire.encode(wire_format_ack(wire)))
+        connection.wire = wire
+        decoder.switch_framing(wire.framing)
+        self.logger.info(f"Client {connection.name} uses the {wire.name} wire format")
+        return message.get('type') == 'wire_format'
+
     def disconnect_client(self, client_id: str):
         """Clean up disconnected client"""
         if client_id in self.clients:
@@ -86,11 +128,15 @@ class NetworkManager:
         
     def broadcast(self, message: dict, exclude_client=None):
         """Broadcast message to all connected clients"""
-        encoded_message = json.dumps(message).encode()
-        for client_id, client in self.clients.items():
-            if client != exclude_client:
+        # Serialized once per wire format; each client's queue is drained by the send pump
+        encoded = {}
+        for client_id, client in list(self.clients.items()):
+            if client is not exclude_client and client.sock is not exclude_client:
+                wire = client.wire or self.wire
                 try:
-                    client.send(encoded_message)
+                    if wire not in encoded:
+                        encoded[wire] = wire.encode(message)
+                    client.send(encoded[wire], message.get('type'))
                 except Exception as e:
                     self.logger.error(f"Failed to send to client {client_id}: {e}")
                     self.disconnect_client(client_id)
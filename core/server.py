@@ -10,8 +10,14 @@ sys.path.append(os.path.join(base_dir, 'auth'))
 import mysql.connector
 from flask import Flask, jsonify, request
 from flask_cors import CORS
+import argparse
 import logging
 import datetime
+import signal
+import threading
+from config import SERVER_CONFIG
+from network.db_pool import get_pool
+from network.wsgi_server import SERVER_MODES, create_wsgi_server
 from process_manager import ProcessManager
 
 def create_app():
@@ -54,14 +60,16 @@ def create_app():
     
     return app
 
-# Initialize process manager
-process_manager = ProcessManager()
+def start_processes():
+    # Initialize process manager
+    process_manager = ProcessManager()
 
-# Start required processes
-process_manager.start_process('wp_login', 'python auth/wp_login.py')
-process_manager.start_process('game_server', 'python core/game_server.py') 
-process_manager.start_process('network_manager', 'python core/network_manager.py')
-process_manager.start_process('lobby_manager', 'python game/lobby_manager.py')
+    # Start required processes
+    process_manager.start_process('wp_login', 'python auth/wp_login.py')
+    process_manager.start_process('game_server', 'python core/game_server.py') 
+    process_manager.start_process('network_manager', 'python core/network_manager.py')
+    process_manager.start_process('lobby_manager', 'python game/lobby_manager.py')
+    return process_manager
 
 app = create_app()
 
@@ -78,20 +86,15 @@ logger = logging.getLogger(__name__)
 
 def get_db_connection():
     try:
-        db = mysql.connector.connect(
-            host="localhost",
-            user="wp",
-            password="wp",
-            database="wp"
-        )
-        cursor = db.cursor()
-        cursor.execute("SHOW TABLES LIKE 'players'")
-        if not cursor.fetchone():
+        db = get_pool()
+        tables = db.query('tables', "SELECT table_name AS name FROM information_schema.tables "
+                          "WHERE table_schema = DATABASE() AND table_name IN ('players', 'matches')")
+        found = {table['name'] for table in tables}
+        if 'players' not in found:
             logger.error("Players table does not exist")
             return None
             
-        cursor.execute("SHOW TABLES LIKE 'matches'")
-        if not cursor.fetchone():
+        if 'matches' not in found:
             logger.error("Matches table does not exist")
             return None
             
@@ -111,15 +114,12 @@ def admin_status():
         return jsonify({'error': 'Database connection failed'}), 500
         
     try:
-        cursor = db.cursor(dictionary=True)
-        cursor.execute("SELECT COUNT(*) as total_players FROM players")
-        result = cursor.fetchone()
+        result = db.query_one('player_count', "SELECT COUNT(*) as total_players FROM players")
         if not result or 'total_players' not in result:
             return jsonify({'error': 'Invalid players count result'}), 500
         total_players = result['total_players']
         
-        cursor.execute("SELECT COUNT(*) as active_matches FROM matches")
-        result = cursor.fetchone()
+        result = db.query_one('match_count', "SELECT COUNT(*) as active_matches FROM matches")
         if not result or 'active_matches' not in result:
             return jsonify({'error': 'Invalid matches count result'}), 500
         active_matches = result['active_matches']
@@ -135,9 +135,6 @@ def admin_status():
     except Exception as e:
         logger.error(f"Unexpected error in admin_status: {e}")
         return jsonify({'error': str(e)}), 500
-    finally:
-        if db:
-            db.close()
 
 @app.route('/api/game/connect/', methods=['POST'])
 def game_connect():
@@ -171,4 +168,18 @@ def debug_routes():
     return jsonify(routes)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5739)
+    parser = argparse.ArgumentParser(description='PES server API')
+    parser.add_argument('--api-server', choices=SERVER_MODES, default=SERVER_CONFIG['api_server']['mode'],
+                        help="How to serve the API (defaults to SERVER_CONFIG['api_server']['mode'])")
+    args = parser.parse_args()
+    process_manager = start_processes()
+    server = create_wsgi_server('0.0.0.0', 5739, app, args.api_server, SERVER_CONFIG['api_server'])
+    # shutdown() waits for serve_forever() to return, so it cannot run in the signal handler itself
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    logger.info(f"Serving the API on 0.0.0.0:5739 ({args.api_server} mode)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,5 +1,6 @@
 import logging
-from typing import Dict
+import threading
+from typing import Dict, List, Optional
 from config import SERVER_CONFIG
 from lobby_room import LobbyRoom
 
@@ -8,6 +9,7 @@ class LobbyManager:
         self.logger = logging.getLogger('lobby_manager')
         self.active_lobbies: Dict[str, LobbyRoom] = {}
         self.lobby_timeouts = {}
+        self.lock = threading.Lock()
         
     def create_lobby(self, lobby_id: str, lobby_name: str, match_coordinator) -> LobbyRoom:
         lobby = LobbyRoom(
@@ -16,19 +18,64 @@ class LobbyManager:
             max_players=SERVER_CONFIG['max_players'],
             match_coordinator=match_coordinator
         )
-        self.active_lobbies[lobby_id] = lobby
+        with self.lock:
+            self.active_lobbies[lobby_id] = lobby
         self.logger.info(f"Created lobby: {lobby_name} (ID: {lobby_id})")
         return lobby
         
+    def join_lobby(self, lobby_id: str, player_id: str, player_data, match_coordinator) -> Optional[LobbyRoom]:
+        """Add a player to a lobby, creating the lobby on first use. Returns None if it is full."""
+        with self.lock:
+            lobby = self.active_lobbies.get(lobby_id)
+            if lobby is None:
+                lobby = LobbyRoom(
+                    lobby_id=lobby_id,
+                    room_name=lobby_id,
+                    max_players=SERVER_CONFIG['max_players'],
+                    match_coordinator=match_coordinator
+                )
+                self.active_lobbies[lobby_id] = lobby
+                self.logger.info(f"Created lobby {lobby_id}")
+            if player_id in lobby.players or lobby.add_player(player_id, player_data, None):
+                return lobby
+            return None
+        
     def remove_lobby(self, lobby_id: str):
-        if lobby_id in self.active_lobbies:
-            del self.active_lobbies[lobby_id]
-            self.logger.info(f"Removed lobby {lobby_id}")
+        with self.lock:
+            if lobby_id in self.active_lobbies:
+                del self.active_lobbies[lobby_id]
+                self.logger.info(f"Removed lobby {lobby_id}")
+            
+    def remove_lobby_if_empty(self, lobby_id: str) -> bool:
+        with self.lock:
+            lobby = self.active_lobbies.get(lobby_id)
+            if lobby is not None and not lobby.players:
+                del self.active_lobbies[lobby_id]
+                self.logger.info(f"Removed empty lobby {lobby_id}")
+                return True
+            return False
             
+    def snapshot(self) -> List[Dict]:
+        with self.lock:
+            lobbies = list(self.active_lobbies.values())
+        return [lobby.snapshot() for lobby in lobbies]
+
+    def restore(self, states: List[Dict], match_coordinator):
+        """Load lobbies handed over by the previous server process"""
+        with self.lock:
+            for state in states:
+                self.active_lobbies[state['lobby_id']] = LobbyRoom.restore(state, match_coordinator)
+        self.logger.info(f"Restored {len(states)} lobbies")
+
     def get_lobby(self, lobby_id: str) -> LobbyRoom:
         return self.active_lobbies.get(lobby_id)
         
+    def lobby_count(self) -> int:
+        return len(self.active_lobbies)
+
     def list_lobbies(self) -> Dict[str, Dict]:
+        with self.lock:
+            lobbies = list(self.active_lobbies.items())
         return {
             lobby_id: {
                 'name': lobby.room_name,
@@ -36,5 +83,5 @@ class LobbyManager:
                 'max_players': lobby.max_players,
                 'status': lobby.status
             }
-            for lobby_id, lobby in self.active_lobbies.items()
+            for lobby_id, lobby in lobbies
         }
@@ -0,0 +1,293 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+class SQLiteLobbyStore:
+    """Lobby and session state shared by the worker processes of one server.
+
+    Every worker opens the same SQLite file (WAL mode) and keeps one
+    connection per thread. Position claims are made atomic by the primary key
+    on (lobby_id, team, position) plus a UNIQUE player_id, so two workers can
+    never hand out the same position or give one player two positions.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS sessions (
+            player_id TEXT PRIMARY KEY,
+            worker_id INTEGER NOT NULL,
+            connected_at REAL NOT NULL)""",
+        """CREATE TABLE IF NOT EXISTS lobby_players (
+            player_id TEXT PRIMARY KEY,
+            lobby_id TEXT NOT NULL,
+            joined_at REAL NOT NULL)""",
+        "CREATE INDEX IF NOT EXISTS lobby_players_lobby ON lobby_players (lobby_id)",
+        """CREATE TABLE IF NOT EXISTS lobby_positions (
+            lobby_id TEXT NOT NULL,
+            team TEXT NOT NULL,
+            position TEXT NOT NULL,
+            player_id TEXT NOT NULL UNIQUE,
+            PRIMARY KEY (lobby_id, team, position))""",
+        """CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            worker_id INTEGER NOT NULL,
+            player_id TEXT NOT NULL,
+            payload TEXT NOT NULL)""",
+        "CREATE INDEX IF NOT EXISTS outbox_worker ON outbox (worker_id, id)",
+        "CREATE TABLE IF NOT EXISTS match_ids (id INTEGER PRIMARY KEY AUTOINCREMENT)",
+        """CREATE TABLE IF NOT EXISTS worker_stats (
+            worker_id INTEGER PRIMARY KEY,
+            pid INTEGER NOT NULL,
+            stats TEXT NOT NULL,
+            updated_at REAL NOT NULL)"""
+    )
+    STATE_TABLES = ('sessions', 'lobby_players', 'lobby_positions', 'outbox', 'worker_stats')
+
+    def __init__(self, path: str, worker_id: int, max_players: int):
+        self.path = path
+        self.worker_id = worker_id
+        self.max_players = max_players
+        self.logger = logging.getLogger(f'lobby_store_{worker_id}')
+        self._local = threading.local()
+
+    @classmethod
+    def initialize(cls, path: str):
+        """Create the schema and clear state left by a previous run; call before forking workers"""
+        db = sqlite3.connect(path)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            for statement in cls.SCHEMA:
+                db.execute(statement)
+            for table in cls.STATE_TABLES:
+                db.execute(f"DELETE FROM {table}")
+            db.commit()
+        finally:
+            db.close()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Autocommit mode; write transactions are opened with BEGIN IMMEDIATE
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _transaction(self):
+        return _Transaction(self.db)
+
+    def reset_worker(self):
+        """Forget the sessions of a worker that is (re)starting, with their lobby places"""
+        with self._transaction() as db:
+            players = [row[0] for row in db.execute(
+                "SELECT player_id FROM sessions WHERE worker_id = ?", (self.worker_id,))]
+            for player_id in players:
+                db.execute("DELETE FROM lobby_positions WHERE player_id = ?", (player_id,))
+                db.execute("DELETE FROM lobby_players WHERE player_id = ?", (player_id,))
+            db.execute("DELETE FROM sessions WHERE worker_id = ?", (self.worker_id,))
+            db.execute("DELETE FROM outbox WHERE worker_id = ?", (self.worker_id,))
+        if players:
+            self.logger.warning(f"Dropped {len(players)} sessions left by a previous worker {self.worker_id}")
+
+    def register_session(self, player_id: str):
+        """Record that player_id is connected to this worker"""
+        self.db.execute(
+            "INSERT OR REPLACE INTO sessions (player_id, worker_id, connected_at) VALUES (?, ?, ?)",
+            (player_id, self.worker_id, time.time()))
+
+    def drop_session(self, player_id: str):
+        self.db.execute("DELETE FROM sessions WHERE player_id = ? AND worker_id = ?", (player_id, self.worker_id))
+
+    def join(self, lobby_id: str, player_id: str) -> bool:
+        """Add a player to a lobby. Returns False if the lobby is full."""
+        with self._transaction() as db:
+            row = db.execute("SELECT lobby_id FROM lobby_players WHERE player_id = ?", (player_id,)).fetchone()
+            if row and row[0] == lobby_id:
+                return True
+            (count,) = db.execute("SELECT COUNT(*) FROM lobby_players WHERE lobby_id = ?", (lobby_id,)).fetchone()
+            if count >= self.max_players:
+                return False
+            db.execute("DELETE FROM lobby_positions WHERE player_id = ?", (player_id,))
+            db.execute("INSERT OR REPLACE INTO lobby_players (player_id, lobby_id, joined_at) VALUES (?, ?, ?)",
+                       (player_id, lobby_id, time.time()))
+            return True
+
+    def leave(self, player_id: str) -> bool:
+        with self._transaction() as db:
+            db.execute("DELETE FROM lobby_positions WHERE player_id = ?", (player_id,))
+            return db.execute("DELETE FROM lobby_players WHERE player_id = ?", (player_id,)).rowcount > 0
+
+    def has_player(self, lobby_id: str, player_id: str) -> bool:
+        row = self.db.execute("SELECT 1 FROM lobby_players WHERE player_id = ? AND lobby_id = ?",
+                              (player_id, lobby_id)).fetchone()
+        return row is not None
+
+    def lobby_players(self, lobby_id: str) -> List[str]:
+        return [row[0] for row in self.db.execute(
+            "SELECT player_id FROM lobby_players WHERE lobby_id = ? ORDER BY joined_at", (lobby_id,))]
+
+    def lobby_positions(self, lobby_id: str) -> Dict[str, Dict[str, str]]:
+        positions = {'home': {}, 'away': {}}
+        for team, position, player_id in self.db.execute(
+                "SELECT team, position, player_id FROM lobby_positions WHERE lobby_id = ?", (lobby_id,)):
+            positions.setdefault(team, {})[position] = player_id
+        return positions
+
+    def claim_position(self, lobby_id: str, player_id: str, team: str, position: str) -> bool:
+        """Claim a free position; the table constraints settle races between workers"""
+        try:
+            with self._transaction() as db:
+                if not db.execute("SELECT 1 FROM lobby_players WHERE player_id = ? AND lobby_id = ?",
+                                  (player_id, lobby_id)).fetchone():
+                    return False
+                db.execute("DELETE FROM lobby_positions WHERE player_id = ?", (player_id,))
+                db.execute("INSERT INTO lobby_positions (lobby_id, team, position, player_id) VALUES (?, ?, ?, ?)",
+                           (lobby_id, team, position, player_id))
+                return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def release_position(self, player_id: str) -> bool:
+        return self.db.execute("DELETE FROM lobby_positions WHERE player_id = ?", (player_id,)).rowcount > 0
+
+    def take_lineups(self, lobby_id: str, positions: List[str]) -> Optional[Dict[str, Dict[str, str]]]:
+        """Atomically hand over both lineups once every position is filled"""
+        with self._transaction() as db:
+            lineups = {'home': {}, 'away': {}}
+            for team, position, player_id in db.execute(
+                    "SELECT team, position, player_id FROM lobby_positions WHERE lobby_id = ?", (lobby_id,)):
+                lineups.setdefault(team, {})[position] = player_id
+            for team_positions in lineups.values():
+                if not all(pos in team_positions for pos in positions):
+                    return None
+            for team_positions in lineups.values():
+                for player_id in team_positions.values():
+                    db.execute("DELETE FROM lobby_positions WHERE player_id = ?", (player_id,))
+                    db.execute("DELETE FROM lobby_players WHERE player_id = ?", (player_id,))
+            return lineups
+
+    def list_lobbies(self) -> Dict[str, Dict]:
+        return {
+            lobby_id: {
+                'name': lobby_id,
+                'players': players,
+                'max_players': self.max_players,
+                'status': 'waiting'
+            }
+            for lobby_id, players in self.db.execute(
+                "SELECT lobby_id, COUNT(*) FROM lobby_players GROUP BY lobby_id")
+        }
+
+    def lobby_count(self) -> int:
+        return self.db.execute("SELECT COUNT(DISTINCT lobby_id) FROM lobby_players").fetchone()[0]
+
+    def next_match_id(self) -> int:
+        """Match ids unique across workers"""
+        return self.db.execute("INSERT INTO match_ids DEFAULT VALUES").lastrowid
+
+    def post(self, player_id: str, message: Dict) -> bool:
+        """Queue a message for a player connected to another worker"""
+        row = self.db.execute("SELECT worker_id FROM sessions WHERE player_id = ?", (player_id,)).fetchone()
+        if row is None or row[0] == self.worker_id:
+            return False
+        self.db.execute("INSERT INTO outbox (worker_id, player_id, payload) VALUES (?, ?, ?)",
+                        (row[0], player_id, json.dumps(message)))
+        return True
+
+    def fetch_outbox(self) -> List[Tuple[str, Dict]]:
+        """Take every message other workers queued for this worker's players"""
+        with self._transaction() as db:
+            rows = db.execute("SELECT id, player_id, payload FROM outbox WHERE worker_id = ? ORDER BY id",
+                              (self.worker_id,)).fetchall()
+            if rows:
+                db.execute("DELETE FROM outbox WHERE worker_id = ? AND id <= ?", (self.worker_id, rows[-1][0]))
+        return [(player_id, json.loads(payload)) for _, player_id, payload in rows]
+
+    def report_stats(self, stats: Dict):
+        self.db.execute(
+            "INSERT OR REPLACE INTO worker_stats (worker_id, pid, stats, updated_at) VALUES (?, ?, ?, ?)",
+            (self.worker_id, os.getpid(), json.dumps(stats), time.time()))
+
+    def worker_stats(self) -> List[Dict]:
+        return [
+            {'worker_id': worker_id, 'pid': pid, 'updated_at': updated_at, **json.loads(stats)}
+            for worker_id, pid, stats, updated_at in self.db.execute(
+                "SELECT worker_id, pid, stats, updated_at FROM worker_stats ORDER BY worker_id")
+        ]
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises"""
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+class SharedLobby:
+    """LobbyRoom look-alike whose state lives in a SQLiteLobbyStore"""
+
+    def __init__(self, store: SQLiteLobbyStore, lobby_id: str):
+        self.store = store
+        self.lobby_id = lobby_id
+
+    @property
+    def players(self) -> Dict[str, Dict]:
+        return {player_id: {} for player_id in self.store.lobby_players(self.lobby_id)}
+
+    @property
+    def positions(self) -> Dict[str, Dict[str, str]]:
+        return self.store.lobby_positions(self.lobby_id)
+
+    def has_player(self, player_id: str) -> bool:
+        return self.store.has_player(self.lobby_id, player_id)
+
+    def set_player_data(self, player_id: str, player_data) -> bool:
+        # Connections are process-local; the server keeps them in its own indexes
+        return self.has_player(player_id)
+
+    def claim_position(self, player_id: str, team: str, position: str) -> bool:
+        return self.store.claim_position(self.lobby_id, player_id, team, position)
+
+    def release_position(self, player_id: str) -> bool:
+        return self.store.release_position(player_id)
+
+    def remove_player(self, player_id: str) -> bool:
+        return self.store.leave(player_id)
+
+    def take_lineups(self, positions: List[str]) -> Optional[Dict[str, Dict[str, str]]]:
+        return self.store.take_lineups(self.lobby_id, positions)
+
+class SharedLobbyManager:
+    """LobbyManager counterpart for worker mode, backed by a SQLiteLobbyStore"""
+
+    def __init__(self, store: SQLiteLobbyStore):
+        self.store = store
+
+    def join_lobby(self, lobby_id: str, player_id: str, player_data, match_coordinator) -> Optional[SharedLobby]:
+        if self.store.join(lobby_id, player_id):
+            return SharedLobby(self.store, lobby_id)
+        return None
+
+    def get_lobby(self, lobby_id: str) -> Optional[SharedLobby]:
+        # A shared lobby exists for as long as it has players
+        if lobby_id is None or not self.store.lobby_players(lobby_id):
+            return None
+        return SharedLobby(self.store, lobby_id)
+
+    def remove_lobby_if_empty(self, lobby_id: str) -> bool:
+        return not self.store.lobby_players(lobby_id)
+
+    def list_lobbies(self) -> Dict[str, Dict]:
+        return self.store.list_lobbies()
+
+    def lobby_count(self) -> int:
+        return self.store.lobby_count()
@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Optional, Tuple
+
+class MatchArchive:
+    """Append-only, zlib-compressed store for finished matches.
+
+    Each match is compressed on its own and appended to the current segment
+    file. A fixed-size index record (match_id, segment, offset, length) is
+    appended to the index file. The index is loaded into a dict at startup,
+    so a lookup is one seek and one read. Segments are never rewritten. A new
+    one is started once the current segment reaches segment_size bytes.
+    """
+
+    INDEX_RECORD = struct.Struct('>qIQI')  # match_id, segment, offset, length
+
+    def __init__(self, path: str, segment_size: int = 64 * 1024 * 1024):
+        self.path = path
+        self.segment_size = segment_size
+        self.index_path = f"{path}.archive.index"
+        self.logger = logging.getLogger('match_archive')
+        self.lock = threading.Lock()
+        self.index: Dict[int, Tuple[int, int, int]] = {}  # match_id -> (segment, offset, length)
+        self.segment = 0
+        self.load_index()
+
+    def segment_path(self, segment: int) -> str:
+        return f"{self.path}.archive.{segment:04d}.z"
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'rb') as f:
+            data = f.read()
+        size = self.INDEX_RECORD.size
+        usable = len(data) - len(data) % size
+        if usable != len(data):
+            # A record torn by a crash; its match is still in the journal and gets archived again
+            with open(self.index_path, 'r+b') as f:
+                f.truncate(usable)
+        for match_id, segment, offset, length in self.INDEX_RECORD.iter_unpack(data[:usable]):
+            self.index[match_id] = (segment, offset, length)
+            self.segment = max(self.segment, segment)
+        self.logger.info(f"Match archive holds {len(self.index)} matches in {self.segment + 1} segments")
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, match_id):
+        return match_id in self.index
+
+    def append(self, matches: Dict[int, Dict]):
+        """Archive a batch of matches; durable on disk once this returns"""
+        with self.lock:
+            segment_path = self.segment_path(self.segment)
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) >= self.segment_size:
+                self.segment += 1
+                segment_path = self.segment_path(self.segment)
+            entries = []
+            with open(segment_path, 'ab') as segment:
+                for match_id, match in matches.items():
+                    blob = zlib.compress(json.dumps(match, separators=(',', ':')).encode())
+                    entries.append((match_id, self.segment, segment.tell(), len(blob)))
+                    segment.write(blob)
+                segment.flush()
+                os.fsync(segment.fileno())
+            # The index is written after the data it points to
+            with open(self.index_path, 'ab') as index:
+                index.write(b''.join(self.INDEX_RECORD.pack(*entry) for entry in entries))
+                index.flush()
+                os.fsync(index.fileno())
+            for match_id, segment, offset, length in entries:
+                self.index[match_id] = (segment, offset, length)
+
+    def get(self, match_id) -> Optional[Dict]:
+        entry = self.index.get(match_id)
+        if entry is None:
+            return None
+        segment, offset, length = entry
+        try:
+            with open(self.segment_path(segment), 'rb') as f:
+                f.seek(offset)
+                return json.loads(zlib.decompress(f.read(length)))
+        except (OSError, ValueError, zlib.error) as e:
+            self.logger.error(f"Cannot read archived match {match_id}: {e}")
+            return None
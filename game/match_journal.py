@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+class MatchJournal:
+    """Append-only log of match changes plus a periodically compacted snapshot.
+
+    Every change is appended as one JSON line carrying a sequence number. On
+    compaction the live journal is set aside, the state is written to the
+    snapshot (recording the last sequence number it contains) and the set
+    aside journal is deleted. Startup loads the snapshot and replays only the
+    records written after it.
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.journal_path = f"{path}.journal"
+        self.compacting_path = f"{path}.journal.compacting"  # set aside while a snapshot is written
+        self.snapshot_path = f"{path}.snapshot"
+        self.fsync = fsync
+        self.logger = logging.getLogger('match_journal')
+        self.seq = 0
+        self.pending = 0  # records appended since the last compaction
+        self.fd = None
+
+    def load(self) -> Tuple[Optional[Dict], List[Dict]]:
+        """Read the snapshot and the journal records that come after it"""
+        snapshot = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+            self.seq = snapshot['seq']
+        records = []
+        for path in (self.compacting_path, self.journal_path):
+            for record in self._read(path):
+                if record['seq'] > self.seq:
+                    records.append(record)
+                    self.seq = record['seq']
+        self.pending = len(records)
+        return snapshot, records
+
+    def _read(self, path: str) -> Iterator[Dict]:
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Normally a record torn by a crash mid-write, which can only be the last one
+                    self.logger.warning(f"Skipping unreadable record {line_number} in {path}")
+
+    def open(self):
+        self.fd = os.open(self.journal_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        size = os.fstat(self.fd).st_size
+        if size:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(size - 1)
+                if f.read(1) != b'\n':
+                    os.write(self.fd, b'\n')  # end a torn record so the next one starts on its own line
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def append(self, record: Dict):
+        """Write one record with a single write() on the O_APPEND descriptor"""
+        self.seq += 1
+        record['seq'] = self.seq
+        os.write(self.fd, (json.dumps(record, separators=(',', ':')) + '\n').encode())
+        if self.fsync:
+            os.fsync(self.fd)
+        self.pending += 1
+
+    def rotate(self) -> int:
+        """Set the journal aside for compaction and start a fresh one.
+
+        Returns the sequence number the snapshot must cover. The caller holds
+        the lock that orders appends, so no record is written in between.
+        """
+        self.close()
+        if os.path.exists(self.compacting_path):
+            # An earlier compaction failed; keep its records ahead of the newer ones
+            with open(self.journal_path, 'rb') as src, open(self.compacting_path, 'ab') as dst:
+                dst.write(src.read())
+            os.remove(self.journal_path)
+        elif os.path.exists(self.journal_path):
+            os.replace(self.journal_path, self.compacting_path)
+        self.open()
+        self.pending = 0
+        return self.seq
+
+    def write_snapshot(self, state: Dict, seq: int):
+        """Atomically replace the snapshot, then drop the journal it supersedes"""
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(state, seq=seq), f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
@@ -0,0 +1,132 @@
+import json
+import logging
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+class SQLiteMatchStore:
+    """Matches in an embedded SQLite database instead of an in-memory dict.
+
+    Match ids come from an AUTOINCREMENT key, so they only ever grow, even
+    after matches are deleted. Status counts use the index on status, and a
+    player's history uses the index on match_players. Every statement is a
+    constant parameterized string, so sqlite3's statement cache prepares each
+    one only once per connection.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS matches (
+            match_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT NOT NULL,
+            home_team TEXT NOT NULL,
+            away_team TEXT NOT NULL,
+            home_score INTEGER NOT NULL DEFAULT 0,
+            away_score INTEGER NOT NULL DEFAULT 0,
+            ports TEXT,
+            start_time REAL,
+            end_time REAL)""",
+        "CREATE INDEX IF NOT EXISTS matches_status ON matches (status)",
+        """CREATE TABLE IF NOT EXISTS match_players (
+            match_id INTEGER NOT NULL,
+            player_id TEXT NOT NULL,
+            team TEXT NOT NULL,
+            position TEXT NOT NULL,
+            PRIMARY KEY (match_id, team, position))""",
+        "CREATE INDEX IF NOT EXISTS match_players_player ON match_players (player_id, match_id)"
+    )
+    COLUMNS = "match_id, status, home_team, away_team, home_score, away_score, ports, start_time, end_time"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = logging.getLogger('match_store')
+        self._local = threading.local()
+        with self.db as db:
+            for statement in self.SCHEMA:
+                db.execute(statement)
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def create(self, home_team: Dict[str, str], away_team: Dict[str, str], match_id: Optional[int] = None) -> int:
+        with self.db as db:
+            match_id = db.execute(
+                "INSERT INTO matches (match_id, status, home_team, away_team) VALUES (?, 'waiting', ?, ?)",
+                (match_id, json.dumps(home_team), json.dumps(away_team))).lastrowid
+            db.executemany(
+                "INSERT INTO match_players (match_id, player_id, team, position) VALUES (?, ?, ?, ?)",
+                [(match_id, player_id, team, position)
+                 for team, lineup in (('home', home_team), ('away', away_team))
+                 for position, player_id in lineup.items()])
+        return match_id
+
+    def set_ports(self, match_id: int, ports: Dict[str, int]):
+        with self.db as db:
+            db.execute("UPDATE matches SET ports = ? WHERE match_id = ?", (json.dumps(ports), match_id))
+
+    def start(self, match_id: int, start_time: float) -> bool:
+        with self.db as db:
+            return db.execute("UPDATE matches SET status = 'active', start_time = ? WHERE match_id = ?",
+                              (start_time, match_id)).rowcount > 0
+
+    def update_score(self, match_id: int, home_score: int, away_score: int) -> bool:
+        with self.db as db:
+            return db.execute(
+                "UPDATE matches SET home_score = ?, away_score = ? WHERE match_id = ? AND status = 'active'",
+                (home_score, away_score, match_id)).rowcount > 0
+
+    def end(self, match_id: int, end_time: float) -> bool:
+        with self.db as db:
+            return db.execute("UPDATE matches SET status = 'ended', end_time = ? WHERE match_id = ? AND status = 'active'",
+                              (end_time, match_id)).rowcount > 0
+
+    def get(self, match_id) -> Optional[Dict]:
+        row = self.db.execute(f"SELECT {self.COLUMNS} FROM matches WHERE match_id = ?", (match_id,)).fetchone()
+        return self._match(row) if row else None
+
+    def status(self, match_id) -> Optional[str]:
+        row = self.db.execute("SELECT status FROM matches WHERE match_id = ?", (match_id,)).fetchone()
+        return row[0] if row else None
+
+    def count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+
+    def count_by_status(self, status: str) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM matches WHERE status = ?", (status,)).fetchone()[0]
+
+    def player_history(self, player_id: str, limit: int = 20, before: Optional[int] = None) -> List[Dict]:
+        """A player's matches, newest first; pass the last match_id seen as before to page"""
+        rows = self.db.execute(
+            f"""SELECT {', '.join('m.' + column for column in self.COLUMNS.split(', '))}
+                FROM match_players p JOIN matches m ON m.match_id = p.match_id
+                WHERE p.player_id = ? AND p.match_id < ?
+                ORDER BY p.match_id DESC LIMIT ?""",
+            (player_id, before if before is not None else 2 ** 63 - 1, limit)).fetchall()
+        return [self._match(row) for row in rows]
+
+    def _match(self, row) -> Dict:
+        match_id, status, home_team, away_team, home_score, away_score, ports, start_time, end_time = row
+        match = {
+            'match_id': match_id,
+            'home_team': json.loads(home_team),
+            'away_team': json.loads(away_team),
+            'score': [home_score, away_score],
+            'status': status,
+            'start_time': start_time,
+            'end_time': end_time
+        }
+        if ports:
+            match['ports'] = json.loads(ports)
+        return match
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
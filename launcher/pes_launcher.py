@@ -6,6 +6,9 @@ import time
 import psutil
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+# Add main project directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from network.db_pool import get_pool
 
 # Configuration
 GAME_EXE = "PES2021.exe"
@@ -32,7 +35,9 @@ class GameMonitor(FileSystemEventHandler):
 
 def connect_to_wordpress():
     try:
-        db = mysql.connector.connect(**WP_DB_CONFIG)
+        # One connection is all the launcher needs; checked before it is handed out
+        db = get_pool('launcher', size=1, **WP_DB_CONFIG)
+        db.query('launcher_check', "SELECT 1")
         return db
     except mysql.connector.Error as err:
         print(f"WordPress database connection error: {err}")
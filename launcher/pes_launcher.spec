@@ -3,7 +3,7 @@
 
 a = Analysis(
     ['pes_launcher.py'],
-    pathex=[],
+    pathex=['..'],
     binaries=[],
     datas=[],
     hiddenimports=['watchdog'],
@@ -1,22 +1,45 @@
 jQuery(document).ready(function($) {
     const pesLobby = {
+        pollInterval: 10000,
+        pollTimer: null,
+
         init: function() {
-            this.getServerStatus();
+            this.watchServerStatus();
             this.setupEventListeners();
         },
 
+        watchServerStatus: function() {
+            // Pushed by the server on every change; polling only where that is unavailable
+            if (!window.EventSource) {
+                this.startPolling();
+                return;
+            }
+            const events = new EventSource(pesData.apiUrl + 'events');
+            events.addEventListener('status', (event) => {
+                this.renderServerStatus(JSON.parse(event.data));
+            });
+            events.onerror = () => {
+                // The browser reconnects by itself unless the server refused the stream
+                if (events.readyState === EventSource.CLOSED) {
+                    this.startPolling();
+                }
+            };
+        },
+
+        startPolling: function() {
+            if (this.pollTimer) {
+                return;
+            }
+            this.getServerStatus();
+            this.pollTimer = setInterval(() => this.getServerStatus(), this.pollInterval);
+        },
+
         getServerStatus: function() {
             $.ajax({
                 url: pesData.apiUrl + 'status',
                 method: 'GET',
-                success: function(response) {
-                    $('#server-status').html(`
-                        <div class="server-info">
-                            <p>Players Online: ${response.players}</p>
-                            <p>Active Matches: ${response.matches}</p>
-                            <p>Lobbies: ${response.lobbies}</p>
-                        </div>
-                    `);
+                success: (response) => {
+                    this.renderServerStatus(response);
                 },
                 error: function() {
                     $('#server-status').html('<p>Error loading server status</p>');
@@ -24,6 +47,16 @@ jQuery(document).ready(function($) {
             });
         },
 
+        renderServerStatus: function(status) {
+            $('#server-status').html(`
+                <div class="server-info">
+                    <p>Players Online: ${status.players}</p>
+                    <p>Active Matches: ${status.matches}</p>
+                    <p>Lobbies: ${status.lobbies}</p>
+                </div>
+            `);
+        },
+
         setupEventListeners: function() {
             // Add event listeners for lobby actions
         }
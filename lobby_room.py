@@ -1,5 +1,6 @@
 import time
 import random
+import threading
 from typing import Dict, List, Optional
 import logging
 from config import SERVER_CONFIG, MATCHMAKING_CONFIG
@@ -12,23 +13,26 @@ class LobbyRoom:
         self.match_coordinator = match_coordinator
         self.players = {}
         self.teams = {'home': [], 'away': []}
+        self.positions = {'home': {}, 'away': {}}  # team -> {position: player_id}
+        self.lock = threading.RLock()
         self.status = 'waiting'
         self.created_at = time.time()
         self.logger = logging.getLogger(f'lobby_{lobby_id}')
 
     def add_player(self, player_id: str, player_data, team: str) -> bool:
-        if len(self.players) >= self.max_players:
-            return False
-            
-        self.players[player_id] = {
-            'data': player_data,
-            'team': team,
-            'position': None,
-            'ready': False,
-            'joined_at': time.time()
-        }
-        self.logger.info(f"Player {player_id} joined lobby {self.lobby_id}")
-        return True
+        with self.lock:
+            if len(self.players) >= self.max_players:
+                return False
+                
+            self.players[player_id] = {
+                'data': player_data,
+                'team': team,
+                'position': None,
+                'ready': False,
+                'joined_at': time.time()
+            }
+            self.logger.info(f"Player {player_id} joined lobby {self.lobby_id}")
+            return True
 
     def assign_team(self, player_id, team):
         if player_id in self.players and len(self.teams[team]) < SERVER_CONFIG['max_players_per_team']:
@@ -48,6 +52,59 @@ class LobbyRoom:
             return True
         return False
 
+    def claim_position(self, player_id: str, team: str, position: str) -> bool:
+        """Claim a free position on a team. A player holds at most one position."""
+        with self.lock:
+            if player_id not in self.players or team not in self.positions:
+                return False
+            if position in self.positions[team]:
+                return False
+            player = self.players[player_id]
+            old_team, old_position = player['team'], player['position']
+            # Switch teams first, so a full team leaves the player in their old position
+            if old_team != team and not self.assign_team(player_id, team):
+                return False
+            if old_position and self.positions[old_team].get(old_position) == player_id:
+                del self.positions[old_team][old_position]
+            self.positions[team][position] = player_id
+            player['position'] = position
+            return True
+
+    def release_position(self, player_id: str) -> bool:
+        with self.lock:
+            player = self.players.get(player_id)
+            if not player or not player['team'] or not player['position']:
+                return False
+            team_positions = self.positions[player['team']]
+            if team_positions.get(player['position']) == player_id:
+                del team_positions[player['position']]
+            player['position'] = None
+            return True
+
+    def take_lineups(self, positions: List[str]) -> Optional[Dict[str, Dict[str, str]]]:
+        """Hand over both lineups once every position is filled and free the lobby for the next match"""
+        with self.lock:
+            for team_positions in self.positions.values():
+                if not all(pos in team_positions for pos in positions):
+                    return None
+            lineups = self.positions
+            self.positions = {'home': {}, 'away': {}}
+            for team_positions in lineups.values():
+                for player_id in team_positions.values():
+                    self.remove_player(player_id)
+            return lineups
+
+    def has_player(self, player_id: str) -> bool:
+        return player_id in self.players
+
+    def set_player_data(self, player_id: str, player_data) -> bool:
+        """Attach a new connection to a player, e.g. after a reconnect"""
+        with self.lock:
+            if player_id not in self.players:
+                return False
+            self.players[player_id]['data'] = player_data
+            return True
+
     def set_player_ready(self, player_id: str, is_ready: bool) -> bool:
         if player_id in self.players:
             self.players[player_id]['ready'] = is_ready
@@ -83,14 +140,45 @@ class LobbyRoom:
         return positions
 
     def remove_player(self, player_id: str) -> bool:
-        if player_id in self.players:
-            team = self.players[player_id]['team']
-            if team and player_id in self.teams[team]:
-                self.teams[team].remove(player_id)
-            del self.players[player_id]
-            self.logger.info(f"Player {player_id} left lobby {self.lobby_id}")
-            return True
-        return False
+        with self.lock:
+            if player_id in self.players:
+                self.release_position(player_id)
+                team = self.players[player_id]['team']
+                if team and player_id in self.teams[team]:
+                    self.teams[team].remove(player_id)
+                del self.players[player_id]
+                self.logger.info(f"Player {player_id} left lobby {self.lobby_id}")
+                return True
+            return False
+
+    def snapshot(self) -> Dict:
+        """Serializable lobby state for a restart handoff; player connections are left out"""
+        with self.lock:
+            return {
+                'lobby_id': self.lobby_id,
+                'room_name': self.room_name,
+                'max_players': self.max_players,
+                'status': self.status,
+                'created_at': self.created_at,
+                'players': {
+                    player_id: {key: value for key, value in player.items() if key != 'data'}
+                    for player_id, player in self.players.items()
+                },
+                'teams': {team: list(players) for team, players in self.teams.items()},
+                'positions': {team: dict(positions) for team, positions in self.positions.items()}
+            }
+
+    @classmethod
+    def restore(cls, state: Dict, match_coordinator) -> 'LobbyRoom':
+        """Rebuild a lobby from snapshot(); players have no connection until they reconnect"""
+        lobby = cls(state['lobby_id'], state['room_name'], state['max_players'], match_coordinator)
+        lobby.status = state['status']
+        lobby.created_at = state['created_at']
+        for player_id, player in state['players'].items():
+            lobby.players[player_id] = dict(player, data={'client': None})
+        lobby.teams = {team: list(players) for team, players in state['teams'].items()}
+        lobby.positions = {team: dict(positions) for team, positions in state['positions'].items()}
+        return lobby
 
     def get_status(self) -> Dict:
         return {
@@ -0,0 +1,112 @@
+import threading
+import time
+from typing import Optional
+
+SERVER_FULL = 'server_full'
+RATE_LIMITED = 'rate_limited'
+
+class TokenBucket:
+    """Classic token bucket on monotonic time: rate tokens per second, up to burst"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float, now: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def consume(self, now: Optional[float] = None, amount: float = 1) -> bool:
+        self.refill(time.monotonic() if now is None else now)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+class AdmissionController:
+    """Decides whether a new connection or message is let in.
+
+    Connections are limited by a global concurrency cap and a token bucket
+    per client IP; messages by a token bucket per connection. Idle per-IP
+    buckets are pruned once they have refilled, since a full bucket holds no
+    state worth keeping.
+    """
+
+    PRUNE_EVERY = 1024  # admissions between sweeps of the per-IP buckets
+
+    def __init__(self, max_connections=1024, connect_rate=5.0, connect_burst=20,
+                 message_rate=50.0, message_burst=100):
+        self.max_connections = max_connections
+        self.connect_rate = connect_rate
+        self.connect_burst = connect_burst
+        self.message_rate = message_rate
+        self.message_burst = message_burst
+        self.lock = threading.Lock()
+        self.ip_buckets = {}
+        self.active = 0
+        self._until_prune = self.PRUNE_EVERY
+        self.counters = {
+            'admitted': 0,
+            'rejected_server_full': 0,
+            'rejected_rate_limited': 0,
+            'messages_limited': 0,
+            'peak_connections': 0
+        }
+
+    def admit(self, ip: str) -> Optional[str]:
+        """Reserve a connection slot for ip. Returns None if admitted, else the rejection reason."""
+        now = time.monotonic()
+        with self.lock:
+            self._until_prune -= 1
+            if self._until_prune <= 0:
+                self._prune(now)
+            if self.active >= self.max_connections:
+                self.counters['rejected_server_full'] += 1
+                return SERVER_FULL
+            bucket = self.ip_buckets.get(ip)
+            if bucket is None:
+                bucket = self.ip_buckets[ip] = TokenBucket(self.connect_rate, self.connect_burst, now)
+            if not bucket.consume(now):
+                self.counters['rejected_rate_limited'] += 1
+                return RATE_LIMITED
+            self.active += 1
+            self.counters['admitted'] += 1
+            if self.active > self.counters['peak_connections']:
+                self.counters['peak_connections'] = self.active
+        return None
+
+    def release(self):
+        """Give back the slot of an admitted connection that has closed"""
+        with self.lock:
+            self.active -= 1
+
+    def message_bucket(self) -> TokenBucket:
+        """Message budget for one new connection; only its reader thread uses it"""
+        return TokenBucket(self.message_rate, self.message_burst)
+
+    def allow_message(self, bucket: TokenBucket) -> bool:
+        if bucket.consume():
+            return True
+        with self.lock:
+            self.counters['messages_limited'] += 1
+        return False
+
+    def _prune(self, now: float):
+        self._until_prune = self.PRUNE_EVERY
+        for ip, bucket in list(self.ip_buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.burst:
+                del self.ip_buckets[ip]
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['active_connections'] = self.active
+            stats['max_connections'] = self.max_connections
+            stats['tracked_ips'] = len(self.ip_buckets)
+        return stats
@@ -0,0 +1,143 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+from mysql.connector import pooling
+from mysql.connector import Error as DatabaseError
+
+from config import DATABASE_CONFIG
+from network.metrics_registry import REGISTRY
+
+DB_QUERY_SECONDS = REGISTRY.histogram('pes_db_query_seconds', 'Database query latency', ['query'])
+DB_POOL_WAIT_SECONDS = REGISTRY.histogram('pes_db_pool_wait_seconds',
+                                          'Time spent waiting for a pooled database connection').labels()
+
+class DatabasePool:
+    """MySQL connections shared by every thread of a process.
+
+    All size connections are opened together the first time the pool is used
+    and then reused, so a query pays no TCP or authentication handshake. Callers wait up to timeout seconds
+    for a free connection instead of failing when all are busy. A connection
+    is pinged when checked out and reconnected if the server dropped it.
+    Each connection keeps the statements it has prepared, so running a query
+    again skips parsing it on the server. An open transaction is rolled back
+    when a connection is returned, so the next borrower starts clean.
+    """
+
+    def __init__(self, name: str, size: int = 20, timeout: float = 10, max_statements: int = 64, **connect_args):
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self.max_statements = max_statements
+        self.connect_args = connect_args
+        self.pool = None
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(size)
+        # server connection id -> {sql: (sql, prepared cursor)}; a reconnect gets
+        # a new id, so its statements are prepared again
+        self.statements = {}
+        self.logger = logging.getLogger('db_pool')
+
+    def _pool(self) -> pooling.MySQLConnectionPool:
+        with self.lock:
+            if self.pool is None:
+                # Sessions are not reset on return, which would drop the prepared statements
+                self.pool = pooling.MySQLConnectionPool(pool_name=self.name, pool_size=self.size,
+                                                        pool_reset_session=False, **self.connect_args)
+                self.logger.info(f"Opened {self.size} connections for database pool {self.name}")
+            return self.pool
+
+    @contextmanager
+    def connection(self):
+        """A pooled connection for the duration of the with block"""
+        started = time.perf_counter()
+        if not self.slots.acquire(timeout=self.timeout):
+            raise pooling.PoolError(f"No free connection in database pool {self.name} after {self.timeout}s")
+        try:
+            # get_connection() pings the connection and reconnects it if needed
+            connection = self._pool().get_connection()
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+            try:
+                yield connection
+            finally:
+                try:
+                    if connection.in_transaction:
+                        connection.rollback()
+                except DatabaseError as e:
+                    self.logger.warning(f"Rollback on return to database pool {self.name} failed: {e}")
+                connection.close()  # back to the pool, still connected
+        finally:
+            self.slots.release()
+
+    def _prepared(self, connection, sql: str, dictionary: bool):
+        with self.lock:
+            statements = self.statements.get(connection.connection_id)
+            if statements is None:
+                if len(self.statements) >= self.size:
+                    # Only reconnected connections leave ids behind; drop the oldest
+                    self.statements.pop(next(iter(self.statements)))
+                statements = self.statements[connection.connection_id] = {}
+        key = (sql, dictionary)
+        statement = statements.get(key)
+        if statement is None:
+            if len(statements) >= self.max_statements:
+                # Least recently prepared first; the server caps statements per session
+                statements.pop(next(iter(statements)))[1].close()
+            # The cursor re-prepares unless given the very string object it prepared
+            statement = (sql, connection.cursor(prepared=True, dictionary=dictionary))
+            statements[key] = statement
+        return statement, statements, key
+
+    def _run(self, name: str, sql: str, params: Sequence, dictionary: bool, fetch: bool):
+        with self.connection() as connection:
+            (operation, cursor), statements, key = self._prepared(connection, sql, dictionary)
+            try:
+                with DB_QUERY_SECONDS.labels(name).time():
+                    cursor.execute(operation, tuple(params))
+                    rows = cursor.fetchall() if fetch else None
+            except DatabaseError:
+                statements.pop(key, None)  # the cursor may be left mid-result
+                raise
+            return rows if fetch else cursor.rowcount
+
+    def query(self, name: str, sql: str, params: Sequence = ()) -> List[Dict]:
+        """Rows of a query as dicts; timed under name in pes_db_query_seconds"""
+        return self._run(name, sql, params, True, True)
+
+    def query_one(self, name: str, sql: str, params: Sequence = ()) -> Optional[Dict]:
+        rows = self.query(name, sql, params)
+        return rows[0] if rows else None
+
+    def execute(self, name: str, sql: str, params: Sequence = ()) -> int:
+        """Run a statement that returns no rows; the number of rows it changed"""
+        return self._run(name, sql, params, False, False)
+
+_pools: Dict[str, DatabasePool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(name: str = 'pes', size: Optional[int] = None, **connect_args) -> DatabasePool:
+    """The process-wide pool called name.
+
+    The first call creates it, connecting with connect_args if given and
+    to the database in DATABASE_CONFIG otherwise. Later calls return it.
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            if not connect_args:
+                connect_args = {
+                    'host': DATABASE_CONFIG['db_host'],
+                    'port': DATABASE_CONFIG['db_port'],
+                    'user': DATABASE_CONFIG['db_user'],
+                    'password': DATABASE_CONFIG['db_password'],
+                    'database': DATABASE_CONFIG['db_name'],
+                    'charset': DATABASE_CONFIG['charset'],
+                    'connect_timeout': DATABASE_CONFIG['connect_timeout']
+                }
+            connect_args.setdefault('autocommit', True)
+            pool = _pools[name] = DatabasePool(name, size or DATABASE_CONFIG['pool_size'],
+                                               DATABASE_CONFIG['pool_timeout'],
+                                               DATABASE_CONFIG['max_statements'], **connect_args)
+        return pool
@@ -8,6 +8,12 @@ from dnslib import DNSRecord, QTYPE, RR, A, AAAA
 from dnslib.server import DNSServer
 import threading
 import time
+from config import NETWORK_CONFIG
+from network.metrics_registry import REGISTRY, start_metrics_server
+
+DNS_QUERIES = REGISTRY.counter('pes_dns_queries_total', 'DNS queries by how they were answered', ['result'])
+DNS_RESOLVE_SECONDS = REGISTRY.histogram('pes_dns_resolve_seconds', 'Time to answer a DNS query', ['route'],
+                                         buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
 
 class LocalDNS:
     def __init__(self, target_ip, upstream_dns='8.8.8.8'):
@@ -35,7 +41,10 @@ class LocalDNS:
         logging.info(f"Starting DNS server with target IP: {self.target_ip}")
 
     def forward_query(self, query):
-        """Forward DNS query to upstream DNS using dnspython"""
+        """Forward DNS query to upstream DNS using dnspython.
+
+        Returns the reply, or None, and how the query was answered.
+        """
         domain = str(query.q.qname).rstrip('.')  # Remove trailing dot
         qtype = dns.rdatatype.to_text(query.q.qtype)
         
@@ -44,13 +53,13 @@ class LocalDNS:
             self.query_count += 1
             if self.query_count > 1000 and (time.time() - self.start_time) < 60:
                 logging.warning(f"Rate limit exceeded for {domain}")
-                return None
+                return None, 'rate_limited'
         
         logging.info(f"Forwarding {domain} (type {qtype}) to upstream DNS")
         
         # Skip reverse DNS lookups
         if domain.endswith('.in-addr.arpa') or domain.endswith('.ip6.arpa'):
-            return None
+            return None, 'reverse_skipped'
             
         try:
             resolver = dns.resolver.Resolver()
@@ -66,13 +75,14 @@ class LocalDNS:
                     reply.add_answer(RR(domain, QTYPE.AAAA, rdata=AAAA(str(rdata))))
             
             logging.info(f"Received response for {domain}: {reply}")
-            return reply
+            return reply, 'forwarded'
             
         except Exception as e:
             logging.error(f"Error while resolving {domain}: {str(e)}", exc_info=True)
-            return None
+            return None, 'failed'
 
     def resolve(self, request, handler):
+        started = time.perf_counter()
         reply = request.reply()
         qname = request.q.qname
         qtype = request.q.qtype
@@ -97,14 +107,20 @@ class LocalDNS:
             logging.info(f"Redirecting {qname} to {self.target_ip}")
             print(f"Intercepting {qname} query, responding with {self.target_ip}")
             reply.add_answer(RR(qname, QTYPE.A, rdata=A(self.target_ip)))
+            DNS_QUERIES.labels('intercepted').inc()
+            DNS_RESOLVE_SECONDS.labels('intercepted').observe(time.perf_counter() - started)
             return reply
         
         # Forward all other queries
         logging.info(f"Forwarding {qname} to upstream DNS")
-        response = self.forward_query(request)
+        response, result = self.forward_query(request)
+        DNS_QUERIES.labels(result).inc()
+        DNS_RESOLVE_SECONDS.labels(result).observe(time.perf_counter() - started)
         return response if response else request.reply()
 
-def run_dns_server(target_ip='127.0.0.1', port=53):
+def run_dns_server(target_ip='127.0.0.1', port=53, metrics_port=NETWORK_CONFIG['metrics_ports']['dns']):
+    if metrics_port:
+        start_metrics_server(metrics_port)
     resolver = LocalDNS(target_ip)
     server = DNSServer(resolver, port=port, address='0.0.0.0')
     print(f"DNS server running on all interfaces:{port}, redirecting cs.konami.net to {target_ip}")
@@ -0,0 +1,163 @@
+import json
+import logging
+import socket
+import ssl
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+class EventStream:
+    """Pushes a JSON snapshot to Server-Sent Events subscribers whenever it changes.
+
+    Changes are coalesced: after notify(), snapshot() is called and serialized
+    at most once per interval, however many changes happened meanwhile. The
+    resulting frame is shared by every subscriber. Subscribers whose socket
+    was handed over with subscribe() are written to by this stream's one
+    thread; others block in wait() for the next frame. Every keepalive
+    seconds the snapshot is taken anyway, to catch changes nobody notified,
+    and idle subscribers get a comment so dead connections are noticed.
+    """
+
+    MAX_PENDING = 256 * 1024  # bytes buffered for a slow subscriber before it is dropped
+
+    def __init__(self, snapshot: Callable[[], Dict], event: str = 'status', interval: float = 1.0,
+                 keepalive: float = 15.0, max_subscribers: int = 1024, name: str = 'event-stream'):
+        self.snapshot = snapshot
+        self.event = event
+        self.interval = interval
+        self.keepalive = keepalive
+        self.max_subscribers = max_subscribers
+        self.name = name
+        self.logger = logging.getLogger(name)
+        self.event_id = 0
+        self.data = None
+        self.frame = b''
+        self.condition = threading.Condition()
+        self.subscribers = {}  # socket -> bytearray of unsent data
+        self.waiting = 0       # subscribers blocked in wait()
+        self.lock = threading.Lock()
+        # Held while writing to subscribers, so a new subscriber's catch-up
+        # frame and a broadcast never interleave or repeat a frame
+        self.writing = threading.RLock()
+        self.changed = threading.Event()
+        self.running = False
+        self._stop = threading.Event()
+        self.stats = {'published': 0, 'dropped': 0}
+
+    def notify(self):
+        """Something in the snapshot changed; cheap enough to call on every change"""
+        self.changed.set()
+
+    def current(self) -> Tuple[int, bytes]:
+        with self.condition:
+            return self.event_id, self.frame
+
+    def subscriber_count(self) -> int:
+        with self.lock:
+            return len(self.subscribers) + self.waiting
+
+    def full(self) -> bool:
+        return self.subscriber_count() >= self.max_subscribers
+
+    def subscribe(self, sock: socket.socket, last_id: int = 0):
+        """Take over a connection that was already sent the frame numbered last_id"""
+        sock.setblocking(False)
+        with self.writing:
+            with self.condition:
+                # Published since the handler read current(); sent right away
+                pending = bytearray(self.frame if self.event_id != last_id else b'')
+            with self.lock:
+                self.subscribers[sock] = pending
+            if pending:
+                self.send(sock, pending)
+
+    def wait(self, last_id: int, timeout: Optional[float] = None) -> Tuple[int, bytes]:
+        """Block until a frame newer than last_id is published, the stream stops or timeout passes"""
+        with self.lock:
+            self.waiting += 1
+        try:
+            with self.condition:
+                self.condition.wait_for(lambda: self.event_id != last_id or not self.running, timeout)
+                return self.event_id, self.frame
+        finally:
+            with self.lock:
+                self.waiting -= 1
+
+    def publish(self) -> bool:
+        """Take and serialize the snapshot; only the stream thread calls this after start()"""
+        try:
+            data = json.dumps(self.snapshot(), separators=(',', ':'))
+        except Exception as e:
+            self.logger.error(f"Error building {self.event} event: {e}")
+            return False
+        if data == self.data:
+            return False
+        with self.writing:
+            with self.condition:
+                self.event_id += 1
+                self.data = data
+                self.frame = f"id: {self.event_id}\nevent: {self.event}\ndata: {data}\n\n".encode()
+                self.condition.notify_all()
+            self.stats['published'] += 1
+            self.broadcast(self.frame)
+        return True
+
+    def broadcast(self, data: bytes):
+        with self.writing:
+            with self.lock:
+                subscribers = list(self.subscribers.items())
+            for sock, pending in subscribers:
+                pending += data
+                if len(pending) > self.MAX_PENDING:
+                    self.logger.warning(f"Dropping {self.event} subscriber that stopped reading")
+                    self.drop(sock)
+                    continue
+                self.send(sock, pending)
+
+    def send(self, sock: socket.socket, pending: bytearray):
+        """Write what the socket takes of a subscriber's unsent data"""
+        try:
+            sent = sock.send(pending)
+        except (BlockingIOError, ssl.SSLWantWriteError):
+            return  # kernel buffer full, retried with the next frame
+        except OSError:
+            self.drop(sock)
+            return
+        del pending[:sent]
+
+    def drop(self, sock: socket.socket):
+        with self.lock:
+            self.subscribers.pop(sock, None)
+        self.stats['dropped'] += 1
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def run(self):
+        while not self._stop.is_set():
+            if self.changed.wait(self.keepalive):
+                self.changed.clear()
+                self.publish()
+            elif not self.publish():
+                self.broadcast(b': keepalive\n\n')
+            # Changes arriving meanwhile are sent together with the next frame
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Publish a first snapshot right away, then keep publishing in the background"""
+        if self.running:
+            return
+        self.running = True
+        self.publish()
+        threading.Thread(target=self.run, name=self.name, daemon=True).start()
+
+    def stop(self):
+        """Stop publishing and close every subscriber so their clients reconnect elsewhere"""
+        self.running = False
+        self._stop.set()
+        with self.condition:
+            self.condition.notify_all()
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for sock in subscribers:
+            self.drop(sock)
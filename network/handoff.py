@@ -0,0 +1,62 @@
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+from typing import Dict, Optional
+
+# Set by the old process for the one taking over from it
+LISTEN_FDS_ENV = 'PES_LISTEN_FDS'        # "lobby=5,api=6"
+SNAPSHOT_ENV = 'PES_STATE_SNAPSHOT'      # path of the state snapshot
+
+def handoff_supported() -> bool:
+    """Passing listening sockets to a child process needs POSIX fd inheritance"""
+    return os.name == 'posix'
+
+def inherited_sockets() -> Dict[str, socket.socket]:
+    """Listening sockets passed down by the process this one replaces, by name.
+
+    The variable is cleared so processes started later do not inherit it.
+    """
+    sockets = {}
+    for item in filter(None, os.environ.pop(LISTEN_FDS_ENV, '').split(',')):
+        name, _, fd = item.partition('=')
+        try:
+            sockets[name] = socket.socket(fileno=int(fd))
+        except (ValueError, OSError) as e:
+            logging.error(f"Cannot take over inherited socket {item}: {e}")
+    return sockets
+
+def inherited_snapshot_path() -> Optional[str]:
+    return os.environ.pop(SNAPSHOT_ENV, None)
+
+def spawn_successor(sockets: Dict[str, socket.socket], snapshot_path: str) -> subprocess.Popen:
+    """Start another copy of this program that takes over the given listening sockets"""
+    if not handoff_supported():
+        raise OSError('Socket handoff is only supported on POSIX systems')
+    fds = {name: sock.fileno() for name, sock in sockets.items()}
+    env = dict(os.environ)
+    env[LISTEN_FDS_ENV] = ','.join(f"{name}={fd}" for name, fd in fds.items())
+    env[SNAPSHOT_ENV] = os.path.abspath(snapshot_path)
+    return subprocess.Popen([sys.executable] + sys.argv, env=env, pass_fds=tuple(fds.values()))
+
+def write_snapshot(path: str, state: Dict):
+    """Write the snapshot atomically so the successor never reads half a file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_snapshot(path: str) -> Optional[Dict]:
+    """Load and delete a handoff snapshot; it is only ever applied once"""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+        os.remove(path)
+        return state
+    except (OSError, ValueError) as e:
+        logging.error(f"Cannot read state snapshot {path}: {e}")
+        return None
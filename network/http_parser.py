@@ -0,0 +1,173 @@
+import json
+from typing import Dict, List, Optional
+
+HTTP_METHODS = (b'GET ', b'POST ', b'PUT ', b'DELETE ', b'HEAD ', b'OPTIONS ')
+
+STATUS_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    413: 'Payload Too Large',
+    429: 'Too Many Requests',
+    431: 'Request Header Fields Too Large',
+    501: 'Not Implemented',
+    503: 'Service Unavailable',
+    505: 'HTTP Version Not Supported'
+}
+
+class HTTPParseError(ValueError):
+    """Malformed request; status is the HTTP error code to answer with"""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class HTTPRequest:
+    def __init__(self, method: str, target: str, version: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers  # lower-case names
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return 'keep-alive' in connection
+        return 'close' not in connection
+
+class HTTPRequestParser:
+    """Incremental HTTP/1.1 request parser for a persistent connection.
+
+    Bytes are fed as they arrive; requests() yields every request that is
+    complete, in order, so pipelined requests are handled too. Bodies are
+    delimited by Content-Length or chunked transfer encoding.
+    """
+
+    def __init__(self, max_header_size: int = 16 * 1024, max_body_size: int = 1024 * 1024):
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self._buffer = bytearray()
+        self._request = None    # request whose body is still being read
+        self._remaining = 0     # Content-Length bytes still expected
+        self._chunked = False
+        self._body = bytearray()
+
+    def feed(self, data: bytes):
+        self._buffer += data
+
+    def requests(self):
+        while True:
+            if self._request is None:
+                if not self._parse_head():
+                    return
+            if self._chunked:
+                done = self._parse_chunks()
+            else:
+                done = self._parse_fixed_body()
+            if not done:
+                return
+            request, self._request = self._request, None
+            request.body = bytes(self._body)
+            self._body.clear()
+            yield request
+
+    def _parse_head(self) -> bool:
+        end = self._buffer.find(b'\r\n\r\n')
+        if end == -1:
+            if len(self._buffer) > self.max_header_size:
+                raise HTTPParseError(431, 'Request header too large')
+            return False
+        if end > self.max_header_size:
+            raise HTTPParseError(431, 'Request header too large')
+        lines = self._buffer[:end].decode('latin-1').split('\r\n')
+        del self._buffer[:end + 4]
+
+        parts = lines[0].split(' ')
+        if len(parts) != 3:
+            raise HTTPParseError(400, f"Malformed request line: {lines[0][:100]}")
+        method, target, version = parts
+        if version not in ('HTTP/1.0', 'HTTP/1.1'):
+            raise HTTPParseError(505, f"Unsupported HTTP version {version[:20]}")
+
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if not sep or not name or name != name.strip():
+                raise HTTPParseError(400, f"Malformed header line: {line[:100]}")
+            name = name.lower()
+            value = value.strip()
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+
+        transfer_encoding = headers.get('transfer-encoding', '').lower()
+        if transfer_encoding:
+            if transfer_encoding != 'chunked':
+                raise HTTPParseError(501, f"Unsupported transfer encoding {transfer_encoding[:50]}")
+            self._chunked = True
+            self._remaining = 0
+        else:
+            self._chunked = False
+            try:
+                self._remaining = int(headers.get('content-length', '0'))
+            except ValueError:
+                raise HTTPParseError(400, 'Invalid Content-Length')
+            if self._remaining < 0:
+                raise HTTPParseError(400, 'Invalid Content-Length')
+            if self._remaining > self.max_body_size:
+                raise HTTPParseError(413, f"Request body exceeds {self.max_body_size} bytes")
+        self._request = HTTPRequest(method, target, version, headers, b'')
+        return True
+
+    def _parse_fixed_body(self) -> bool:
+        take = min(self._remaining, len(self._buffer))
+        if take:
+            self._body += self._buffer[:take]
+            del self._buffer[:take]
+            self._remaining -= take
+        return self._remaining == 0
+
+    def _parse_chunks(self) -> bool:
+        while True:
+            if self._remaining:
+                # Chunk data followed by its CRLF
+                if len(self._buffer) < self._remaining + 2:
+                    return False
+                if self._buffer[self._remaining:self._remaining + 2] != b'\r\n':
+                    raise HTTPParseError(400, 'Malformed chunk')
+                self._body += self._buffer[:self._remaining]
+                del self._buffer[:self._remaining + 2]
+                self._remaining = 0
+                continue
+            line_end = self._buffer.find(b'\r\n')
+            if line_end == -1:
+                return False
+            size_field = self._buffer[:line_end].split(b';', 1)[0].strip()
+            try:
+                size = int(size_field, 16)
+            except ValueError:
+                raise HTTPParseError(400, 'Malformed chunk size')
+            if size == 0:
+                # Last chunk: skip optional trailers up to the closing blank line
+                trailers_end = self._buffer.find(b'\r\n\r\n', line_end)
+                if self._buffer[line_end:line_end + 4] == b'\r\n\r\n':
+                    trailers_end = line_end
+                if trailers_end == -1:
+                    return False
+                del self._buffer[:trailers_end + 4]
+                return True
+            if len(self._body) + size > self.max_body_size:
+                raise HTTPParseError(413, f"Request body exceeds {self.max_body_size} bytes")
+            del self._buffer[:line_end + 2]
+            self._remaining = size
+
+def build_response(status: int, payload, keep_alive: bool = True, extra_headers: Optional[List[str]] = None) -> bytes:
+    """Serialize a JSON HTTP/1.1 response with an explicit Content-Length"""
+    body = json.dumps(payload).encode()
+    head = [
+        f"HTTP/1.1 {status} {STATUS_REASONS.get(status, 'Unknown')}",
+        'Content-Type: application/json',
+        f"Content-Length: {len(body)}",
+        'Connection: keep-alive' if keep_alive else 'Connection: close'
+    ]
+    head.extend(extra_headers or [])
+    return ('\r\n'.join(head) + '\r\n\r\n').encode() + body
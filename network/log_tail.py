@@ -0,0 +1,64 @@
+import os
+import time
+from typing import Iterator, Optional, Tuple
+
+def tail_lines(path: str, count: int, block_size: int = 8192) -> Tuple[bytes, int]:
+    """The last count lines of a file and the offset they end at.
+
+    Reads backwards one block at a time, so the cost depends on the lines
+    returned, not on the file size.
+    """
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        if count <= 0:
+            return b'', end
+        position = end
+        blocks = []
+        newlines = 0
+        # One newline more than lines wanted, not counting the one ending the file
+        while position > 0 and newlines <= count:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size)
+            if position + size == end and block.endswith(b'\n'):
+                newlines -= 1
+            newlines += block.count(b'\n')
+            blocks.append(block)
+    data = b''.join(reversed(blocks))
+    lines = data.splitlines(keepends=True)
+    return b''.join(lines[-count:]), end
+
+def read_chunks(path: str, offset: int = 0, end: Optional[int] = None, chunk_size: int = 65536) -> Iterator[bytes]:
+    """Stream a file from offset up to end (by default its size when called)"""
+    with open(path, 'rb') as f:
+        if end is None:
+            end = f.seek(0, os.SEEK_END)
+        f.seek(offset)
+        while offset < end:
+            chunk = f.read(min(chunk_size, end - offset))
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+def follow(path: str, offset: int = 0, poll_interval: float = 0.5, timeout: Optional[float] = None,
+           chunk_size: int = 65536) -> Iterator[bytes]:
+    """Stream a file from offset and keep streaming what is appended, like tail -f.
+
+    Starts over from the beginning if the file shrinks below the current
+    offset, e.g. after it was truncated. Stops after timeout seconds, if given.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with open(path, 'rb') as f:
+        while deadline is None or time.monotonic() < deadline:
+            size = os.fstat(f.fileno()).st_size
+            if size < offset:
+                offset = 0
+            if size == offset:
+                time.sleep(poll_interval)
+                continue
+            f.seek(offset)
+            chunk = f.read(min(chunk_size, size - offset))
+            offset += len(chunk)
+            yield chunk
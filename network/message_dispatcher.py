@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+from network.metrics_registry import REGISTRY
+
+DISPATCH_SECONDS = REGISTRY.histogram('pes_message_dispatch_seconds',
+                                      'Time to validate and handle one message, by type', ['type'])
+MESSAGES_REJECTED = REGISTRY.counter('pes_messages_rejected_total',
+                                     'Messages without a usable or known type').labels()
+
+_TYPE_NAMES = {str: 'string', int: 'integer', float: 'number', bool: 'boolean', dict: 'object', list: 'list'}
+
+class MessageSchema:
+    """Field checks for one message type, compiled once when the type is registered.
+
+    required and optional map a field name to a type or tuple of types.
+    """
+
+    def __init__(self, message_type: str, required: Optional[Dict] = None, optional: Optional[Dict] = None):
+        self.message_type = message_type
+        self.required = tuple((name, types, self._type_name(types)) for name, types in (required or {}).items())
+        self.optional = tuple((name, types, self._type_name(types)) for name, types in (optional or {}).items())
+
+    @staticmethod
+    def _type_name(types):
+        if not isinstance(types, tuple):
+            types = (types,)
+        return ' or '.join(_TYPE_NAMES.get(t, t.__name__) for t in types)
+
+    def validate(self, message: dict):
+        for name, types, type_name in self.required:
+            if name not in message:
+                raise ValueError(f"Missing {name} in {self.message_type}")
+            if not isinstance(message[name], types):
+                raise ValueError(f"{name} must be a {type_name}")
+        for name, types, type_name in self.optional:
+            value = message.get(name)
+            if value is not None and not isinstance(value, types):
+                raise ValueError(f"{name} must be a {type_name}")
+
+class MessageRoute:
+    """Handler, schema and timing counters of one message type"""
+
+    def __init__(self, message_type: str, handler: Callable, schema: MessageSchema, identifies_player: bool):
+        self.message_type = message_type
+        self.handler = handler
+        self.schema = schema
+        self.identifies_player = identifies_player
+        self.latency = DISPATCH_SECONDS.labels(message_type)
+        self.lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, elapsed: float, failed: bool):
+        self.latency.observe(elapsed)
+        with self.lock:
+            self.count += 1
+            if failed:
+                self.errors += 1
+            self.total_time += elapsed
+            if elapsed > self.max_time:
+                self.max_time = elapsed
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'count': self.count,
+                'errors': self.errors,
+                'avg_ms': round(self.total_time / self.count * 1000, 3) if self.count else 0.0,
+                'max_ms': round(self.max_time * 1000, 3)
+            }
+
+class MessageDispatcher:
+    """Routes decoded messages to handlers by their 'type' field.
+
+    Lookup is a single dict access, so registering more message types does
+    not slow down the existing ones.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.rejected = 0  # messages without a usable or known type
+
+    def register(self, message_type: str, handler: Callable, required: Optional[Dict] = None,
+                 optional: Optional[Dict] = None, identifies_player: bool = False):
+        """Register handler(client, message) for a type.
+
+        identifies_player marks messages whose player_id names the player
+        behind the connection (join, reconnect).
+        """
+        if message_type in self.routes:
+            raise ValueError(f"Handler for message type '{message_type}' already registered")
+        schema = MessageSchema(message_type, required, optional)
+        self.routes[message_type] = MessageRoute(message_type, handler, schema, identifies_player)
+
+    def dispatch(self, client, message) -> MessageRoute:
+        """Validate a message and run its handler. Raises ValueError for invalid messages."""
+        if not isinstance(message, dict):
+            self.rejected += 1
+            MESSAGES_REJECTED.inc()
+            raise ValueError("Message must be a JSON object")
+        message_type = message.get('type')
+        route = self.routes.get(message_type) if isinstance(message_type, str) else None
+        if route is None:
+            self.rejected += 1
+            MESSAGES_REJECTED.inc()
+            if 'type' not in message:
+                raise ValueError("Missing required 'type' field")
+            raise ValueError("Unknown message type")
+        started = time.perf_counter()
+        failed = True
+        try:
+            route.schema.validate(message)
+            route.handler(client, message)
+            failed = False
+        finally:
+            route.record(time.perf_counter() - started, failed)
+        return route
+
+    def stats(self):
+        return {
+            'rejected': self.rejected,
+            'types': {message_type: route.snapshot() for message_type, route in self.routes.items()}
+        }
@@ -0,0 +1,141 @@
+import struct
+from typing import Iterator
+
+NEWLINE = 'newline'
+LENGTH_PREFIXED = 'length'
+FRAMINGS = (NEWLINE, LENGTH_PREFIXED)
+
+_LENGTH_HEADER = struct.Struct('!I')
+
+class FrameError(ValueError):
+    """Raised when the peer sends a frame the decoder cannot accept"""
+
+def encode_frame(payload: bytes, framing: str = NEWLINE) -> bytes:
+    """Wrap an encoded message so the peer's FrameDecoder can split it out again"""
+    if framing == LENGTH_PREFIXED:
+        return _LENGTH_HEADER.pack(len(payload)) + payload
+    return payload + b'\n'
+
+def decode_frame(frame: bytes, framing: str = NEWLINE) -> bytes:
+    """Strip the framing encode_frame added to one complete frame"""
+    if framing == LENGTH_PREFIXED:
+        return frame[_LENGTH_HEADER.size:]
+    return frame[:-1]
+
+class FrameDecoder:
+    """Incremental decoder that turns a TCP byte stream into complete messages.
+
+    Data is received straight into one reusable bytearray with recv_into, and
+    complete frames are handed out as memoryview slices of that buffer. A
+    slice is only valid until the next recv_from()/feed() call, so callers
+    must decode each frame before reading more data.
+
+    Supports newline-delimited frames ('newline') and frames prefixed with a
+    4-byte big-endian length ('length').
+    """
+
+    def __init__(self, framing: str = NEWLINE, buffer_size: int = 65536, max_frame_size: int = 1024 * 1024):
+        if framing not in FRAMINGS:
+            raise ValueError(f"Unknown framing '{framing}', expected one of {FRAMINGS}")
+        self.framing = framing
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # first unconsumed byte
+        self._end = 0    # end of received data
+        self._scan = 0   # where the next newline search resumes
+
+    def __len__(self):
+        return self._end - self._start
+
+    def recv_from(self, sock) -> int:
+        """Receive once from a socket into the buffer. Returns 0 on EOF."""
+        self._reserve(max(1, len(self._buffer) // 4))
+        received = sock.recv_into(self._view[self._end:])
+        self._end += received
+        return received
+
+    def feed(self, data: bytes):
+        """Append bytes that were read by someone else (e.g. an asyncio stream)"""
+        self._reserve(len(data))
+        self._view[self._end:self._end + len(data)] = data
+        self._end += len(data)
+
+    def peek(self, size: int) -> bytes:
+        """Return up to size buffered bytes without consuming them"""
+        return bytes(self._view[self._start:min(self._end, self._start + size)])
+
+    def take_all(self) -> bytes:
+        """Consume and return everything that is buffered, framed or not"""
+        data = bytes(self._view[self._start:self._end])
+        self._start = self._scan = self._end = 0
+        return data
+
+    def frames(self) -> Iterator[memoryview]:
+        """Yield every complete frame currently buffered.
+
+        The framing is looked up per frame, so switch_framing() called while
+        handling one frame applies to the frames after it.
+        """
+        while True:
+            if self.framing == LENGTH_PREFIXED:
+                frame = self._next_length_frame()
+            else:
+                frame = self._next_newline_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def switch_framing(self, framing: str):
+        """Decode everything after the current frame with another framing"""
+        if framing not in FRAMINGS:
+            raise ValueError(f"Unknown framing '{framing}', expected one of {FRAMINGS}")
+        self.framing = framing
+        self._scan = self._start
+
+    def _next_newline_frame(self):
+        while True:
+            newline = self._buffer.find(b'\n', max(self._scan, self._start), self._end)
+            if newline == -1:
+                self._scan = self._end
+                if len(self) > self.max_frame_size:
+                    raise FrameError(f"Frame exceeds {self.max_frame_size} bytes without a newline")
+                return None
+            start = self._start
+            stop = newline - 1 if newline > start and self._buffer[newline - 1] == 0x0D else newline
+            self._start = self._scan = newline + 1
+            if stop > start:
+                return self._view[start:stop]
+
+    def _next_length_frame(self):
+        header_size = _LENGTH_HEADER.size
+        if len(self) < header_size:
+            return None
+        (length,) = _LENGTH_HEADER.unpack_from(self._buffer, self._start)
+        if length > self.max_frame_size:
+            raise FrameError(f"Frame of {length} bytes exceeds {self.max_frame_size} bytes")
+        start = self._start + header_size
+        if self._end - start < length:
+            # Make sure the rest of this frame fits before the next recv
+            self._reserve(start + length - self._end)
+            return None
+        self._start = start + length
+        return self._view[start:start + length]
+
+    def _reserve(self, size: int):
+        """Make room for at least size more bytes after the buffered data"""
+        if self._start == self._end:
+            self._start = self._scan = self._end = 0
+        if len(self._buffer) - self._end >= size:
+            return
+        pending = self._end - self._start
+        if self._start and len(self._buffer) - pending >= size:
+            # Compact in place; same-size slice assignment never reallocates
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+        else:
+            grown = bytearray(max(len(self._buffer) * 2, pending + size))
+            grown[:pending] = self._view[self._start:self._end]
+            self._buffer = grown
+            self._view = memoryview(grown)
+        self._scan -= self._start
+        self._start, self._end = 0, pending
@@ -0,0 +1,239 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Sharded:
+    """Values kept per thread, so recording never takes a lock.
+
+    Each thread gets its own list of slots the first time it records; only
+    that thread writes it. Readers add the slots of all threads up. Slots of
+    threads that have exited are folded into a base total when read, so
+    short-lived threads do not pile up.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.shards: List[Tuple[threading.Thread, List[float]]] = []
+        self.retired = [0] * size
+
+    def shard(self) -> List[float]:
+        try:
+            return self.local.values
+        except AttributeError:
+            values = self.local.values = [0] * self.size
+            with self.lock:
+                self.shards.append((threading.current_thread(), values))
+            return values
+
+    def totals(self) -> List[float]:
+        with self.lock:
+            live = []
+            for thread, values in self.shards:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    self.retired = [a + b for a, b in zip(self.retired, values)]
+            self.shards = live
+            totals = list(self.retired)
+            for _, values in live:
+                totals = [a + b for a, b in zip(totals, values)]
+        return totals
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+class CounterChild:
+    def __init__(self):
+        self.values = _Sharded(1)
+
+    def inc(self, amount: float = 1):
+        self.values.shard()[0] += amount
+
+    def samples(self, name: str, labels: str) -> Iterable[str]:
+        yield f"{name}{labels} {_format_value(self.values.totals()[0])}"
+
+class GaugeChild:
+    def __init__(self):
+        self.value = 0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from function() at scrape time instead"""
+        self.function = function
+
+    def samples(self, name: str, labels: str) -> Iterable[str]:
+        value = self.value
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return
+        yield f"{name}{labels} {_format_value(value)}"
+
+class HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # One slot per bucket plus +Inf, then sum and count
+        self.values = _Sharded(len(self.buckets) + 3)
+
+    def observe(self, value: float):
+        values = self.values.shard()
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def time(self) -> _Timer:
+        """Observe the duration of a with block, in seconds"""
+        return _Timer(self)
+
+    def samples(self, name: str, labels: str, names=(), values=()) -> Iterable[str]:
+        totals = self.values.totals()
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), totals):
+            cumulative += count
+            le = 'le="%s"' % _format_value(float(bound))
+            yield f"{name}_bucket{_format_labels(names, values, le)} {cumulative}"
+        yield f"{name}_sum{labels} {_format_value(totals[-2])}"
+        yield f"{name}_count{labels} {_format_value(totals[-1])}"
+
+class Metric:
+    """A named metric with zero or more labels; labels(...) returns the child to record on"""
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Sequence[str], make_child: Callable):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.make_child = make_child
+        self.children: Dict[Tuple[str, ...], object] = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.children[()] = make_child()
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self.lock:
+                child = self.children.setdefault(values, self.make_child())
+        return child
+
+    def __getattr__(self, attribute):
+        # Unlabelled metrics record directly: counter.inc(), histogram.time()
+        if attribute in ('inc', 'set', 'set_function', 'observe', 'time') and not self.labelnames:
+            return getattr(self.children[()], attribute)
+        raise AttributeError(attribute)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {_escape(self.documentation)}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, child in list(self.children.items()):
+            labels = _format_labels(self.labelnames, values)
+            if self.kind == 'histogram':
+                yield from child.samples(self.name, labels, self.labelnames, values)
+            else:
+                yield from child.samples(self.name, labels)
+
+class MetricsRegistry:
+    """Counters, gauges and histograms exported in the Prometheus text format.
+
+    Registering a name twice returns the existing metric, so modules can
+    declare what they record at import time without coordinating.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.lock = threading.Lock()
+
+    def _register(self, kind, name, documentation, labelnames, make_child) -> Metric:
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = Metric(kind, name, documentation, labelnames, make_child)
+            elif metric.kind != kind or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered as a different {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Metric:
+        return self._register('counter', name, documentation, labelnames, CounterChild)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Metric:
+        return self._register('gauge', name, documentation, labelnames, GaugeChild)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Metric:
+        buckets = tuple(sorted(buckets))
+        return self._register('histogram', name, documentation, labelnames, lambda: HistogramChild(buckets))
+
+    def render(self) -> bytes:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return ('\n'.join(lines) + '\n').encode()
+
+# Shared by every module in the process
+REGISTRY = MetricsRegistry()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the log
+
+def start_metrics_server(port: int, host: str = '0.0.0.0', registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve /metrics on its own port, for processes without an HTTP API"""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
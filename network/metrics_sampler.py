@@ -0,0 +1,67 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+class MetricsSampler:
+    """Calls collect() every interval seconds and keeps the last history_size samples.
+
+    Readers only copy from the ring buffer, so serving the latest sample or the
+    whole series never touches psutil or the server's data structures. Every
+    sample carries a sequence number, which callers can use as its version.
+    """
+
+    def __init__(self, collect: Callable[[], Dict], interval: float = 5.0, history_size: int = 720,
+                 name: str = 'metrics-sampler'):
+        self.collect = collect
+        self.interval = interval
+        self.samples = deque(maxlen=history_size)
+        self.name = name
+        self.logger = logging.getLogger(name)
+        self.sequence = 0
+        self.running = False
+        self._stop = threading.Event()
+
+    def sample(self) -> Optional[Dict]:
+        try:
+            sample = self.collect()
+        except Exception as e:
+            self.logger.error(f"Error collecting metrics: {e}")
+            return None
+        sample['time'] = time.time()
+        self.sequence += 1  # only one thread samples at a time: start(), then run()
+        sample['sequence'] = self.sequence
+        self.samples.append(sample)  # deque.append is atomic, readers need no lock
+        return sample
+
+    def latest(self) -> Dict:
+        try:
+            return self.samples[-1]
+        except IndexError:
+            return {}
+
+    def history(self, since: Optional[float] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Samples taken after since, oldest first, at most the newest limit of them"""
+        samples = list(self.samples)
+        if since is not None:
+            samples = [sample for sample in samples if sample['time'] > since]
+        if limit is not None:
+            samples = samples[-limit:] if limit > 0 else []
+        return samples
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        """Take a first sample right away, then keep sampling in the background"""
+        if self.running:
+            return
+        self.running = True
+        self.sample()
+        threading.Thread(target=self.run, name=self.name, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
@@ -0,0 +1,304 @@
+import socket
+import ssl
+import logging
+import selectors
+import threading
+from collections import deque
+
+DROP = 'drop'
+COALESCE = 'coalesce'
+DISCONNECT = 'disconnect'
+SLOW_CONSUMER_POLICIES = (DROP, COALESCE, DISCONNECT)
+
+# Non-blocking send without touching the socket's own blocking mode, which
+# the reader thread relies on. Not available on Windows, where every
+# connection gets a ConnectionWriter instead of the shared SendPump.
+_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', 0)
+_WRITE_CHUNK = 64 * 1024
+
+class OutboundStats:
+    """Counters shared by every outbound queue of one server"""
+    FIELDS = ('enqueued', 'sent_frames', 'sent_bytes', 'dropped', 'coalesced', 'disconnected', 'send_errors')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, field, amount=1):
+        with self._lock:
+            self._counts[field] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+class OutboundQueue:
+    """Bounded queue of encoded frames waiting to be written to one connection.
+
+    When the queue is full the slow-consumer policy decides what happens:
+    'drop' discards the new frame, 'coalesce' replaces a queued frame with the
+    same key (e.g. the message type) and otherwise drops, and 'disconnect'
+    marks the queue as overflowed so the owner cuts the connection.
+    """
+
+    def __init__(self, max_frames=256, policy=DROP, stats=None):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy '{policy}', expected one of {SLOW_CONSUMER_POLICIES}")
+        self.max_frames = max_frames
+        self.policy = policy
+        self.stats = stats or OutboundStats()
+        self.frames = deque()  # [key, data] holders, oldest first
+        self.keyed = {}        # coalesce key -> newest queued holder with that key
+        self.offset = 0        # bytes of the head frame already written
+        self.overflowed = False
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def put(self, data, key=None) -> bool:
+        """Queue a frame. Returns False if it was not queued."""
+        with self.lock:
+            if self.overflowed:
+                return False
+            if len(self.frames) >= self.max_frames:
+                return self._overflow(data, key)
+            holder = [key, data]
+            self.frames.append(holder)
+            if key is not None:
+                self.keyed[key] = holder
+        self.stats.add('enqueued')
+        return True
+
+    def _overflow(self, data, key):
+        if self.policy == COALESCE and key is not None:
+            holder = self.keyed.get(key)
+            # The head frame may be half written, so it is never replaced
+            if holder is not None and holder is not self.frames[0]:
+                holder[1] = data
+                self.stats.add('coalesced')
+                return True
+        if self.policy == DISCONNECT:
+            self.overflowed = True
+            self.stats.add('disconnected')
+            return False
+        self.stats.add('dropped')
+        return False
+
+    def _pop_head(self):
+        holder = self.frames.popleft()
+        if holder[0] is not None and self.keyed.get(holder[0]) is holder:
+            del self.keyed[holder[0]]
+        self.offset = 0
+        self.stats.add('sent_frames')
+
+    def pop_all(self):
+        """Take every queued frame, for writers that buffer on their own (asyncio transports)"""
+        with self.lock:
+            frames = [data for _, data in self.frames]
+            self.frames.clear()
+            self.keyed.clear()
+            self.offset = 0
+        if frames:
+            self.stats.add('sent_frames', len(frames))
+            self.stats.add('sent_bytes', sum(len(data) for data in frames))
+        return frames
+
+    def write_to(self, sock) -> bool:
+        """Write as much as the socket takes without blocking. Returns True once the queue is empty.
+
+        TLS sockets take no send flags, and without MSG_DONTWAIT there are
+        none to pass, so on a blocking socket this blocks until everything is
+        written; those are drained by a ConnectionWriter.
+        """
+        flags = 0 if isinstance(sock, ssl.SSLSocket) else _DONTWAIT
+        while True:
+            with self.lock:
+                if not self.frames:
+                    return True
+                data = self.frames[0][1]
+                chunk = memoryview(data)[self.offset:self.offset + _WRITE_CHUNK]
+            try:
+                sent = sock.send(chunk, flags)
+            except (BlockingIOError, InterruptedError, ssl.SSLWantWriteError):
+                return False
+            self.stats.add('sent_bytes', sent)
+            with self.lock:
+                self.offset += sent
+                if self.offset >= len(data):
+                    self._pop_head()
+                elif sent < len(chunk):
+                    # Socket buffer is full; wait until it is writable again
+                    return False
+
+class SendPump:
+    """Background writer that drains QueuedConnections with non-blocking sends.
+
+    One pump thread serves every connection of a server, so a stalled client
+    only ever fills its own queue instead of blocking the broadcasting thread.
+    """
+
+    def __init__(self, name='send-pump'):
+        self.logger = logging.getLogger('outbound_queue')
+        self.selector = selectors.DefaultSelector()
+        self._pending = deque()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self._thread.start()
+
+    def schedule(self, connection):
+        """Ask the pump thread to flush or close a connection"""
+        self._pending.append(connection)
+        try:
+            self._wake_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # A wake-up is already pending
+
+    def run(self):
+        while True:
+            for key, _ in self.selector.select():
+                if key.fileobj is self._wake_r:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    self._flush(key.data)
+            while self._pending:
+                self._flush(self._pending.popleft())
+
+    def _flush(self, connection):
+        if connection.closed:
+            self._unregister(connection)
+            if connection.close_socket:
+                if not connection.aborted:
+                    # Best effort: push out frames queued just before close()
+                    try:
+                        connection.queue.write_to(connection.sock)
+                    except OSError:
+                        pass
+                try:
+                    connection.sock.close()
+                except OSError:
+                    pass
+            return
+        if connection.aborted:
+            self._unregister(connection)
+            return
+        try:
+            done = connection.queue.write_to(connection.sock)
+        except OSError as e:
+            self.logger.error(f"Send to {connection.name} failed: {e}")
+            connection.queue.stats.add('send_errors')
+            self._unregister(connection)
+            connection.abort()
+            return
+        if done:
+            self._unregister(connection)
+        elif not connection.registered:
+            self.selector.register(connection.sock, selectors.EVENT_WRITE, connection)
+            connection.registered = True
+
+    def _unregister(self, connection):
+        if connection.registered:
+            try:
+                self.selector.unregister(connection.sock)
+            except (KeyError, ValueError, OSError):
+                pass
+            connection.registered = False
+
+class ConnectionWriter:
+    """Writer thread of its own for one connection.
+
+    Used for TLS sockets, which cannot be sent to with MSG_DONTWAIT, and for
+    every socket where the platform lacks MSG_DONTWAIT. The reader thread
+    needs the socket blocking, so writing to it may block. Doing that here
+    stalls only this connection instead of every connection of the SendPump.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.logger = logging.getLogger('outbound_queue')
+        self.wake = threading.Event()
+        threading.Thread(target=self.run, name=f'writer-{connection.name}', daemon=True).start()
+
+    def schedule(self, connection):
+        self.wake.set()
+
+    def run(self):
+        connection = self.connection
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            if connection.closed:
+                if connection.close_socket:
+                    try:
+                        if not connection.aborted:
+                            connection.queue.write_to(connection.sock)
+                        connection.sock.close()
+                    except OSError:
+                        pass
+                return
+            if connection.aborted:
+                return
+            try:
+                connection.queue.write_to(connection.sock)
+            except OSError as e:
+                self.logger.error(f"Send to {connection.name} failed: {e}")
+                connection.queue.stats.add('send_errors')
+                connection.abort()
+                return
+
+class QueuedConnection:
+    """Socket-like wrapper whose send() enqueues the frame for the SendPump.
+
+    Reading still happens on the wrapped socket; only writes go through the
+    queue, so callers never block on a slow peer. TLS sockets, and all
+    sockets where MSG_DONTWAIT is missing, get a ConnectionWriter instead of
+    the shared pump.
+    """
+
+    def __init__(self, sock, pump, max_frames=256, policy=DROP, stats=None, name=None):
+        self.sock = sock
+        self.queue = OutboundQueue(max_frames, policy, stats)
+        self.name = name or str(sock)
+        self.closed = False
+        self.aborted = False
+        self.close_socket = True
+        self.registered = False  # only touched by the pump thread
+        self.wire = None         # WireFormat negotiated by the peer, None for the server default
+        if isinstance(sock, ssl.SSLSocket) or not _DONTWAIT:
+            self.pump = ConnectionWriter(self)
+        else:
+            self.pump = pump
+
+    def send(self, data, key=None):
+        if self.closed or self.aborted:
+            return 0
+        if self.queue.put(data, key):
+            self.pump.schedule(self)
+        elif self.queue.overflowed:
+            logging.getLogger('outbound_queue').warning(f"Disconnecting slow consumer {self.name}")
+            self.abort()
+        return len(data)
+
+    def abort(self):
+        """Cut the connection; the reader sees EOF and runs its normal cleanup"""
+        if self.aborted:
+            return
+        self.aborted = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self, close_socket=True):
+        """Stop sending; the pump unregisters the socket and closes it if asked to"""
+        if not self.closed:
+            self.closed = True
+            self.close_socket = close_socket
+            self.pump.schedule(self)
@@ -0,0 +1,100 @@
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+class PortPool:
+    """Leases UDP port pairs to matches from a configurable range.
+
+    Each match gets two consecutive ports (home, away). Leases go back to the
+    pool when the match ends or, for matches that are never ended, once the
+    lease timeout has passed.
+    """
+
+    def __init__(self, start_port: int, end_port: int, lease_timeout: float = 7200):
+        if start_port < 1024 or end_port > 65535 or end_port <= start_port:
+            raise ValueError(f"Invalid UDP port range {start_port}-{end_port}")
+        self.start_port = start_port
+        self.end_port = end_port
+        self.lease_timeout = lease_timeout
+        self.logger = logging.getLogger('port_pool')
+        self.lock = threading.Lock()
+        self.free = deque(range(start_port, end_port, 2))  # base port of every free pair
+        self.total_pairs = len(self.free)
+        self.leases = {}   # match_id -> (base_port, expires_at)
+        self.expiry = []   # heap of (expires_at, match_id)
+
+    def lease(self, match_id) -> Optional[Dict[str, int]]:
+        """Lease a port pair for a match. Returns None when the pool is exhausted."""
+        with self.lock:
+            if match_id in self.leases:
+                base = self.leases[match_id][0]
+                return {'home': base, 'away': base + 1}
+            self._reap_expired(time.monotonic())  # cheap unless a lease is actually overdue
+            if not self.free:
+                self.logger.error(f"No free UDP port pairs left for match {match_id}")
+                return None
+            base = self.free.popleft()
+            expires_at = time.monotonic() + self.lease_timeout
+            self.leases[match_id] = (base, expires_at)
+            heapq.heappush(self.expiry, (expires_at, match_id))
+        self.logger.info(f"Leased UDP ports {base}/{base + 1} to match {match_id}")
+        return {'home': base, 'away': base + 1}
+
+    def release(self, match_id) -> bool:
+        with self.lock:
+            lease = self.leases.pop(match_id, None)
+            if lease is None:
+                return False
+            self.free.append(lease[0])
+        self.logger.info(f"Released UDP ports {lease[0]}/{lease[0] + 1} from match {match_id}")
+        return True
+
+    def reap_expired(self) -> int:
+        with self.lock:
+            return self._reap_expired(time.monotonic())
+
+    def _reap_expired(self, now) -> int:
+        reaped = 0
+        while self.expiry and self.expiry[0][0] <= now:
+            expires_at, match_id = heapq.heappop(self.expiry)
+            lease = self.leases.get(match_id)
+            # Skip heap entries left behind by leases that were already released
+            if lease is not None and lease[1] == expires_at:
+                del self.leases[match_id]
+                self.free.append(lease[0])
+                self.logger.warning(f"UDP port lease for match {match_id} timed out")
+                reaped += 1
+        return reaped
+
+    def snapshot(self) -> List[List]:
+        """Current leases as [match_id, base_port, seconds_left], for a restart handoff"""
+        now = time.monotonic()
+        with self.lock:
+            return [[match_id, base, max(0.0, expires_at - now)] for match_id, (base, expires_at) in self.leases.items()]
+
+    def restore(self, leases: List[List]):
+        """Re-take leases handed over by the previous server process"""
+        now = time.monotonic()
+        with self.lock:
+            for match_id, base, seconds_left in leases:
+                if base not in self.free or match_id in self.leases:
+                    continue
+                self.free.remove(base)
+                expires_at = now + seconds_left
+                self.leases[match_id] = (base, expires_at)
+                heapq.heappush(self.expiry, (expires_at, match_id))
+
+    def stats(self) -> Dict:
+        with self.lock:
+            self._reap_expired(time.monotonic())  # overdue leases are not in use
+            leased = len(self.leases)
+        return {
+            'range': [self.start_port, self.end_port],
+            'total_pairs': self.total_pairs,
+            'leased_pairs': leased,
+            'free_pairs': self.total_pairs - leased,
+            'utilisation': round(leased / self.total_pairs, 4) if self.total_pairs else 0.0
+        }
@@ -1,8 +1,16 @@
 import socket
 import struct
 import logging
+import time
 from datetime import datetime
 from threading import Thread
+from config import NETWORK_CONFIG
+from network.db_pool import get_pool
+from network.metrics_registry import REGISTRY, start_metrics_server
+
+STUN_REQUESTS = REGISTRY.counter('pes_stun_requests_total', 'STUN requests by outcome', ['outcome'])
+STUN_BINDING_SECONDS = REGISTRY.histogram('pes_stun_binding_seconds',
+                                          'Time to answer an authenticated STUN binding request').labels()
 
 class STUNServer:
     def __init__(self, host='0.0.0.0', port=3478, log_level=1, max_requests_per_min=100):
@@ -125,15 +133,18 @@ class STUNServer:
         return response
 
     def handle_request(self, data, addr):
+        started = time.perf_counter()
         try:
             # Check rate limit
             if not self._check_rate_limit(addr):
+                STUN_REQUESTS.labels('rate_limited').inc()
                 error_response = self._create_error_response(429, b'\x00' * 16)  # 429 = Too Many Requests
                 self.sock.sendto(error_response, addr)
                 return
                 
             # Basic packet validation
             if len(data) < 20:
+                STUN_REQUESTS.labels('malformed').inc()
                 if self.log_level > 1:
                     logging.debug(f"Invalid STUN packet length from {addr[0]}:{addr[1]}")
                 error_response = self._create_error_response(400, b'\x00' * 16)  # 400 = Bad Request
@@ -146,6 +157,7 @@ class STUNServer:
                 msg_len = struct.unpack('!H', data[2:4])[0]
                 transaction_id = data[4:20]
             except struct.error as e:
+                STUN_REQUESTS.labels('malformed').inc()
                 if self.log_level > 1:
                     logging.debug(f"STUN packet parsing error from {addr[0]}:{addr[1]}: {str(e)}")
                 error_response = self._create_error_response(400, b'\x00' * 16)  # 400 = Bad Request
@@ -154,6 +166,7 @@ class STUNServer:
                 
             # Validate message length
             if len(data) != msg_len + 20:
+                STUN_REQUESTS.labels('malformed').inc()
                 if self.log_level > 1:
                     logging.debug(f"Invalid STUN packet length from {addr[0]}:{addr[1]}")
                 error_response = self._create_error_response(400, transaction_id)  # 400 = Bad Request
@@ -167,6 +180,7 @@ class STUNServer:
                     # Send authentication challenge
                     challenge = self._create_auth_challenge(transaction_id)
                     self.sock.sendto(challenge, addr)
+                    STUN_REQUESTS.labels('challenged').inc()
                     
                     if self.log_level > 1:
                         logging.debug(f"Sent authentication challenge to {addr[0]}:{addr[1]}")
@@ -178,15 +192,19 @@ class STUNServer:
                 # Validate XOR-MAPPED-ADDRESS before sending
                 if not self._validate_xor_address(addr, response[20:36]):
                     logging.warning(f"Invalid XOR-MAPPED-ADDRESS from {addr[0]}:{addr[1]}")
+                    STUN_REQUESTS.labels('invalid_address').inc()
                     error_response = self._create_error_response(400, transaction_id)  # 400 = Bad Request
                     self.sock.sendto(error_response, addr)
                     return
                     
                 self.sock.sendto(response, addr)
+                STUN_REQUESTS.labels('binding').inc()
+                STUN_BINDING_SECONDS.observe(time.perf_counter() - started)
                 
                 if self.log_level > 1:
                     logging.debug(f"Handled Binding Request from {addr[0]}:{addr[1]}")
             else:
+                STUN_REQUESTS.labels('unsupported').inc()
                 if self.log_level > 1:
                     logging.debug(f"Unsupported STUN message type {msg_type:04x} from {addr[0]}:{addr[1]}")
                 return
@@ -197,6 +215,7 @@ class STUNServer:
             if self.log_level > 1:
                 logging.debug(f"STUN packet parsing error from {addr[0]}:{addr[1]}: {str(e)}")
         except Exception as e:
+            STUN_REQUESTS.labels('error').inc()
             logging.error(f"Error handling STUN request from {addr[0]}:{addr[1]}: {str(e)}")
             
     def _xor_mapped_address(self, transaction_id, addr):
@@ -268,19 +287,9 @@ class STUNServer:
     def _get_user_credentials(self, username):
         """Retrieve user credentials from WordPress database"""
         try:
-            import mysql.connector
-            db = mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="",
-                database="wp"
-            )
-            cursor = db.cursor()
-            cursor.execute("SELECT user_pass FROM wp_users WHERE user_login = %s", (username,))
-            result = cursor.fetchone()
-            cursor.close()
-            db.close()
-            return result[0] if result else None
+            result = get_pool().query_one('stun_credentials',
+                                          "SELECT user_pass FROM wp_users WHERE user_login = %s", (username,))
+            return result['user_pass'] if result else None
         except Exception as e:
             logging.error(f"Database error retrieving credentials: {str(e)}")
             return None
@@ -390,5 +399,8 @@ class STUNServer:
                 
         return True
             
-def run_stun_server():
-    server = ST
+def run_stun_server(metrics_port=NETWORK_CONFIG['metrics_ports']['stun']):
+    if metrics_port:
+        start_metrics_server(metrics_port)
+    server = STUNServer()
+    server.start()
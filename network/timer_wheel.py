@@ -0,0 +1,169 @@
+import logging
+import math
+import socket
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional
+
+class TimerWheel:
+    """Hashed timing wheel: O(1) schedule and cancel, expiry found once per tick.
+
+    A timer lands in slot (position + ticks) % slots with the number of full
+    turns of the wheel it still has to wait. Not thread-safe; IdleReaper
+    serializes access to it.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512, now: Optional[float] = None):
+        self.tick = tick
+        self.slots: List[Dict[Hashable, int]] = [{} for _ in range(slots)]  # key -> rounds left
+        self.timers: Dict[Hashable, int] = {}  # key -> slot index
+        self.position = 0
+        self.time = time.monotonic() if now is None else now  # time the current slot was reached
+
+    def __len__(self):
+        return len(self.timers)
+
+    def schedule(self, key: Hashable, delay: float):
+        """Fire key after delay seconds (rounded up to whole ticks), replacing any timer it had"""
+        self.cancel(key)
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot = (self.position + ticks) % len(self.slots)
+        self.slots[slot][key] = (ticks - 1) // len(self.slots)
+        self.timers[key] = slot
+
+    def cancel(self, key: Hashable) -> bool:
+        slot = self.timers.pop(key, None)
+        if slot is None:
+            return False
+        del self.slots[slot][key]
+        return True
+
+    def advance(self, now: Optional[float] = None) -> List[Hashable]:
+        """Move the wheel up to now and return the keys whose timers fired"""
+        now = time.monotonic() if now is None else now
+        expired = []
+        while now - self.time >= self.tick:
+            self.time += self.tick
+            self.position = (self.position + 1) % len(self.slots)
+            bucket = self.slots[self.position]
+            for key, rounds in list(bucket.items()):
+                if rounds:
+                    bucket[key] = rounds - 1
+                else:
+                    del bucket[key]
+                    del self.timers[key]
+                    expired.append(key)
+        return expired
+
+class IdleReaper:
+    """Closes connections that have gone quiet, including half-open ones.
+
+    touch() only stores a timestamp, so recording activity costs O(1), a
+    short lock hold and no wheel operation. When a connection's timer fires, the reaper checks its
+    last activity and either expires it or re-arms the timer for what is left
+    of its deadline. Connections get handshake_timeout until established(),
+    then idle_timeout; with an idle_timeout of 0 established connections are
+    no longer tracked.
+    """
+
+    def __init__(self, on_expire: Callable[[Hashable, float], None], idle_timeout: float,
+                 handshake_timeout: Optional[float] = None, tick: float = 1.0, slots: int = 512,
+                 name: str = 'idle-reaper'):
+        self.on_expire = on_expire
+        self.idle_timeout = idle_timeout
+        self.handshake_timeout = handshake_timeout or idle_timeout
+        self.name = name
+        self.logger = logging.getLogger(name)
+        self.lock = threading.Lock()
+        self.wheel = TimerWheel(tick, slots)
+        self.last_seen: Dict[Hashable, float] = {}
+        self.timeouts: Dict[Hashable, float] = {}  # key -> deadline currently in force
+        self.reaped = 0
+        self.running = False
+
+    def register(self, key: Hashable):
+        with self.lock:
+            self.last_seen[key] = time.monotonic()
+            self.timeouts[key] = self.handshake_timeout
+            self.wheel.schedule(key, self.handshake_timeout)
+
+    def touch(self, key: Hashable):
+        """Record activity on a connection"""
+        now = time.monotonic()
+        with self.lock:
+            # Under the lock, so a connection just reaped or unregistered is not re-added
+            if key in self.last_seen:
+                self.last_seen[key] = now
+
+    def established(self, key: Hashable):
+        """The connection identified itself; from now on only the idle deadline applies"""
+        with self.lock:
+            if key not in self.timeouts:
+                return
+            if self.idle_timeout:
+                self.timeouts[key] = self.idle_timeout
+            else:
+                self.wheel.cancel(key)
+                del self.last_seen[key]
+                del self.timeouts[key]
+
+    def unregister(self, key: Hashable):
+        with self.lock:
+            self.wheel.cancel(key)
+            self.last_seen.pop(key, None)
+            self.timeouts.pop(key, None)
+
+    def reap(self, now: Optional[float] = None) -> int:
+        """Expire the connections whose deadline has passed; returns how many"""
+        now = time.monotonic() if now is None else now
+        expired = []
+        with self.lock:
+            for key in self.wheel.advance(now):
+                idle = now - self.last_seen[key]
+                timeout = self.timeouts[key]
+                if idle >= timeout:
+                    del self.last_seen[key]
+                    del self.timeouts[key]
+                    expired.append((key, idle))
+                else:
+                    self.wheel.schedule(key, timeout - idle)
+            self.reaped += len(expired)
+        for key, idle in expired:
+            try:
+                self.on_expire(key, idle)
+            except Exception as e:
+                self.logger.error(f"Error closing idle connection: {e}")
+        return len(expired)
+
+    def run(self):
+        while self.running:
+            time.sleep(self.wheel.tick)
+            self.reap()
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            threading.Thread(target=self.run, name=self.name, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        with self.lock:
+            return {
+                'tracked': len(self.last_seen),
+                'reaped': self.reaped,
+                'idle_timeout': self.idle_timeout,
+                'handshake_timeout': self.handshake_timeout
+            }
+
+def enable_keepalive(sock: socket.socket, idle: float, interval: float, count: int):
+    """Have the kernel probe a quiet connection and fail it once the peer stops answering.
+
+    Catches dead peers on connections the IdleReaper does not time out. The
+    tuning options are Linux ones; elsewhere only the system defaults apply.
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)):
+        if hasattr(socket, option):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), int(value))
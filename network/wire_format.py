@@ -0,0 +1,210 @@
+import json
+import struct
+from typing import Optional
+
+from network.message_framing import LENGTH_PREFIXED, NEWLINE, encode_frame
+
+try:
+    import msgpack
+except ImportError:  # optional; the msgpack codec is simply not offered
+    msgpack = None
+
+class JSONCodec:
+    name = 'json'
+    binary = False
+
+    def encode(self, message: dict) -> bytes:
+        return json.dumps(message).encode()
+
+    def decode(self, payload) -> dict:
+        return json.loads(bytes(payload))
+
+class MsgpackCodec:
+    name = 'msgpack'
+    binary = True
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, payload) -> dict:
+        try:
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        except Exception as e:
+            raise ValueError(f"Invalid msgpack payload: {e}")
+
+# Compact codec: one tag byte, then a struct-packed body for the hot message
+# types or a generic (msgpack, else JSON) body for everything else.
+_TAG_JSON = 0x00
+_TAG_MSGPACK = 0x01
+_TAG_POSITION_UPDATE = 0x10
+_TAG_STATE_SYNC = 0x11
+
+_TEAMS = ('home', 'away')
+_POSITION_UPDATE = struct.Struct('!BB')   # tag, team index
+_POSITION_UPDATE_KEYS = {'type', 'match_id', 'player_id', 'team', 'position'}
+_STATE_SYNC = struct.Struct('!Bd')        # tag, timestamp
+_STATE_SYNC_KEYS = {'type', 'match_id', 'state', 'timestamp'}
+_STR_LENGTH = struct.Struct('!H')
+_INT_ID = struct.Struct('!q')
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode()
+    return _STR_LENGTH.pack(len(data)) + data
+
+def _unpack_str(payload, offset: int):
+    (length,) = _STR_LENGTH.unpack_from(payload, offset)
+    offset += _STR_LENGTH.size
+    return bytes(payload[offset:offset + length]).decode(), offset + length
+
+def _pack_id(value) -> bytes:
+    """Match ids are ints in some servers and strings in others"""
+    if isinstance(value, bool):
+        raise TypeError('id must be an int or a string')
+    if isinstance(value, int):
+        return b'i' + _INT_ID.pack(value)
+    if isinstance(value, str):
+        return b's' + _pack_str(value)
+    if value is None:
+        return b'n'
+    raise TypeError('id must be an int or a string')
+
+def _unpack_id(payload, offset: int):
+    kind = payload[offset:offset + 1]
+    offset += 1
+    if kind == b'i':
+        return _INT_ID.unpack_from(payload, offset)[0], offset + _INT_ID.size
+    if kind == b's':
+        return _unpack_str(payload, offset)
+    if kind == b'n':
+        return None, offset
+    raise ValueError('Invalid id field')
+
+class CompactCodec:
+    name = 'compact'
+    binary = True
+
+    def encode(self, message: dict) -> bytes:
+        try:
+            message_type = message.get('type')
+            if message_type == 'position_update' and message.keys() == _POSITION_UPDATE_KEYS:
+                return (_POSITION_UPDATE.pack(_TAG_POSITION_UPDATE, _TEAMS.index(message['team']))
+                        + _pack_id(message['match_id'])
+                        + _pack_str(message['player_id'])
+                        + _pack_str(message['position']))
+            if message_type == 'state_sync' and message.keys() <= _STATE_SYNC_KEYS and 'state' in message:
+                return (_STATE_SYNC.pack(_TAG_STATE_SYNC, message.get('timestamp', 0.0))
+                        + _pack_id(message.get('match_id'))
+                        + self._encode_generic(message['state']))
+        except (ValueError, TypeError, AttributeError, struct.error):
+            pass  # Does not fit the fixed layout; send it generically
+        return self._encode_generic(message)
+
+    def decode(self, payload) -> dict:
+        payload = bytes(payload)
+        if not payload:
+            raise ValueError('Empty compact payload')
+        try:
+            tag = payload[0]
+            if tag == _TAG_POSITION_UPDATE:
+                _, team = _POSITION_UPDATE.unpack_from(payload)
+                match_id, offset = _unpack_id(payload, _POSITION_UPDATE.size)
+                player_id, offset = _unpack_str(payload, offset)
+                position, offset = _unpack_str(payload, offset)
+                return {
+                    'type': 'position_update',
+                    'match_id': match_id,
+                    'player_id': player_id,
+                    'team': _TEAMS[team],
+                    'position': position
+                }
+            if tag == _TAG_STATE_SYNC:
+                _, timestamp = _STATE_SYNC.unpack_from(payload)
+                match_id, offset = _unpack_id(payload, _STATE_SYNC.size)
+                message = {'type': 'state_sync', 'state': self._decode_generic(payload[offset:]), 'timestamp': timestamp}
+                if match_id is not None:
+                    message['match_id'] = match_id
+                return message
+            return self._decode_generic(payload)
+        except (IndexError, UnicodeDecodeError, struct.error) as e:
+            raise ValueError(f"Invalid compact payload: {e}")
+
+    def _encode_generic(self, value) -> bytes:
+        if msgpack is not None:
+            return bytes((_TAG_MSGPACK,)) + msgpack.packb(value, use_bin_type=True)
+        return bytes((_TAG_JSON,)) + json.dumps(value).encode()
+
+    def _decode_generic(self, payload: bytes):
+        if not payload:
+            raise ValueError('Empty compact payload')
+        if payload[0] == _TAG_MSGPACK:
+            if msgpack is None:
+                raise ValueError('msgpack payload received but msgpack is not installed')
+            return MsgpackCodec().decode(payload[1:])
+        if payload[0] == _TAG_JSON:
+            return json.loads(payload[1:])
+        raise ValueError(f"Unknown compact tag {payload[0]}")
+
+JSON = JSONCodec()
+CODECS = {'json': JSON, 'compact': CompactCodec()}
+if msgpack is not None:
+    CODECS['msgpack'] = MsgpackCodec()
+
+class WireFormat:
+    """Codec and framing used on one connection.
+
+    Instances are shared through get_format(), so a broadcast can encode a
+    message once per distinct format instead of once per client.
+    """
+
+    def __init__(self, codec, framing: str = NEWLINE):
+        self.codec = codec
+        self.framing = framing
+
+    @property
+    def name(self) -> str:
+        return self.codec.name
+
+    def encode(self, message: dict) -> bytes:
+        return encode_frame(self.codec.encode(message), self.framing)
+
+    def decode(self, payload) -> dict:
+        return self.codec.decode(payload)
+
+_formats = {}
+
+def get_format(name: str = 'json', framing: str = NEWLINE) -> WireFormat:
+    key = (name, framing)
+    if key not in _formats:
+        _formats[key] = WireFormat(CODECS[name], framing)
+    return _formats[key]
+
+def negotiate(requested, framing: str = NEWLINE) -> Optional[WireFormat]:
+    """Pick the first codec in a client's 'wire_formats' list that is available.
+
+    Binary payloads may contain newlines, so binary codecs always switch the
+    connection to length-prefixed framing.
+    """
+    if isinstance(requested, str):
+        requested = [requested]
+    if not isinstance(requested, list):
+        return None
+    for name in requested:
+        codec = CODECS.get(name) if isinstance(name, str) else None
+        if codec is not None:
+            return get_format(name, LENGTH_PREFIXED if codec.binary else framing)
+    return None
+
+def negotiate_first_message(message, framing: str = NEWLINE) -> Optional[WireFormat]:
+    """Pop the 'wire_formats' list off a connection's first message.
+
+    Returns the format both sides switch to after the acknowledgement, or
+    None if the client did not ask for one. Unsupported requests fall back
+    to JSON.
+    """
+    if not isinstance(message, dict) or 'wire_formats' not in message:
+        return None
+    return negotiate(message.pop('wire_formats'), framing) or get_format('json', framing)
+
+def wire_format_ack(wire: WireFormat) -> dict:
+    """Reply telling the client which format both sides use from now on"""
+    return {'type': 'wire_format', 'format': wire.name, 'framing': wire.framing}
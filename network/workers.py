@@ -0,0 +1,81 @@
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, Tuple
+
+def reuseport_supported() -> bool:
+    """Several processes can only share a listening port with SO_REUSEPORT"""
+    return os.name == 'posix' and hasattr(socket, 'SO_REUSEPORT')
+
+def worker_port_range(start_port: int, end_port: int, worker_id: int, workers: int) -> Tuple[int, int]:
+    """This worker's share of a UDP port range, in whole (home, away) pairs"""
+    pairs = (end_port - start_port) // 2 // workers
+    if pairs < 1:
+        raise ValueError(f"UDP port range {start_port}-{end_port} is too small for {workers} workers")
+    first = start_port + worker_id * pairs * 2
+    return first, first + pairs * 2
+
+def run_workers(count: int, target: Callable[[int], None], respawn_delay: float = 1.0):
+    """Fork count worker processes running target(worker_id) and keep them alive.
+
+    A worker that dies is started again with the same id. SIGTERM and SIGINT
+    are passed on to the workers, and this returns once they have all exited.
+    Fork before creating threads: only the forking thread survives in a child.
+    """
+    if not reuseport_supported():
+        raise OSError('Worker mode needs fork() and SO_REUSEPORT')
+    children: Dict[int, int] = {}  # pid -> worker_id
+    stopping = False
+
+    def spawn(worker_id):
+        pid = os.fork()
+        if pid == 0:
+            # Unwind on SIGTERM like on Ctrl-C so the worker cleans up after itself
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            status = 0
+            try:
+                target(worker_id)
+            except KeyboardInterrupt:
+                pass
+            except Exception as e:
+                logging.error(f"Worker {worker_id} failed: {e}")
+                status = 1
+            finally:
+                logging.shutdown()
+                os._exit(status)
+        children[pid] = worker_id
+        logging.info(f"Started worker {worker_id} (pid {pid})")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    previous = {sig: signal.signal(sig, stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        for worker_id in range(count):
+            spawn(worker_id)
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            worker_id = children.pop(pid, None)
+            if worker_id is None or stopping:
+                continue
+            logging.error(f"Worker {worker_id} (pid {pid}) exited with status {status}, restarting it")
+            time.sleep(respawn_delay)
+            if not stopping:
+                spawn(worker_id)
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
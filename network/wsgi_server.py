@@ -0,0 +1,148 @@
+import logging
+import queue
+import threading
+import time
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler, make_server
+
+SERVER_MODES = ('production', 'development')
+
+class PooledRequestHandler(WSGIRequestHandler):
+    """HTTP/1.1 keep-alive handler with separate idle and request timeouts"""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.requests_handled = 0
+
+    def handle_one_request(self):
+        # Waiting for the next request on a kept-alive connection gets the short
+        # keep-alive timeout; parse_request() switches to the request timeout
+        server = self.server
+        self.connection.settimeout(server.keepalive_timeout if self.requests_handled else server.request_timeout)
+        self.requests_handled += 1
+        super().handle_one_request()
+        if server.stopping:
+            self.close_connection = True
+
+    def parse_request(self):
+        self.connection.settimeout(self.server.request_timeout)
+        return super().parse_request()
+
+    def make_environ(self):
+        environ = super().make_environ()
+        environ['wsgi_server.detach'] = self.detach
+        return environ
+
+    def detach(self, callback):
+        """Keep the connection open after this response and pass it to callback(socket).
+
+        The response goes out as HTTP/1.0 without a length, so whatever the
+        callback writes later continues its body. Frees the pool thread for
+        long-lived streams.
+        """
+        self.protocol_version = 'HTTP/1.0'
+        self.server.detached[self.connection] = callback
+
+class PooledWSGIServer(BaseWSGIServer):
+    """werkzeug WSGI server that serves connections on a fixed pool of threads.
+
+    Accepted connections wait in a bounded queue for a free worker; when the
+    queue is full they get an immediate 503 instead of a new thread. On
+    server_close() workers finish the requests in flight, kept-alive
+    connections are closed after their current request, and the pool is
+    given shutdown_timeout seconds to drain.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads=16, backlog=64, request_timeout=30,
+                 keepalive_timeout=5, shutdown_timeout=10, ssl_context=None, fd=None):
+        self.threads = threads
+        self.request_timeout = request_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.stopping = False
+        self.pending = queue.Queue(maxsize=backlog)
+        self.detached = {}  # connection -> callback taking it over after its response
+        self.workers = []
+        self.logger = logging.getLogger('wsgi_server')
+        super().__init__(host, port, app, handler=PooledRequestHandler, ssl_context=ssl_context, fd=fd)
+        for number in range(threads):
+            worker = threading.Thread(target=self.work, name=f'wsgi-worker-{number}', daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def process_request(self, request, client_address):
+        try:
+            self.pending.put_nowait((request, client_address))
+        except queue.Full:
+            self.logger.warning(f"All {self.threads} API workers busy, rejecting {client_address[0]}")
+            self.reject(request)
+
+    def reject(self, request):
+        try:
+            request.sendall(b'HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n'
+                            b'Connection: close\r\nRetry-After: 1\r\n\r\n')
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def work(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                callback = self.detached.pop(request, None)
+                if callback is None:
+                    self.shutdown_request(request)
+                else:
+                    self.hand_over(request, callback)
+
+    def hand_over(self, request, callback):
+        try:
+            callback(request)
+        except Exception as e:
+            self.logger.error(f"Cannot hand over detached connection: {e}")
+            self.shutdown_request(request)
+
+    def server_close(self):
+        """Stop accepting, then let the workers drain for up to shutdown_timeout seconds"""
+        super().server_close()
+        if not getattr(self, 'workers', None) or self.stopping:
+            return
+        self.stopping = True
+        deadline = time.monotonic() + self.shutdown_timeout
+        try:
+            for _ in self.workers:
+                self.pending.put(None, timeout=max(0, deadline - time.monotonic()))  # after every queued connection
+        except queue.Full:
+            pass
+        for worker in self.workers:
+            worker.join(max(0, deadline - time.monotonic()))
+        busy = sum(worker.is_alive() for worker in self.workers)
+        if busy:
+            self.logger.warning(f"{busy} API workers still busy after {self.shutdown_timeout}s")
+
+def create_wsgi_server(host, port, app, mode='production', config=None, ssl_context=None, fd=None):
+    """Build the server for the API: the thread-pooled one or werkzeug's thread-per-request one"""
+    if mode not in SERVER_MODES:
+        raise ValueError(f"Unknown API server mode '{mode}', expected one of {SERVER_MODES}")
+    if mode == 'development':
+        return make_server(host, port, app, threaded=True, ssl_context=ssl_context, fd=fd)
+    config = config or {}
+    return PooledWSGIServer(
+        host, port, app,
+        threads=config.get('threads', 16),
+        backlog=config.get('backlog', 64),
+        request_timeout=config.get('request_timeout', 30),
+        keepalive_timeout=config.get('keepalive_timeout', 5),
+        shutdown_timeout=config.get('shutdown_timeout', 10),
+        ssl_context=ssl_context,
+        fd=fd
+    )
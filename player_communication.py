@@ -1,29 +1,44 @@
-
 import json
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
+from config import NETWORK_CONFIG
+from network.message_framing import encode_frame
+from network.outbound_queue import OutboundStats, QueuedConnection, SendPump
 
 class PlayerCommunication:
-    def __init__(self):
+    def __init__(self, send_pump: Optional[SendPump] = None):
         self.connected_players = {}
         self.logger = logging.getLogger('player_communication')
+        self.outbound_stats = OutboundStats()
+        self.send_pump = send_pump or SendPump('player-send-pump')
 
     def register_player(self, player_id: str, client_socket) -> None:
-        self.connected_players[player_id] = client_socket
+        self.connected_players[player_id] = QueuedConnection(
+            client_socket,
+            self.send_pump,
+            NETWORK_CONFIG['send_queue_size'],
+            NETWORK_CONFIG['slow_consumer_policy'],
+            self.outbound_stats,
+            name=player_id
+        )
         self.logger.info(f"Player {player_id} registered")
 
+    def encode_message(self, message: Dict) -> bytes:
+        return encode_frame(json.dumps(message).encode(), NETWORK_CONFIG['framing'])
+
     def broadcast_to_team(self, team: List[str], message: Dict) -> None:
+        payload = self.encode_message(message)
         for player_id in team:
             if player_id in self.connected_players:
                 try:
-                    self.connected_players[player_id].send(json.dumps(message).encode())
+                    self.connected_players[player_id].send(payload, message.get('type'))
                 except Exception as e:
                     self.logger.error(f"Failed to send message to player {player_id}: {e}")
 
     def send_to_player(self, player_id: str, message: Dict) -> bool:
         if player_id in self.connected_players:
             try:
-                self.connected_players[player_id].send(json.dumps(message).encode())
+                self.connected_players[player_id].send(self.encode_message(message), message.get('type'))
                 return True
             except Exception as e:
                 self.logger.error(f"Failed to send message to player {player_id}: {e}")
@@ -31,5 +46,7 @@ class PlayerCommunication:
 
     def remove_player(self, player_id: str) -> None:
         if player_id in self.connected_players:
+            # The socket belongs to the caller; only stop queueing for it
+            self.connected_players[player_id].close(close_socket=False)
             del self.connected_players[player_id]
             self.logger.info(f"Player {player_id} removed")
\ No newline at end of file
@@ -1,5 +1,4 @@
 import subprocess
-from process_manager import ProcessManager
 
 class ProcessManager:
     def __init__(self):
@@ -1,13 +1,40 @@
 import socket
+import selectors
 import threading
+import asyncio
+import argparse
+import bisect
 import logging
 import json
 import psutil
+from collections import deque
 from datetime import datetime
 from zeroconf import ServiceInfo, Zeroconf
-from config import SERVER_CONFIG, NETWORK_CONFIG, DATABASE_CONFIG
+from config import SERVER_CONFIG, NETWORK_CONFIG, DATABASE_CONFIG, MATCHMAKING_CONFIG
 from game_server import GameServer
-from flask import Flask, jsonify, request, redirect
+from game.lobby_manager import LobbyManager
+from game.lobby_store import SharedLobbyManager, SQLiteLobbyStore
+from game.match_archive import MatchArchive
+from game.match_journal import MatchJournal
+from game.match_store import SQLiteMatchStore
+from network.admission import AdmissionController
+from network.event_stream import EventStream
+from network.handoff import (handoff_supported, inherited_snapshot_path, inherited_sockets,
+                             read_snapshot, spawn_successor, write_snapshot)
+from network.http_parser import HTTP_METHODS, HTTPParseError, HTTPRequestParser, build_response
+from network.log_tail import follow, read_chunks, tail_lines
+from network.message_dispatcher import MessageDispatcher
+from network.message_framing import FrameDecoder, FrameError, decode_frame
+from network.db_pool import get_pool
+from network.metrics_registry import CONTENT_TYPE, REGISTRY
+from network.metrics_sampler import MetricsSampler
+from network.outbound_queue import OutboundQueue, OutboundStats, QueuedConnection, SendPump
+from network.port_pool import PortPool
+from network.timer_wheel import IdleReaper, enable_keepalive
+from network.wire_format import get_format, negotiate_first_message, wire_format_ack
+from network.wsgi_server import create_wsgi_server
+from network.workers import reuseport_supported, run_workers, worker_port_range
+from flask import Flask, Response, jsonify, request, redirect, stream_with_context
 from flask_cors import CORS
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 import mysql.connector
@@ -16,53 +43,278 @@ from wp_login import authenticate_wordpress_user, validate_session_token
 import os
 import pickle
 import time
+import zlib
+
+# Hot-path instrumentation, exported at /metrics
+LOBBY_CONNECTIONS = REGISTRY.counter('pes_lobby_connections_total', 'Lobby connections by admission outcome', ['outcome'])
+CONNECTIONS_ACCEPTED = LOBBY_CONNECTIONS.labels('accepted')
+CONNECTIONS_REJECTED = LOBBY_CONNECTIONS.labels('rejected')
+ACCEPT_SECONDS = REGISTRY.histogram('pes_lobby_accept_seconds',
+                                    'Time from accepting a lobby connection to serving it').labels()
+PARSE_SECONDS = REGISTRY.histogram('pes_lobby_parse_seconds', 'Time to decode one framed lobby message').labels()
+BROADCAST_SECONDS = REGISTRY.histogram('pes_lobby_broadcast_seconds',
+                                       'Time to send a match start to all its participants').labels()
+MATCHES_STARTED = REGISTRY.counter('pes_matches_started_total', 'Matches started from a lobby').labels()
 
 class GameServer:
-    def __init__(self):
+    def __init__(self, port_pool=None, path='matches'):
         self.matches = {}
         self.active_games = {}
+        self.last_match_id = 0  # ids only grow, whatever happens to old matches
+        self.port_pool = port_pool
+        self.path = path
+        self.lock = threading.Lock()          # orders changes and their journal records
+        self.compact_lock = threading.Lock()  # one compaction at a time
+        self.journal = MatchJournal(path, SERVER_CONFIG['match_journal_fsync'])
+        self.archive = MatchArchive(path, SERVER_CONFIG['match_archive_segment_size'])
         self.load_matches()
 
-    def save_matches(self):
-        try:
-            with open('matches.dat', 'wb') as f:
-                pickle.dump({
-                    'matches': self.matches,
-                    'active_games': self.active_games
-                }, f)
-            logging.info("Matches saved successfully")
-        except Exception as e:
-            logging.error(f"Error saving matches: {e}")
+    def record(self, op, match_id, **fields):
+        """Apply a change and append it to the journal; the caller holds self.lock"""
+        record = dict(fields, op=op, match_id=match_id)
+        self.apply(record)
+        self.journal.append(record)
 
-    def load_matches(self):
-        if os.path.exists('matches.dat'):
+    def apply(self, record):
+        """Apply one journal record to the in-memory state, live or on replay"""
+        op = record['op']
+        match_id = record['match_id']
+        if op == 'create':
+            self.matches[match_id] = {
+                'home_team': record['home_team'],
+                'away_team': record['away_team'],
+                'score': [0, 0],
+                'status': 'waiting',
+                'start_time': None,
+                'end_time': None
+            }
+            self.last_match_id = max(self.last_match_id, match_id)
+        elif op == 'ports':
+            self.matches[match_id]['ports'] = record['ports']
+        elif op == 'start':
+            match = self.matches[match_id]
+            match['status'] = 'active'
+            match['start_time'] = record['time']
+            self.active_games[match_id] = match
+        elif op == 'score':
+            self.active_games[match_id]['score'] = record['score']
+        elif op == 'end':
+            match = self.active_games.pop(match_id)
+            match['status'] = 'ended'
+            match['end_time'] = record['time']
+        elif op == 'archive':
+            self.matches.pop(match_id, None)
+        else:
+            raise ValueError(f"Unknown journal operation '{op}'")
+
+    def snapshot_state(self):
+        # Changes replace values instead of mutating them, so copying each match dict suffices
+        return {
+            'matches': [[match_id, dict(match)] for match_id, match in self.matches.items()],
+            'active': list(self.active_games),
+            'last_match_id': self.last_match_id
+        }
+
+    def save_matches(self, force=False):
+        """Compact the journal into a new snapshot.
+
+        Only the copy of the state is taken under the lock; serializing and
+        writing it happens while matches keep changing.
+        """
+        with self.compact_lock:
             try:
-                with open('matches.dat', 'rb') as f:
-                    data = pickle.load(f)
-                    self.matches = data.get('matches', {})
-                    self.active_games = data.get('active_games', {})
-                logging.info("Matches loaded successfully")
+                with self.lock:
+                    if not force and not self.journal.pending:
+                        return
+                    state = self.snapshot_state()
+                    seq = self.journal.rotate()
+                self.journal.write_snapshot(state, seq)
+                logging.info(f"Match journal compacted up to record {seq}")
             except Exception as e:
-                logging.error(f"Error loading matches: {e}")
-        
-    def create_match(self, home_team, away_team):
-        match_id = len(self.matches) + 1
-        self.matches[match_id] = {
-            'home_team': home_team,
-            'away_team': away_team,
-            'score': [0, 0],
-            'status': 'waiting',
-            'start_time': None,
-            'end_time': None
-        }
+                logging.error(f"Error compacting match journal: {e}")
+
+    def load_matches(self):
+        """Load the latest snapshot and replay the journal written after it"""
+        try:
+            snapshot, records = self.journal.load()
+        except (OSError, ValueError) as e:
+            logging.error(f"Error loading match snapshot: {e}")
+            snapshot, records = None, []
+        migrated = False
+        if snapshot:
+            self.matches = {match_id: match for match_id, match in snapshot['matches']}
+            self.active_games = {match_id: self.matches[match_id] for match_id in snapshot['active']}
+            self.last_match_id = snapshot.get('last_match_id', max(self.matches, default=0))
+        else:
+            migrated = self.load_legacy_matches()
+        for record in records:
+            try:
+                self.apply(record)
+            except (KeyError, ValueError) as e:
+                logging.error(f"Skipping journal record {record.get('seq')}: {e}")
+        self.journal.open()
+        # A crash after archiving matches but before journaling it leaves them in both places
+        archived = [match_id for match_id in self.matches if match_id in self.archive]
+        if archived:
+            with self.lock:
+                for match_id in archived:
+                    self.record('archive', match_id)
+            logging.warning(f"Dropped {len(archived)} already archived matches left in the journal")
+        logging.info(f"Matches loaded: {len(self.matches)} matches, {len(records)} journal records replayed")
+        if migrated:
+            self.save_matches(force=True)
+
+    def load_legacy_matches(self):
+        """Import a matches pickle written before the journal existed"""
+        legacy_path = f"{self.path}.dat"
+        if not os.path.exists(legacy_path):
+            return False
+        try:
+            with open(legacy_path, 'rb') as f:
+                data = pickle.load(f)
+            self.matches = data.get('matches', {})
+            self.active_games = {match_id: self.matches[match_id] for match_id in data.get('active_games', {})}
+            self.last_match_id = max(self.matches, default=0)
+            logging.info(f"Imported {len(self.matches)} matches from {legacy_path}")
+            return True
+        except Exception as e:
+            logging.error(f"Error loading matches from {legacy_path}: {e}")
+            return False
+        
+    def create_match(self, home_team, away_team, match_id=None):
+        # Lobbies fill in parallel, so id allocation must not race
+        with self.lock:
+            if match_id is None:
+                match_id = self.last_match_id + 1
+            self.record('create', match_id, home_team=home_team, away_team=away_team)
         return match_id
 
+    def set_ports(self, match_id, ports):
+        with self.lock:
+            self.record('ports', match_id, ports=ports)
+
+    def start_match(self, match_id):
+        try:
+            with self.lock:
+                if match_id in self.matches:
+                    self.record('start', match_id, time=time.time())
+                    logging.info(f"Match {match_id} started")
+                else:
+                    logging.warning(f"Attempted to start non-existent match {match_id}")
+        except Exception as e:
+            logging.error(f"Error starting match {match_id}: {e}")
+
+    def update_score(self, match_id, home_score, away_score):
+        try:
+            with self.lock:
+                if match_id in self.active_games:
+                    self.record('score', match_id, score=[home_score, away_score])
+                    logging.info(f"Match {match_id} score updated: {home_score}-{away_score}")
+                else:
+                    logging.warning(f"Attempted to update score for non-active match {match_id}")
+        except Exception as e:
+            logging.error(f"Error updating score for match {match_id}: {e}")
+
+    def end_match(self, match_id):
+        try:
+            with self.lock:
+                if match_id not in self.active_games:
+                    logging.warning(f"Attempted to end non-active match {match_id}")
+                    return
+                self.record('end', match_id, time=time.time())
+            logging.info(f"Match {match_id} ended")
+            if self.port_pool:
+                self.port_pool.release(match_id)
+        except Exception as e:
+            logging.error(f"Error ending match {match_id}: {e}")
+
+    def archive_matches(self, max_age):
+        """Move matches that ended more than max_age seconds ago to the cold archive.
+
+        Ended matches never change again, so they are written out without the
+        lock. Only dropping them from memory is journaled, after the archive
+        has them on disk. The two steps are not atomic, so a match the archive
+        already holds is never written again, only dropped; load_matches()
+        does the same after a crash between them.
+        """
+        cutoff = time.time() - max_age
+        with self.lock:
+            ended = {
+                match_id: match for match_id, match in self.matches.items()
+                if match['status'] == 'ended' and match['end_time'] < cutoff
+            }
+        if not ended:
+            return 0
+        try:
+            fresh = {match_id: match for match_id, match in ended.items() if match_id not in self.archive}
+            if fresh:
+                self.archive.append(fresh)
+            with self.lock:
+                for match_id in ended:
+                    self.record('archive', match_id)
+        except Exception as e:
+            logging.error(f"Error archiving matches: {e}")
+            return 0
+        logging.info(f"Archived {len(ended)} ended matches")
+        return len(ended)
+
+    def get_match(self, match_id):
+        match = self.matches.get(match_id)
+        if match is None and match_id in self.archive:
+            match = self.archive.get(match_id)
+        return match
+
+    def match_count(self):
+        # The journal already dropped archived matches from memory, so nothing is counted twice
+        return len(self.matches) + len(self.archive)
+
+    def active_match_count(self):
+        return len(self.active_games)
+
+    def player_history(self, player_id, limit=20, before=None):
+        """A player's matches, newest first.
+
+        This scans the matches still in memory, not the archive;
+        SQLiteGameServer uses an index.
+        """
+        history = []
+        for match_id in sorted(self.matches, reverse=True):
+            if before is not None and match_id >= before:
+                continue
+            match = self.matches[match_id]
+            if player_id in match['home_team'].values() or player_id in match['away_team'].values():
+                history.append(dict(match, match_id=match_id))
+                if len(history) >= limit:
+                    break
+        return history
+
+class SQLiteGameServer(GameServer):
+    """GameServer keeping its matches in an indexed SQLite database.
+
+    Every change is committed as it happens, so there is no journal to
+    replay and nothing for save_matches to do.
+    """
+    def __init__(self, port_pool=None, path='matches'):
+        self.port_pool = port_pool
+        self.path = path
+        self.store = SQLiteMatchStore(f"{path}.db")
+        logging.info(f"Match store {path}.db holds {self.store.count()} matches")
+
+    def save_matches(self, force=False):
+        pass
+
+    def archive_matches(self, max_age):
+        return 0  # Matches already live on disk
+
+    def create_match(self, home_team, away_team, match_id=None):
+        return self.store.create(home_team, away_team, match_id)
+
+    def set_ports(self, match_id, ports):
+        self.store.set_ports(match_id, ports)
+
     def start_match(self, match_id):
         try:
-            if match_id in self.matches:
-                self.matches[match_id]['status'] = 'active'
-                self.matches[match_id]['start_time'] = time.time()
-                self.active_games[match_id] = self.matches[match_id]
+            if self.store.start(match_id, time.time()):
                 logging.info(f"Match {match_id} started")
             else:
                 logging.warning(f"Attempted to start non-existent match {match_id}")
@@ -71,8 +323,7 @@ class GameServer:
 
     def update_score(self, match_id, home_score, away_score):
         try:
-            if match_id in self.active_games:
-                self.active_games[match_id]['score'] = [home_score, away_score]
+            if self.store.update_score(match_id, home_score, away_score):
                 logging.info(f"Match {match_id} score updated: {home_score}-{away_score}")
             else:
                 logging.warning(f"Attempted to update score for non-active match {match_id}")
@@ -81,38 +332,255 @@ class GameServer:
 
     def end_match(self, match_id):
         try:
-            if match_id in self.active_games:
-                self.active_games[match_id]['status'] = 'ended'
-                self.active_games[match_id]['end_time'] = time.time()
-                logging.info(f"Match {match_id} ended")
-                del self.active_games[match_id]
-            else:
+            if not self.store.end(match_id, time.time()):
                 logging.warning(f"Attempted to end non-active match {match_id}")
+                return
+            logging.info(f"Match {match_id} ended")
+            if self.port_pool:
+                self.port_pool.release(match_id)
         except Exception as e:
             logging.error(f"Error ending match {match_id}: {e}")
 
+    def get_match(self, match_id):
+        return self.store.get(match_id)
+
+    def match_count(self):
+        return self.store.count()
+
+    def active_match_count(self):
+        return self.store.count_by_status('active')
+
+    def player_history(self, player_id, limit=20, before=None):
+        return self.store.player_history(player_id, limit, before)
+
+class AsyncClient:
+    """Socket-like wrapper around an asyncio StreamWriter.
+
+    Lets the lobby handlers call client.send() the same way for both engines.
+    Frames go into a bounded OutboundQueue that a per-connection task drains
+    into the transport, waiting on drain() so a slow peer only backs up its
+    own queue. Must be used from the event loop thread.
+    """
+    def __init__(self, writer, queue):
+        self.writer = writer
+        self.queue = queue
+        self.aborted = False
+        self.wire = None  # WireFormat negotiated by the peer, None for the server default
+        self._ready = asyncio.Event()
+        self._task = asyncio.ensure_future(self._drain())
+
+    def send(self, data, key=None):
+        if self.aborted:
+            return 0
+        if self.queue.put(data, key):
+            self._ready.set()
+        elif self.queue.overflowed:
+            logging.warning(f"Disconnecting slow consumer {self.writer.get_extra_info('peername')}")
+            self.abort()
+        return len(data)
+
+    def abort(self):
+        """Cut the connection; the reader sees EOF and runs its normal cleanup"""
+        if not self.aborted:
+            self.aborted = True
+            self.writer.transport.abort()
+
+    async def _drain(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                for data in self.queue.pop_all():
+                    self.writer.write(data)
+                await self.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    def close(self):
+        self._task.cancel()
+        # Hand whatever is still queued (e.g. a final HTTP response) to the transport
+        for data in self.queue.pop_all():
+            self.writer.write(data)
+        self.writer.close()
+
+class HTTPLobbyClient:
+    """Stands in for a connection whose peer speaks HTTP instead of framed JSON.
+
+    Lobby handlers reply through client.send() whenever they like, but an HTTP
+    peer may only receive responses. Their messages are held here and returned
+    in the body of the next HTTP response on the connection.
+    """
+    def __init__(self, connection, framing, max_pending=256):
+        self.connection = connection
+        self.framing = framing
+        self.parser = HTTPRequestParser(max_body_size=NETWORK_CONFIG['max_frame_size'])
+        self.pending = deque(maxlen=max_pending)  # oldest messages are dropped first
+        self.wire = None  # HTTP bodies are always JSON
+        self.lock = threading.Lock()
+
+    def send(self, data, key=None):
+        with self.lock:
+            self.pending.append(decode_frame(data, self.framing))
+        return len(data)
+
+    def take_messages(self):
+        with self.lock:
+            messages = [json.loads(payload) for payload in self.pending]
+            self.pending.clear()
+        return messages
+
+    def respond(self, status, payload, keep_alive=True):
+        self.connection.send(build_response(status, payload, keep_alive))
+
+class ClientSession:
+    """Protocol state of one lobby connection, shared by both I/O engines"""
+    def __init__(self, client, address, decoder, bucket):
+        self.client = client
+        self.address = address
+        self.decoder = decoder
+        self.bucket = bucket  # per-connection message rate limit
+        self.player_id = None
+        self.negotiated = False  # the first framed message may pick a wire format
+        self.http = None      # HTTPLobbyClient once the peer turns out to speak HTTP
+        self.closing = False  # set once the peer asked for the connection to be closed
+
 class TeamLobbyServer:
-    def __init__(self, host='127.0.0.1', udp_port1=50000, udp_port2=50001):
+    IO_ENGINES = ('threaded', 'asyncio')
+
+    def __init__(self, host='127.0.0.1', udp_port1=50000, udp_port2=50001, io_engine=None,
+                 worker_id=None, workers=1):
         self.host = host
         self.udp_port1 = udp_port1
         self.udp_port2 = udp_port2
         self.port = 5739  # Main TCP port
         self.proxy_port = 5740  # Proxy port
-        self.teams = {'home': {}, 'away': {}}
+        self.api_port = SERVER_CONFIG['api_port']
         self.positions = SERVER_CONFIG['positions']
-        self.game_server = GameServer()
-        self.waiting_players = []
+        
+        # Worker mode: one of several processes sharing the lobby port. Lobby
+        # and session state then lives in a SQLite store all workers open,
+        # matches in one SQLite match store, and each worker leases UDP ports
+        # from its own slice of the range.
+        self.worker_id = worker_id
+        self.workers = workers
+        udp_port_range = SERVER_CONFIG['udp_port_range']
+        game_server_class = SQLiteGameServer if SERVER_CONFIG['match_store'] == 'sqlite' else GameServer
+        matches_path = 'matches'
+        if any(udp_port_range[0] <= port <= udp_port_range[1] for port in (udp_port1, udp_port2)):
+            raise ValueError(f"Fallback UDP ports {udp_port1}/{udp_port2} lie inside the leased range "
+                             f"{udp_port_range[0]}-{udp_port_range[1]}")
+        if worker_id is None:
+            self.lobby_store = None
+            self.lobby_manager = LobbyManager()  # lobby_id -> LobbyRoom, each with its own lock
+        else:
+            self.lobby_store = SQLiteLobbyStore(SERVER_CONFIG['lobby_store_path'], worker_id,
+                                                SERVER_CONFIG['max_players'])
+            self.lobby_store.reset_worker()
+            self.lobby_manager = SharedLobbyManager(self.lobby_store)
+            udp_port_range = worker_port_range(*udp_port_range, worker_id, workers)
+            game_server_class = SQLiteGameServer  # a journal can only have one writer
+        self.port_pool = PortPool(
+            *udp_port_range,
+            lease_timeout=SERVER_CONFIG['udp_lease_timeout']
+        )
+        self.game_server = game_server_class(self.port_pool, matches_path)
+        self.waiting_players = {}  # player_id -> entry, in join (FIFO) order
         self.zeroconf = Zeroconf()
         
-        # Server monitoring statistics
-        self.server_stats = {
-            'start_time': datetime.now(),
-            'total_connections': 0,
-            'active_connections': 0,
-            'peak_connections': 0,
-            'total_matches': 0,
-            'active_matches': 0
-        }
+        # Reverse indexes kept in step with teams/matches so lookups stay O(1)
+        self.player_lobbies = {}  # player_id -> lobby_id
+        self.player_slots = {}    # player_id -> (team, position)
+        self.player_matches = {}  # player_id -> match_id
+        self.player_clients = {}  # player_id -> client connection
+        
+        # Client I/O engine: one thread per connection or a single asyncio event loop
+        self.io_engine = io_engine or SERVER_CONFIG.get('io_engine', 'threaded')
+        if self.io_engine not in self.IO_ENGINES:
+            raise ValueError(f"Unknown io_engine '{self.io_engine}', expected one of {self.IO_ENGINES}")
+        
+        # TCP message framing and the default (JSON) wire format; clients may
+        # negotiate a binary one with their first message
+        self.framing = NETWORK_CONFIG.get('framing', 'newline')
+        self.wire = get_format('json', self.framing)
+        
+        # Bounded per-connection send queues drained without blocking broadcasters
+        self.send_queue_size = NETWORK_CONFIG['send_queue_size']
+        self.slow_consumer_policy = NETWORK_CONFIG['slow_consumer_policy']
+        self.outbound_stats = OutboundStats()
+        self.send_pump = SendPump('lobby-send-pump')
+        
+        # Admission control on the lobby port; limits come from NETWORK_CONFIG
+        self.admission = AdmissionController(
+            max_connections=NETWORK_CONFIG['max_connections'],
+            connect_rate=NETWORK_CONFIG['connect_rate_per_ip'],
+            connect_burst=NETWORK_CONFIG['connect_burst_per_ip'],
+            message_rate=NETWORK_CONFIG['message_rate'],
+            message_burst=NETWORK_CONFIG['message_burst']
+        )
+        
+        # Closes connections from clients that crashed or went silent
+        self.reaper = IdleReaper(
+            self.reap_session,
+            idle_timeout=NETWORK_CONFIG['lobby_idle_timeout'],
+            handshake_timeout=NETWORK_CONFIG['handshake_timeout'],
+            tick=NETWORK_CONFIG['reaper_tick'],
+            name='lobby-reaper'
+        )
+        
+        # Monitoring samples taken in the background; API handlers only read them
+        self.process = psutil.Process()
+        self.metrics = MetricsSampler(
+            self.collect_metrics,
+            interval=SERVER_CONFIG['metrics_interval'],
+            history_size=SERVER_CONFIG['metrics_history']
+        )
+        
+        # Bumped after every change to lobby state; versions the cached API responses
+        self.state_version = 0
+        self.state_lock = threading.Lock()
+        self.response_cache = {}  # endpoint -> (version, serialized body)
+        self.player_index = (-1, [], [])  # (version, sorted ids, rows) behind /api/admin/players
+        
+        # Pushes state changes to /api/events subscribers, coalesced per interval
+        events_config = SERVER_CONFIG['event_stream']
+        self.events = EventStream(
+            self.event_snapshot,
+            interval=events_config['interval'],
+            keepalive=events_config['keepalive'],
+            max_subscribers=events_config['max_subscribers']
+        )
+        
+        # Each /api/admin/logs?follow=1 stream holds a thread until it ends
+        self.log_followers = threading.BoundedSemaphore(SERVER_CONFIG['log_max_followers'])
+        
+        # Graceful restart: open sessions to drain and sockets to hand over
+        self.sessions = set()
+        self.sessions_lock = threading.Lock()
+        self.restart_lock = threading.Lock()
+        self.accepting = True
+        self.draining = False     # lobby state is frozen for a successor process
+        self.handed_off = False
+        self.restored_players = set()  # restored from a snapshot, not reconnected yet
+        self.api_server = None
+        self.async_server = None
+        self.loop = None
+        self._accept_wake_r, self._accept_wake_w = socket.socketpair()
+        
+        # Message type -> handler routing shared by the framed and HTTP paths
+        self.dispatcher = MessageDispatcher()
+        self.register_message_handlers()
+        
+        # Current state, read when /metrics is scraped
+        for name, documentation, read in (
+            ('pes_lobby_connections', 'Open lobby connections', lambda: self.worker_totals()['connections']),
+            ('pes_lobby_players', 'Connected players', lambda: self.worker_totals()['players']),
+            ('pes_lobby_waiting_players', 'Players waiting for a match',
+             lambda: self.worker_totals()['waiting_players']),
+            ('pes_lobbies', 'Open lobbies', self.lobby_manager.lobby_count),
+            ('pes_active_matches', 'Matches being played', self.game_server.active_match_count),
+            ('pes_event_subscribers', 'Clients subscribed to /api/events', self.events.subscriber_count)
+        ):
+            REGISTRY.gauge(name, documentation).set_function(read)
         
         # WordPress integration
         self.wp_auth_enabled = DATABASE_CONFIG.get('wp_auth_enabled', False)
@@ -146,12 +614,8 @@ class TeamLobbyServer:
         self.use_database = False  # Set to True if you want to use MySQL
         if self.use_database:
             try:
-                self.db = mysql.connector.connect(
-                    host="localhost",
-                    user="wp",
-                    password="wp",
-                    database="wp"
-                )
+                self.db = get_pool()  # shared with the other modules in this process
+                self.ensure_player_indexes()
                 logging.info("Database connection established successfully")
             except mysql.connector.Error as err:
                 logging.error(f"Database connection failed: {err}")
@@ -175,16 +639,16 @@ class TeamLobbyServer:
                 return response, 200
             return response
         
-        from datetime import datetime
         # Remove any existing handlers
         for handler in logging.root.handlers[:]:
             logging.root.removeHandler(handler)
             
-        log_filename = f"team_lobby_{datetime.now().strftime('%Y-%m-%d')}.log"
+        self.log_filename = f"team_lobby_{datetime.now().strftime('%Y-%m-%d')}.log"
         logging.basicConfig(
-            filename=log_filename,
+            filename=self.log_filename,
             level=logging.DEBUG,
-            format='%(asctime)s - %(message)s'
+            format='%(asctime)s - %(message)s' if worker_id is None
+                   else f'%(asctime)s - [worker {worker_id}] %(message)s'
         )
         self.init_mdns()
 
@@ -194,19 +658,12 @@ class TeamLobbyServer:
             if not user_data:
                 return jsonify({'error': 'No user data provided'}), 400
             
-            # Verify database connection
-            if not self.db.is_connected():
-                self.db.reconnect()
-            
-            cursor = self.db.cursor(dictionary=True)
-            
             # Check if user exists
-            cursor.execute("SELECT id FROM players WHERE id = %s", (user_data['id'],))
-            existing_user = cursor.fetchone()
+            existing_user = self.db.query_one('user_lookup', "SELECT id FROM players WHERE id = %s", (user_data['id'],))
             
             if existing_user:
                 # Update existing user
-                cursor.execute("""
+                self.db.execute('user_update', """
                     UPDATE players SET
                         username = %s,
                         email = %s,
@@ -220,7 +677,7 @@ class TeamLobbyServer:
                 ))
             else:
                 # Create new user
-                cursor.execute("""
+                self.db.execute('user_insert', """
                     INSERT INTO players (id, username, email, display_name)
                     VALUES (%s, %s, %s, %s)
                 """, (
@@ -230,7 +687,6 @@ class TeamLobbyServer:
                     user_data['display_name']
                 ))
             
-            self.db.commit()
             return jsonify({'message': 'User data synchronized successfully'})
             
         except Exception as e:
@@ -240,25 +696,135 @@ class TeamLobbyServer:
                 'details': str(e)
             }), 500
 
+    def bump_state_version(self):
+        """Call after changing players, lobbies or matches, so cached responses are rebuilt"""
+        with self.state_lock:
+            self.state_version += 1
+        self.events.notify()
+
+    def event_snapshot(self):
+        """The state /api/events pushes; only the event stream thread calls this"""
+        totals = self.worker_totals()
+        return {
+            'version': self.state_version,
+            'players': totals['players'],
+            'waiting_players': totals['waiting_players'],
+            'workers': totals['workers'],
+            'matches': self.game_server.match_count(),
+            'active_matches': self.game_server.active_match_count(),
+            'lobbies': self.lobby_manager.lobby_count(),
+            'open_lobbies': self.lobby_manager.list_lobbies()
+        }
+
+    def ensure_player_indexes(self):
+        """Index players for the keyset queries behind /api/admin/bans"""
+        try:
+            self.db.execute('players_index', "CREATE INDEX players_banned_id ON players (banned, id)")
+        except mysql.connector.Error as err:
+            if err.errno != 1061:  # Duplicate key name: already indexed
+                logging.warning(f"Cannot index players for ban listings: {err}")
+
+    def release_follower(self, chunks):
+        """Stream a log follower's chunks, then free its place"""
+        try:
+            yield from chunks
+        finally:
+            self.log_followers.release()
+
+    def follow_log(self, connection, chunks):
+        """Write a log follow stream to a connection detached from the API server"""
+        def run():
+            try:
+                for chunk in chunks:
+                    connection.sendall(chunk)
+            except OSError:
+                pass  # the admin closed the stream
+            finally:
+                chunks.close()
+                connection.close()
+                self.log_followers.release()
+        try:
+            threading.Thread(target=run, name='log-follower', daemon=True).start()
+        except RuntimeError:
+            self.log_followers.release()
+            raise
+
+    def page_args(self, fields):
+        """?limit, ?after and ?fields of a keyset-paginated admin listing.
+
+        Pages are ordered by id and the next one starts after the last id
+        returned, so id is always part of the selected fields. Raises
+        ValueError for an unknown field.
+        """
+        limit = request.args.get('limit', SERVER_CONFIG['admin_page_size'], type=int)
+        limit = max(1, min(limit, SERVER_CONFIG['admin_max_page_size']))
+        selected = request.args.get('fields')
+        if selected is None:
+            return limit, request.args.get('after'), None
+        selected = [field for field in selected.split(',') if field]
+        unknown = set(selected) - set(fields)
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)}, expected some of {list(fields)}")
+        return limit, request.args.get('after'), ['id'] + [field for field in selected if field != 'id']
+
+    def sorted_players(self):
+        """Connected players ordered by id, rebuilt once per state version"""
+        version = self.state_version
+        index = self.player_index
+        if index[0] != version:
+            rows = sorted(({
+                'id': player_id,
+                'status': 'waiting' if player_id in self.waiting_players else 'in_match',
+                'team': self.get_player_team(player_id),
+                'position': self.get_player_position(player_id)
+            } for player_id in list(self.player_clients)), key=lambda row: str(row['id']))
+            index = (version, [str(row['id']) for row in rows], rows)
+            self.player_index = index
+        return index[1], index[2]
+
+    def versioned_json(self, key, version, build, cache=True):
+        """A JSON response tagged with its state version.
+
+        Answers 304 when the client already has this version and otherwise
+        serializes build(), with cache at most once per version. The version
+        must be read before build() runs: a body built during a change is then
+        cached under the older version and rebuilt on the next poll.
+        """
+        etag = f"{key}-{version}"
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        elif not cache:
+            response = Response(jsonify(build()).get_data(), mimetype='application/json')
+        else:
+            cached = self.response_cache.get(key)
+            if cached is None or cached[0] != version:
+                cached = (version, jsonify(build()).get_data())
+                self.response_cache[key] = cached
+            response = Response(cached[1], mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'  # always revalidate
+        return response
+
     def _get_admin_status(self):
         if not self.use_database or self.db is None:
-            # Fallback implementation without database
-            return jsonify({
-                'total_players': len(self.waiting_players),
-                'active_matches': len([m for m in self.game_server.matches.values() if m['status'] == 'active']),
+            # Fallback implementation without database. Other workers change the
+            # shared match store and leases expire on their own, neither bumping
+            # state_version, so those fields are read every time and go into the version
+            shared = {
+                'active_matches': self.game_server.active_match_count(),
+                'udp_ports': self.port_pool.stats()
+            }
+            version = f"{self.state_version}.{zlib.crc32(json.dumps(shared, sort_keys=True).encode()):08x}"
+            return self.versioned_json('admin-status', version, lambda: dict(shared, **{
+                'total_players': len(self.player_clients),
                 'banned_players': 0  # Bans not supported without database
-            })
+            }))
         
+        # Other processes change the database, so these counts are never cached
         try:
-            # Verify database connection
-            if not self.db.is_connected():
-                self.db.reconnect()
-            
-            cursor = self.db.cursor(dictionary=True)
-            
             # Check if players table exists
-            cursor.execute("SHOW TABLES LIKE 'players'")
-            if not cursor.fetchone():
+            if not self.db.query('players_table', "SELECT 1 FROM information_schema.tables "
+                                 "WHERE table_schema = DATABASE() AND table_name = 'players'"):
                 logging.warning("Players table does not exist in database")
                 return jsonify({
                     'total_players': 0,
@@ -267,14 +833,13 @@ class TeamLobbyServer:
                 })
             
             # Get total players
-            cursor.execute("SELECT COUNT(*) as total_players FROM players")
-            total_players = cursor.fetchone()['total_players']
+            total_players = self.db.query_one('player_count', "SELECT COUNT(*) as total_players FROM players")['total_players']
             logging.info(f"Found {total_players} total players")
             
             # Get active matches (fallback to 0 if status column doesn't exist)
             try:
-                cursor.execute("SELECT COUNT(*) as active_matches FROM matches WHERE status = 'active'")
-                active_matches = cursor.fetchone()['active_matches']
+                active_matches = self.db.query_one('active_match_count', "SELECT COUNT(*) as active_matches "
+                                                   "FROM matches WHERE status = 'active'")['active_matches']
                 logging.info(f"Found {active_matches} active matches")
             except mysql.connector.Error as err:
                 if err.errno == 1054:  # Unknown column error
@@ -285,8 +850,8 @@ class TeamLobbyServer:
             
             # Get banned players (fallback to 0 if banned column doesn't exist)
             try:
-                cursor.execute("SELECT COUNT(*) as banned_players FROM players WHERE banned = 1")
-                banned_players = cursor.fetchone()['banned_players']
+                banned_players = self.db.query_one('banned_count', "SELECT COUNT(*) as banned_players "
+                                                   "FROM players WHERE banned = 1")['banned_players']
                 logging.info(f"Found {banned_players} banned players")
             except mysql.connector.Error as err:
                 if err.errno == 1054:  # Unknown column error
@@ -298,7 +863,8 @@ class TeamLobbyServer:
             return jsonify({
                 'total_players': total_players,
                 'active_matches': active_matches,
-                'banned_players': banned_players
+                'banned_players': banned_players,
+                'udp_ports': self.port_pool.stats()
             })
         except mysql.connector.Error as db_error:
             logging.error(f"Database error in _get_admin_status: {db_error}")
@@ -320,98 +886,347 @@ class TeamLobbyServer:
                 'message': 'PES Server API',
                 'endpoints': {
                     '/api/status': 'GET - Get server status',
+                    '/metrics': 'GET - Prometheus metrics',
+                    '/api/events': 'GET - Stream server status changes (Server-Sent Events)',
+                    '/api/lobbies': 'GET - List open lobbies',
                     '/api/admin/status': 'GET - Get admin status',
                     '/api/admin/bans': 'GET - Get banned players',
                     '/api/admin/logs': 'GET - Get server logs',
                     '/api/admin/restart': 'POST - Restart server',
                     '/api/admin/shutdown': 'POST - Shutdown server',
-                    '/api/admin/players': 'GET - Get connected players'
+                    '/api/admin/players': 'GET - Get connected players',
+                    '/api/admin/outbound': 'GET - Get send queue statistics',
+                    '/api/admin/messages': 'GET - Get per message type statistics'
                 }
             }), 200
 
         @self.api.route('/api/status', methods=['GET'])
         def get_status():
-            return jsonify({
+            # Everything served here comes from one sample, so it only changes once per sample
+            sample = self.metrics.latest()
+            return self.versioned_json('status', sample.get('sequence', 0), lambda: {
                 'status': 'online',
-                'players': len(self.waiting_players),
-                'matches': len(self.game_server.matches),
-                'lobbies': len(self.teams['home']) + len(self.teams['away']),
-                'uptime': time.time() - self.start_time if hasattr(self, 'start_time') else 0,
-                'memory_usage': self.get_memory_usage(),
-                'cpu_usage': self.get_cpu_usage()
+                'players': sample.get('players', 0),
+                'matches': sample.get('matches', 0),
+                'lobbies': sample.get('lobbies', 0),
+                'uptime': sample.get('uptime', 0),
+                'memory_usage': sample.get('memory_usage', 0),
+                'cpu_usage': sample.get('cpu_usage', 0.0),
+                'sampled_at': sample.get('time'),
+                'admission': sample.get('admission', {}),
+                'reaper': sample.get('reaper', {}),
+                # players count every worker; memory, CPU, admission and reaper are this worker's
+                'workers': sample.get('workers', 1),
+                'worker_id': self.worker_id
             })
 
+        @self.api.route('/api/events', methods=['GET'])
+        def get_events():
+            if self.events.full():
+                return jsonify({'error': 'Too many event subscribers'}), 503
+            events_config = SERVER_CONFIG['event_stream']
+            event_id, frame = self.events.current()
+            head = f"retry: {events_config['retry']}\n\n".encode()
+            if request.headers.get('Last-Event-ID') != str(event_id):
+                head += frame
+            headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            detach = request.environ.get('wsgi_server.detach')
+            if detach is not None:
+                # The event stream thread writes every later frame to this connection
+                detach(lambda connection: self.events.subscribe(connection, event_id))
+                return Response(iter([head]), mimetype='text/event-stream', headers=headers)
+
+            def stream():
+                # Development server: this request's thread waits for the frames
+                last_id = event_id
+                deadline = time.monotonic() + events_config['timeout']
+                yield head
+                while self.events.running and time.monotonic() < deadline:
+                    next_id, next_frame = self.events.wait(last_id, self.events.keepalive)
+                    if next_id == last_id:
+                        yield b': keepalive\n\n'
+                    else:
+                        last_id = next_id
+                        yield next_frame
+            return Response(stream(), mimetype='text/event-stream', headers=headers)
+
+        @self.api.route('/metrics', methods=['GET'])
+        def get_metrics():
+            body = REGISTRY.render()
+            if self.lobby_store:
+                body = (f"# Gauges of connections and players cover every worker; other metrics "
+                        f"cover worker {self.worker_id} only\n").encode() + body
+            return Response(body, content_type=CONTENT_TYPE)
+
+        @self.api.route('/api/status/history', methods=['GET'])
+        def get_status_history():
+            # Unparsable values are ignored, like a missing parameter
+            since = request.args.get('since', type=float)
+            limit = request.args.get('limit', type=int)
+            return jsonify({
+                'interval': self.metrics.interval,
+                'samples': self.metrics.history(since, limit)
+            })
+
+        @self.api.route('/api/admin/workers', methods=['GET'])
+        def get_workers():
+            if self.lobby_store is None:
+                return jsonify([dict(self.worker_stats(), worker_id=None, pid=os.getpid())])
+            return jsonify(self.lobby_store.worker_stats())
+
+        @self.api.route('/api/lobbies', methods=['GET'])
+        def get_lobbies():
+            return jsonify(self.lobby_manager.list_lobbies())
+
         @self.api.route('/api/admin/players', methods=['GET'])
         def get_players():
-            players = [{
-                'id': p['player_id'],
-                'status': 'waiting' if p in self.waiting_players else 'in_match',
-                'team': self.get_player_team(p['player_id']),
-                'position': self.get_player_position(p['player_id'])
-            } for p in self.waiting_players]
-            return jsonify(players)
+            """Connected players by id, ?limit at a time from ?after.
+
+            ?status, ?team and ?position filter them; ?fields=a,b picks fields.
+            """
+            try:
+                limit, after, fields = self.page_args(('id', 'status', 'team', 'position'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            filters = {name: request.args[name] for name in ('status', 'team', 'position') if name in request.args}
+
+            def build():
+                ids, rows = self.sorted_players()
+                start = bisect.bisect_right(ids, after) if after is not None else 0
+                page = []
+                for row in rows[start:]:
+                    if all(row[name] == value for name, value in filters.items()):
+                        page.append({field: row[field] for field in fields} if fields else row)
+                        if len(page) == limit:
+                            break
+                return page
+
+            # One ETag and cached body per query; only the unfiltered first page is cached
+            query = request.query_string
+            key = f"players-{zlib.crc32(query):08x}" if query else 'players'
+            return self.versioned_json(key, self.state_version, build, cache=not query)
+
+        @self.api.route('/api/admin/players/<player_id>/matches', methods=['GET'])
+        def get_player_matches(player_id):
+            try:
+                limit = min(int(request.args.get('limit', 20)), 100)
+                before = request.args.get('before')
+                before = int(before) if before is not None else None
+            except ValueError:
+                return jsonify({'error': 'limit and before must be integers'}), 400
+            return jsonify(self.game_server.player_history(player_id, limit, before))
+
+        @self.api.route('/api/admin/outbound', methods=['GET'])
+        def get_outbound_stats():
+            return jsonify({
+                'policy': self.slow_consumer_policy,
+                'queue_size': self.send_queue_size,
+                'totals': self.outbound_stats.snapshot(),
+                'queued': {
+                    player_id: len(client.queue)
+                    for player_id, client in list(self.player_clients.items())
+                    if hasattr(client, 'queue')
+                }
+            })
+
+        @self.api.route('/api/admin/messages', methods=['GET'])
+        def get_message_stats():
+            return jsonify(self.dispatcher.stats())
 
         @self.api.route('/api/admin/bans', methods=['GET'])
         def get_bans():
+            """Banned players by id, ?limit at a time from ?after.
+
+            ?banned=0 or all lists other registered players instead;
+            ?fields=a,b picks columns.
+            """
             try:
-                if not self.db.is_connected():
-                    self.db.reconnect()
-                cursor = self.db.cursor(dictionary=True)
-                cursor.execute("SELECT * FROM players WHERE banned = 1")
-                banned_players = cursor.fetchall()
+                limit, after, fields = self.page_args(('id', 'username', 'email', 'display_name', 'banned'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            banned = request.args.get('banned', '1')
+            if banned not in ('0', '1', 'all'):
+                return jsonify({'error': "banned must be 0, 1 or all"}), 400
+            # Keyset query: served from the (banned, id) index, never a full-table read
+            conditions, params = [], []
+            if banned != 'all':
+                conditions.append("banned = %s")
+                params.append(int(banned))
+            if after is not None:
+                conditions.append("id > %s")
+                params.append(after)
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            columns = ', '.join(fields) if fields else '*'  # names checked against the allowed fields
+            try:
+                banned_players = self.db.query('bans', f"SELECT {columns} FROM players{where} ORDER BY id LIMIT %s",
+                                               params + [limit])
                 return jsonify(banned_players)
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
 
         @self.api.route('/api/admin/logs', methods=['GET'])
         def get_logs():
+            """Tail the server log without loading it.
+
+            ?lines=N (default 200) returns the last N lines as JSON, with the
+            offset they end at. ?offset=B streams the log from byte B, and
+            &follow=1 keeps streaming what is appended.
+            """
             try:
-                with open('team_lobby.log', 'r') as f:
-                    logs = f.read()
-                return jsonify({'logs': logs})
+                offset = request.args.get('offset', type=int)
+                if offset is None:
+                    lines = min(request.args.get('lines', 200, type=int), SERVER_CONFIG['log_tail_max_lines'])
+                    logs, end = tail_lines(self.log_filename, lines)
+                    return jsonify({'logs': logs.decode('utf-8', 'replace'), 'offset': end})
+                size = os.path.getsize(self.log_filename)
+                offset = max(0, offset if offset <= size else 0)  # the log was truncated
+                headers = {'X-Log-Offset': str(offset), 'X-Log-Size': str(size)}
+                if request.args.get('follow') not in ('1', 'true'):
+                    return Response(stream_with_context(read_chunks(self.log_filename, offset, size)),
+                                    mimetype='text/plain', headers=headers)
+                if not self.log_followers.acquire(blocking=False):
+                    return jsonify({'error': 'Too many log followers'}), 503
+                chunks = follow(self.log_filename, offset, timeout=SERVER_CONFIG['log_follow_timeout'])
+                detach = request.environ.get('wsgi_server.detach')
+                if detach is not None:
+                    # A follower thread of its own writes the stream, freeing this pool thread
+                    detach(lambda connection: self.follow_log(connection, chunks))
+                    return Response(iter([]), mimetype='text/plain', headers=headers)
+                return Response(self.release_follower(chunks), mimetype='text/plain', headers=headers)
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
 
         @self.api.route('/api/admin/restart', methods=['POST'])
         def restart_server():
             try:
-                self.server.close()
-                self.start()
-                return jsonify({'message': 'Server restart initiated'})
+                if not handoff_supported():
+                    return jsonify({'error': 'Graceful restart needs POSIX socket inheritance'}), 501
+                if self.lobby_store is not None:
+                    return jsonify({'error': 'Graceful restart is not supported in worker mode'}), 501
+                if self.draining:
+                    return jsonify({'error': 'Restart already in progress'}), 409
+                threading.Thread(target=self.graceful_restart, name='graceful-restart').start()
+                return jsonify({'message': 'Server restart initiated'}), 202
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
 
         @self.api.route('/api/admin/shutdown', methods=['POST'])
         def shutdown_server():
             try:
-                self.server.close()
+                self.stop_accepting()
                 return jsonify({'message': 'Server shutdown initiated'})
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
 
     def get_memory_usage(self):
-        import psutil
-        process = psutil.Process()
-        return process.memory_info().rss
+        return self.metrics.latest().get('memory_usage', 0)
 
     def get_cpu_usage(self):
-        import psutil
-        return psutil.cpu_percent()
+        return self.metrics.latest().get('cpu_usage', 0.0)
+
+    def collect_metrics(self):
+        """One monitoring sample; only the sampler thread calls this"""
+        process = self.process
+        with process.oneshot():
+            memory_usage = process.memory_info().rss
+            process_cpu = process.cpu_percent(None)
+            threads = process.num_threads()
+            open_fds = process.num_fds() if hasattr(process, 'num_fds') else process.num_handles()
+        totals = self.worker_totals()
+        return {
+            'memory_usage': memory_usage,
+            'cpu_usage': psutil.cpu_percent(None),
+            'process_cpu': process_cpu,
+            'threads': threads,
+            'open_fds': open_fds,
+            'connections': totals['connections'],
+            'players': totals['players'],
+            'waiting_players': totals['waiting_players'],
+            'workers': totals['workers'],
+            'lobbies': self.lobby_manager.lobby_count(),
+            'matches': self.game_server.match_count(),
+            'active_matches': self.game_server.active_match_count(),
+            'uptime': time.time() - self.start_time if hasattr(self, 'start_time') else 0,
+            'admission': self.admission.stats(),
+            'reaper': self.reaper.stats()
+        }
+
+    def worker_totals(self):
+        """Connection and player counts of the whole server.
+
+        Only worker 0 serves the API, so in worker mode the other workers'
+        counts are added from their last report to the lobby store. Workers
+        that stopped reporting are left out.
+        """
+        with self.sessions_lock:
+            connections = len(self.sessions)
+        totals = {
+            'connections': connections,
+            'players': len(self.player_clients),
+            'waiting_players': len(self.waiting_players),
+            'workers': 1
+        }
+        if not self.lobby_store:
+            return totals
+        stale = time.time() - 3 * SERVER_CONFIG['worker_stats_interval']
+        try:
+            reports = self.lobby_store.worker_stats()
+        except Exception as e:
+            logging.error(f"Cannot read worker stats: {e}")
+            return totals
+        for report in reports:
+            if report['worker_id'] != self.worker_id and report['updated_at'] >= stale:
+                totals['workers'] += 1
+                for field in ('connections', 'players', 'waiting_players'):
+                    totals[field] += report.get(field, 0)
+        return totals
 
     def get_player_team(self, player_id):
-        for team_name, team in self.teams.items():
-            if player_id in team.values():
-                return team_name
-        return None
+        slot = self.player_slots.get(player_id)
+        return slot[0] if slot else None
 
     def get_player_position(self, player_id):
-        for team in self.teams.values():
-            for position, pid in team.items():
+        slot = self.player_slots.get(player_id)
+        return slot[1] if slot else None
+
+    def get_player_lobby(self, player_id):
+        return self.lobby_manager.get_lobby(self.player_lobbies.get(player_id))
+
+    def release_player_slot(self, player_id):
+        """Drop a player's slot from the index and free the lobby position it holds"""
+        slot = self.player_slots.pop(player_id, None)
+        lobby = self.get_player_lobby(player_id)
+        if slot and lobby and lobby.release_position(player_id):
+            logging.info(f"Player {player_id} removed from position {slot[1]} in lobby {lobby.lobby_id}")
+
+    def leave_lobby(self, player_id):
+        """Take a player out of their lobby, dropping the lobby once it is empty"""
+        self.release_player_slot(player_id)
+        lobby_id = self.player_lobbies.pop(player_id, None)
+        lobby = self.lobby_manager.get_lobby(lobby_id)
+        if lobby:
+            lobby.remove_player(player_id)
+            self.lobby_manager.remove_lobby_if_empty(lobby_id)
+
+    def forget_match_players(self, match_id):
+        """Remove every participant of a match from the player -> match index"""
+        match = self.game_server.get_match(match_id)
+        if not match:
+            return
+        for pid in list(match['home_team'].values()) + list(match['away_team'].values()):
+            if self.player_matches.get(pid) == match_id:
+                del self.player_matches[pid]
+                self.player_slots.pop(pid, None)
+
+    def match_slot(self, match, player_id):
+        """The (team, position) a player plays in a match, None if not in its lineups"""
+        for team in ('home', 'away'):
+            for position, pid in match[f'{team}_team'].items():
                 if pid == player_id:
-                    return position
+                    return team, position
         return None
 
-    def start_api_server(self):
+    def start_api_server(self, api_fd=None):
         # Load SSL configuration
         ssl_context = None
         try:
@@ -426,16 +1241,23 @@ class TeamLobbyServer:
             ssl_context = None
 
         self.api_thread = threading.Thread(
-            target=self.api.run,
-            kwargs={
-                'host': self.host,
-                'port': self.port,
-                'ssl_context': ssl_context
-            }
+            target=self.run_api_server,
+            args=(ssl_context, api_fd)
         )
         self.api_thread.daemon = True
         self.api_thread.start()
 
+    def run_api_server(self, ssl_context, fd=None):
+        """Serve the Flask API; fd is a listening socket inherited on a graceful restart"""
+        try:
+            api_config = SERVER_CONFIG['api_server']
+            self.api_server = create_wsgi_server(self.host, self.api_port, self.api, api_config['mode'], api_config,
+                                                 ssl_context=ssl_context, fd=fd)
+        except (OSError, SystemExit) as e:  # werkzeug exits when the port is taken
+            logging.error(f"API server cannot listen on {self.host}:{self.api_port}: {e}")
+            return
+        self.api_server.serve_forever()
+
     def init_mdns(self):
         self.zeroconf = Zeroconf()
         self.service_info = ServiceInfo(
@@ -474,227 +1296,700 @@ class TeamLobbyServer:
             raise
 
     def handle_client(self, client, address):
-        player_id = None
+        connection = QueuedConnection(
+            client,
+            self.send_pump,
+            self.send_queue_size,
+            self.slow_consumer_policy,
+            self.outbound_stats,
+            name=f"{address[0]}:{address[1]}"
+        )
+        session = ClientSession(connection, address, self.create_frame_decoder(), self.admission.message_bucket())
+        with self.sessions_lock:
+            self.sessions.add(session)
+        self.reaper.register(session)
         try:
-            while True:
-                data = client.recv(1024)
+            while not session.closing and session.decoder.recv_from(client):
+                self.reaper.touch(session)
+                self.process_client_data(session)
+        except FrameError as e:
+            logging.warning(f"Dropping client {address}: {e}")
+        except Exception as e:
+            logging.error(f"Client error {address}: {e}")
+        finally:
+            self.reaper.unregister(session)
+            if self.owns_player(session):
+                self.handle_client_disconnect(session.player_id)
+            connection.close()
+            self.admission.release()
+            with self.sessions_lock:
+                self.sessions.discard(session)
+
+    async def handle_client_async(self, reader, writer):
+        """Event-loop counterpart of handle_client used by the asyncio engine"""
+        accepted = time.perf_counter()
+        address = writer.get_extra_info('peername')
+        reason = self.admission.admit(address[0])
+        if reason:
+            CONNECTIONS_REJECTED.inc()
+            logging.warning(f"Rejected connection from {address}: {reason}")
+            writer.write(self.rejection_frame(reason))
+            writer.close()
+            return
+        client = AsyncClient(writer, OutboundQueue(self.send_queue_size, self.slow_consumer_policy, self.outbound_stats))
+        session = ClientSession(client, address, self.create_frame_decoder(), self.admission.message_bucket())
+        with self.sessions_lock:
+            self.sessions.add(session)
+        self.reaper.register(session)
+        CONNECTIONS_ACCEPTED.inc()
+        ACCEPT_SECONDS.observe(time.perf_counter() - accepted)
+        logging.info(f"New connection from {address}")
+        try:
+            while not session.closing:
+                data = await reader.read(NETWORK_CONFIG['buffer_size'])
                 if not data:
                     break
-                    
-                # Validate JSON structure
-                # Decode incoming data
-                decoded_data = data.decode().strip()
-                if not decoded_data:
-                    error_response = {
-                        'error': 'Empty request',
-                        'details': 'No data received'
-                    }
-                    client.send(json.dumps(error_response).encode())
-                    continue
-
-                # Handle both HTTP and JSON protocols
-                if decoded_data.startswith(('GET ', 'POST ', 'PUT ', 'DELETE ')):
-                    logging.info(f"HTTP request from {address}: {decoded_data.splitlines()[0]}")
-                    try:
-                        # Parse HTTP request
-                        headers, body = decoded_data.split('\r\n\r\n', 1)
-                        if body:
-                            message = json.loads(body)
-                            if message['type'] == 'join_lobby':
-                                self.handle_join_lobby(client, message)
-                            elif message['type'] == 'select_position':
-                                self.handle_position_select(client, message)
-                            elif message['type'] == 'ready':
-                                self.check_match_start(client, message)
-                            elif message['type'] == 'reconnect':
-                                self.handle_reconnect(client, message)
-                            else:
-                                raise ValueError("Unknown message type")
-                            
-                            response = "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n"
-                            response += json.dumps({'status': 'success'})
-                            client.send(response.encode())
-                            continue
-                    except Exception as e:
-                        response = "HTTP/1.1 400 Bad Request\r\nContent-Type: application/json\r\n\r\n"
-                        response += json.dumps({
-                            'error': 'Invalid request',
-                            'details': str(e)
-                        })
-                        client.send(response.encode())
-                        continue
-                
-                # Handle JSON messages
-                try:
-                    message = json.loads(decoded_data)
-                    if not isinstance(message, dict):
-                        raise ValueError("Message must be a JSON object")
-                    if 'type' not in message:
-                        raise ValueError("Missing required 'type' field")
-                        
-                    # Validate common fields
-                    if 'player_id' in message and not isinstance(message['player_id'], str):
-                        raise ValueError("player_id must be a string")
-                        
-                    if message['type'] == 'join_lobby':
-                        if 'player_id' not in message:
-                            raise ValueError("Missing player_id in join_lobby")
-                        player_id = message['player_id']
-                        self.handle_join_lobby(client, message)
-                    elif message['type'] == 'select_position':
-                        self.handle_position_select(client, message)
-                    elif message['type'] == 'ready':
-                        self.check_match_start(client, message)
-                    elif message['type'] == 'reconnect':
-                        if 'player_id' not in message:
-                            raise ValueError("Missing player_id in reconnect")
-                        player_id = message['player_id']
-                        self.handle_reconnect(client, message)
-                    else:
-                        raise ValueError("Unknown message type")
-                        
-                except json.JSONDecodeError as e:
-                    error_response = {
-                        'error': 'Invalid JSON',
-                        'details': str(e),
-                        'received': decoded_data[:100]  # Truncate long messages
-                    }
-                    client.send(json.dumps(error_response).encode())
-                    continue
-                except ValueError as e:
-                    error_response = {
-                        'error': 'Invalid message format',
-                        'details': str(e),
-                        'received': decoded_data[:100]  # Truncate long messages
-                    }
-                    client.send(json.dumps(error_response).encode())
-                    continue
+                self.reaper.touch(session)
+                session.decoder.feed(data)
+                self.process_client_data(session)
+        except FrameError as e:
+            logging.warning(f"Dropping client {address}: {e}")
         except Exception as e:
             logging.error(f"Client error {address}: {e}")
         finally:
-            if player_id:
-                self.handle_client_disconnect(player_id)
+            self.reaper.unregister(session)
+            if self.owns_player(session):
+                self.handle_client_disconnect(session.player_id)
+            client.close()
+            self.admission.release()
+            with self.sessions_lock:
+                self.sessions.discard(session)
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    def rejection_frame(self, reason):
+        """Error frame sent to a connection refused by admission control"""
+        return self.encode_message({
+            'error': 'Connection rejected',
+            'details': reason
+        })
+
+    def reject_connection(self, client, address, reason):
+        """Answer a refused connection with one error frame and close it straight away"""
+        logging.warning(f"Rejected connection from {address}: {reason}")
+        try:
+            client.setblocking(False)
+            client.send(self.rejection_frame(reason))
+        except OSError:
+            pass
+        finally:
             client.close()
 
+    def create_frame_decoder(self):
+        return FrameDecoder(
+            self.framing,
+            buffer_size=NETWORK_CONFIG['buffer_size'],
+            max_frame_size=NETWORK_CONFIG['max_frame_size']
+        )
+
+    def encode_message(self, message, client=None):
+        """Encode a message in the wire format of the client it is meant for"""
+        return (getattr(client, 'wire', None) or self.wire).encode(message)
+
+    def send_message(self, client, message):
+        """Serialize a message and queue it as one frame"""
+        client.send(self.encode_message(message, client), message.get('type'))
+
+    def process_client_data(self, session):
+        """Handle everything buffered in a connection's frame decoder.
+
+        Shared by the threaded and asyncio engines. Records on the session the
+        player_id the connection identified itself with.
+        """
+        decoder = session.decoder
+        if session.http is None:
+            head = decoder.peek(8)
+            if len(head) < 8 and any(method.startswith(head) for method in HTTP_METHODS):
+                return  # Too short to tell HTTP from a framed message yet
+            if head.startswith(HTTP_METHODS):
+                # The connection speaks HTTP from now on
+                session.http = HTTPLobbyClient(session.client, self.framing, self.send_queue_size)
+        if session.http is not None:
+            self.process_http_data(session)
+            return
+
+        for frame in decoder.frames():
+            self.process_message_data(session, frame)
+
+    def process_http_data(self, session):
+        """Feed received bytes to the connection's HTTP parser and answer each complete request"""
+        http = session.http
+        http.parser.feed(session.decoder.take_all())
+        try:
+            for http_request in http.parser.requests():
+                if self.draining:
+                    http.respond(503, self.restart_notice(), keep_alive=False)
+                    session.closing = True
+                    return
+                if not self.admission.allow_message(session.bucket):
+                    http.respond(429, {'error': 'Rate limited', 'details': 'Too many requests'}, http_request.keep_alive)
+                else:
+                    self.process_http_request(session, http_request)
+                if not http_request.keep_alive:
+                    session.closing = True
+                    return
+        except HTTPParseError as e:
+            logging.warning(f"Bad HTTP request from {session.address}: {e}")
+            http.respond(e.status, {'error': 'Invalid request', 'details': str(e)}, keep_alive=False)
+            session.closing = True
+
+    def process_http_request(self, session, http_request):
+        logging.info(f"HTTP request from {session.address}: {http_request.method} {http_request.target}")
+        http = session.http
+        try:
+            if not http_request.body:
+                raise ValueError("Missing request body")
+            message = json.loads(http_request.body)
+            if self.dispatcher.dispatch(http, message).identifies_player:
+                self.identify_session(session, message['player_id'])
+            status, payload = 200, {'status': 'success'}
+        except Exception as e:
+            status, payload = 400, {
+                'error': 'Invalid request',
+                'details': str(e)
+            }
+        # Replies the handlers sent, plus anything pushed since the last request
+        payload['messages'] = http.take_messages()
+        http.respond(status, payload, http_request.keep_alive)
+
+    def process_message_data(self, session, frame):
+        """Handle one framed message in the connection's wire format"""
+        client = session.client
+        if not self.admission.allow_message(session.bucket):
+            self.send_message(client, {
+                'error': 'Rate limited',
+                'details': 'Too many messages'
+            })
+            return
+        if self.draining:
+            self.send_message(client, self.restart_notice())
+            return
+        frame = bytes(frame)
+        if not frame.strip():
+            self.send_message(client, {
+                'error': 'Empty request',
+                'details': 'No data received'
+            })
+            return
+
+        try:
+            started = time.perf_counter()
+            message = (client.wire or self.wire).decode(frame)
+            PARSE_SECONDS.observe(time.perf_counter() - started)
+            if not session.negotiated:
+                session.negotiated = True
+                if self.negotiate_wire_format(session, message):
+                    return
+            if self.dispatcher.dispatch(client, message).identifies_player:
+                self.identify_session(session, message['player_id'])
+        except json.JSONDecodeError as e:
+            error_response = {
+                'error': 'Invalid JSON',
+                'details': str(e),
+                'received': frame[:100].decode('utf-8', 'replace')  # Truncate long messages
+            }
+            self.send_message(client, error_response)
+        except ValueError as e:
+            error_response = {
+                'error': 'Invalid message format',
+                'details': str(e),
+                'received': frame[:100].decode('utf-8', 'replace')  # Truncate long messages
+            }
+            self.send_message(client, error_response)
+
+    def identify_session(self, session, player_id):
+        session.player_id = player_id
+        self.reaper.established(session)
+
+    def owns_player(self, session):
+        """Whether the session is still the player's current connection.
+
+        A reconnect replaces the player's client, so the old session closing
+        later must not tear down the player's lobby place or match.
+        """
+        client = self.player_clients.get(session.player_id)
+        return client is not None and client in (session.client, session.http)
+
+    def reap_session(self, session, idle):
+        """Close a connection the reaper found idle; its reader frees the player's lobby place"""
+        if session.player_id and not self.owns_player(session):
+            logging.info(f"Closing replaced connection {session.address} of player {session.player_id}, idle for {idle:.0f}s")
+        else:
+            logging.warning(f"Closing connection {session.address} of player {session.player_id}, idle for {idle:.0f}s")
+        self.call_in_io_thread(session.client.abort)
+
+    def handle_ping(self, client, message):
+        self.send_message(client, {'type': 'pong'})
+
+    def negotiate_wire_format(self, session, message):
+        """Apply the 'wire_formats' preference list of a connection's first message.
+
+        The acknowledgement still goes out in JSON; everything after it uses the
+        chosen format in both directions. Returns True if the message carried
+        nothing but the negotiation.
+        """
+        wire = negotiate_first_message(message, self.framing)
+        if wire is None:
+            return False
+        self.send_message(session.client, wire_format_ack(wire))
+        session.client.wire = wire
+        session.decoder.switch_framing(wire.framing)
+        logging.info(f"Client {session.address} uses the {wire.name} wire format")
+        return message.get('type') == 'wire_format'
+
+    def register_message_handlers(self):
+        """Map each lobby message type to its handler and required fields"""
+        lobby_id = (str, int)
+        self.dispatcher.register('join_lobby', self.handle_join_lobby,
+                                 required={'player_id': str}, optional={'lobby_id': lobby_id},
+                                 identifies_player=True)
+        self.dispatcher.register('select_position', self.handle_position_select,
+                                 required={'player_id': str, 'team': str, 'position': str})
+        self.dispatcher.register('ready', self.check_match_start,
+                                 optional={'player_id': str, 'lobby_id': lobby_id})
+        self.dispatcher.register('reconnect', self.handle_reconnect,
+                                 required={'player_id': str}, identifies_player=True)
+        self.dispatcher.register('ping', self.handle_ping)
+
     def handle_client_disconnect(self, player_id):
+        if self.draining:
+            return  # Lobby state now belongs to the successor process
         # Remove player from waiting list
-        self.waiting_players = [p for p in self.waiting_players if p['player_id'] != player_id]
+        self.waiting_players.pop(player_id, None)
         
-        # Remove player from team positions
-        for team in self.teams.values():
-            for position, pid in list(team.items()):
-                if pid == player_id:
-                    del team[position]
-                    logging.info(f"Player {player_id} removed from position {position}")
+        # Remove player from their lobby and team position
+        if player_id in self.player_lobbies:
+            self.leave_lobby(player_id)
+        else:
+            self.release_player_slot(player_id)
+        self.player_clients.pop(player_id, None)
+        if self.lobby_store:
+            self.lobby_store.drop_session(player_id)
         
-        # Check if any matches need to be ended due to player disconnection
-        for match_id, match in self.game_server.matches.items():
-            if match['status'] == 'active':
-                if player_id in match['home_team'].values() or player_id in match['away_team'].values():
-                    logging.warning(f"Player {player_id} disconnected from active match {match_id}")
-                    self.game_server.end_match(match_id)
+        # End the player's match if it is still running
+        match_id = self.player_matches.pop(player_id, None)
+        match = self.game_server.get_match(match_id)
+        if match and match['status'] == 'active':
+            logging.warning(f"Player {player_id} disconnected from active match {match_id}")
+            self.game_server.end_match(match_id)
+            self.forget_match_players(match_id)
+        self.bump_state_version()
 
     def handle_reconnect(self, client, message):
         player_id = message['player_id']
         # Check if player was in a match
-        for match_id, match in self.game_server.matches.items():
-            if match['status'] == 'active':
-                if player_id in match['home_team'].values() or player_id in match['away_team'].values():
-                    # Reconnect player to their position
-                    for team in self.teams.values():
-                        for position, pid in team.items():
-                            if pid == player_id:
-                                response = {
-                                    'type': 'reconnect_success',
-                                    'match_id': match_id,
-                                    'team': 'home' if player_id in match['home_team'].values() else 'away',
-                                    'position': position
-                                }
-                                client.send(json.dumps(response).encode())
-                                logging.info(f"Player {player_id} reconnected to match {match_id}")
-                                return
-        # If no active match found
+        match_id = self.player_matches.get(player_id)
+        match = self.game_server.get_match(match_id)
+        slot = self.match_slot(match, player_id) if match else None
+        if match and match['status'] == 'active' and slot:
+            # Reconnect player to their position
+            team, position = slot
+            self.player_clients[player_id] = client
+            self.restored_players.discard(player_id)
+            self.register_session(player_id)
+            self.bump_state_version()
+            response = {
+                'type': 'reconnect_success',
+                'match_id': match_id,
+                'team': team,
+                'position': position
+            }
+            self.send_message(client, response)
+            logging.info(f"Player {player_id} reconnected to match {match_id}")
+            return
+        # Still holding a lobby place, e.g. restored after a graceful restart
+        lobby = self.get_player_lobby(player_id)
+        if lobby is not None and lobby.set_player_data(player_id, {'client': client}):
+            if player_id in self.waiting_players:
+                self.waiting_players[player_id]['client'] = client
+            self.player_clients[player_id] = client
+            self.restored_players.discard(player_id)
+            self.register_session(player_id)
+            self.bump_state_version()
+            response = {
+                'type': 'reconnect_success',
+                'lobby_id': lobby.lobby_id,
+                'team': self.get_player_team(player_id),
+                'position': self.get_player_position(player_id)
+            }
+            self.send_message(client, response)
+            logging.info(f"Player {player_id} reconnected to lobby {lobby.lobby_id}")
+            return
+        # If no active match or lobby found
         response = {'type': 'reconnect_failed'}
-        client.send(json.dumps(response).encode())
+        self.send_message(client, response)
             
     def handle_join_lobby(self, client, message):
         player_id = message['player_id']
-        self.waiting_players.append({
+        lobby_id = str(message.get('lobby_id') or MATCHMAKING_CONFIG['default_lobby_id'])
+        if self.player_lobbies.get(player_id, lobby_id) != lobby_id:
+            self.leave_lobby(player_id)
+        lobby = self.lobby_manager.join_lobby(lobby_id, player_id, {'client': client}, self.game_server)
+        if lobby is None:
+            self.bump_state_version()  # may have left its previous lobby
+            self.send_message(client, {'type': 'lobby_full', 'lobby_id': lobby_id})
+            return
+        self.register_session(player_id)
+        self.player_lobbies[player_id] = lobby_id
+        
+        # Re-joining moves the player to the back of the queue
+        self.waiting_players.pop(player_id, None)
+        self.waiting_players[player_id] = {
             'client': client,
             'player_id': player_id
-        })
+        }
+        self.player_clients[player_id] = client
+        self.bump_state_version()
         response = {
             'type': 'lobby_joined',
+            'lobby_id': lobby_id,
             'available_positions': self.positions
         }
-        client.send(json.dumps(response).encode())
+        self.send_message(client, response)
 
     def handle_position_select(self, client, message):
         player_id = message['player_id']
         position = message['position']
         team = message['team']
         
-        if team in self.teams and position in self.positions:
-            if position not in self.teams[team]:
-                self.teams[team][position] = player_id
+        lobby = self.get_player_lobby(player_id)
+        if lobby is None:
+            response = {'type': 'not_in_lobby'}
+        elif team in lobby.positions and position in self.positions:
+            # A player holds at most one lobby position at a time
+            if lobby.claim_position(player_id, team, position):
+                self.player_slots[player_id] = (team, position)
+                self.bump_state_version()
                 response = {'type': 'position_confirmed'}
             else:
                 response = {'type': 'position_taken'}
-        client.send(json.dumps(response).encode())
+        else:
+            response = {'type': 'position_invalid'}
+        self.send_message(client, response)
 
     def broadcast_match_start(self, match_id):
-        match_info = self.game_server.matches[match_id]
+        with BROADCAST_SECONDS.time():
+            self.send_match_start(match_id)
+
+    def send_match_start(self, match_id):
+        match_info = self.game_server.get_match(match_id)
         response = {
             'type': 'match_started',
             'match_id': match_id,
             'home_team': match_info['home_team'],
-            'away_team': match_info['away_team']
+            'away_team': match_info['away_team'],
+            'ports': match_info.get('ports')
         }
-        for player in self.waiting_players:
+        # Serialize once per wire format in use, then enqueue the same frame for every participant
+        payloads = {}
+        participants = list(match_info['home_team'].values()) + list(match_info['away_team'].values())
+        for player_id in participants:
+            player = self.waiting_players.get(player_id)
+            if not player or player['client'] is None:
+                # Connected to another worker, which delivers it from the store
+                if self.lobby_store:
+                    self.lobby_store.post(player_id, response)
+                continue
+            client = player['client']
+            wire = getattr(client, 'wire', None) or self.wire
             try:
-                player['client'].send(json.dumps(response).encode())
+                if wire not in payloads:
+                    payloads[wire] = wire.encode(response)
+                client.send(payloads[wire], response['type'])
             except Exception as e:
-                logging.error(f"Failed to send match start to player {player['player_id']}: {e}")
+                logging.error(f"Failed to send match start to player {player_id}: {e}")
 
     def check_match_start(self, client, message):
         """Check if both teams have 11 players and start match"""
-        if len(self.teams['home']) >= 11 and len(self.teams['away']) >= 11:
-            # Verify all positions are filled
-            home_ready = all(pos in self.teams['home'] for pos in self.positions)
-            away_ready = all(pos in self.teams['away'] for pos in self.positions)
-            
-            if home_ready and away_ready:
-                # Create match and assign ports
-                match_id = self.game_server.create_match(self.teams['home'], self.teams['away'])
-                
-                # Assign unique ports for this match
-                match_ports = {
-                    'home': self.udp_port1,
-                    'away': self.udp_port2
-                }
-                
-                # Update match info with ports
-                self.game_server.matches[match_id]['ports'] = match_ports
-                
-                # Broadcast match start with port info
-                self.broadcast_match_start(match_id)
-                
-                # Clear teams for next match
-                self.teams = {'home': {}, 'away': {}}
+        lobby = self.get_player_lobby(message.get('player_id')) or self.lobby_manager.get_lobby(
+            str(message.get('lobby_id') or MATCHMAKING_CONFIG['default_lobby_id']))
+        if lobby is None:
+            return
+        
+        # Verify all positions are filled; the lobby is emptied for its next match
+        lineups = lobby.take_lineups(self.positions)
+        if not lineups:
+            return
+        
+        # Create match and assign ports; workers draw ids from the shared store
+        match_id = self.game_server.create_match(
+            lineups['home'], lineups['away'],
+            self.lobby_store.next_match_id() if self.lobby_store else None
+        )
+        
+        # Lease a unique port pair for this match
+        match_ports = self.port_pool.lease(match_id)
+        if match_ports is None:
+            logging.error(f"UDP port pool exhausted, match {match_id} falls back to the shared ports")
+            match_ports = {
+                'home': self.udp_port1,
+                'away': self.udp_port2
+            }
+        
+        # Update match info with ports; the match is ended, and its lease
+        # released, when a participant disconnects
+        self.game_server.set_ports(match_id, match_ports)
+        self.game_server.start_match(match_id)
+        
+        participants = list(lineups['home'].values()) + list(lineups['away'].values())
+        for pid in participants:
+            self.player_matches[pid] = match_id
+            self.player_lobbies.pop(pid, None)
+            self.player_slots.pop(pid, None)  # the lineup now holds it
+        self.lobby_manager.remove_lobby_if_empty(lobby.lobby_id)
+        
+        # Broadcast match start with port info
+        self.broadcast_match_start(match_id)
+        
+        # Participants are no longer waiting for a match
+        for pid in participants:
+            self.waiting_players.pop(pid, None)
+        self.bump_state_version()
+        MATCHES_STARTED.inc()
+        logging.info(f"Match {match_id} started from lobby {lobby.lobby_id}")
 
     def start_autosave(self):
         def autosave_loop():
             while True:
-                time.sleep(300)  # Save every 5 minutes
-                self.game_server.save_matches()
+                time.sleep(SERVER_CONFIG['match_compact_interval'])
+                if not self.handed_off:
+                    self.game_server.archive_matches(SERVER_CONFIG['match_archive_after'])
+                    self.game_server.save_matches()
         
         self.autosave_thread = threading.Thread(target=autosave_loop, daemon=True)
         self.autosave_thread.start()
 
+    def register_session(self, player_id):
+        """In worker mode, record which worker a player's connection is on"""
+        if self.lobby_store:
+            self.lobby_store.register_session(player_id)
+
+    def worker_stats(self):
+        with self.sessions_lock:
+            connections = len(self.sessions)
+        return {
+            'connections': connections,
+            'players': len(self.player_clients),
+            'waiting_players': len(self.waiting_players),
+            'matches': self.game_server.match_count(),
+            'active_matches': self.game_server.active_match_count(),
+            'messages': sum(route['count'] for route in self.dispatcher.stats()['types'].values()),
+            'admission': self.admission.stats(),
+            'memory_usage': self.get_memory_usage()
+        }
+
+    def deliver_remote_message(self, player_id, message):
+        """Deliver a message another worker posted for one of this worker's players"""
+        if message.get('type') == 'match_started':
+            # The match was started by another worker out of a shared lobby
+            self.player_matches[player_id] = message['match_id']
+            self.player_lobbies.pop(player_id, None)
+            self.player_slots.pop(player_id, None)
+            self.waiting_players.pop(player_id, None)
+            self.bump_state_version()
+        client = self.player_clients.get(player_id)
+        if client is not None:
+            self.call_in_io_thread(self.send_message, client, message)
+
+    def start_worker_sync(self):
+        """Poll the shared store for messages to this worker and publish its stats"""
+        def sync_loop():
+            interval = SERVER_CONFIG['worker_stats_interval']
+            next_report = 0
+            while self.accepting:
+                try:
+                    for player_id, message in self.lobby_store.fetch_outbox():
+                        self.deliver_remote_message(player_id, message)
+                    if time.monotonic() >= next_report:
+                        self.lobby_store.report_stats(self.worker_stats())
+                        next_report = time.monotonic() + interval
+                except Exception as e:
+                    logging.error(f"Worker sync failed: {e}")
+                time.sleep(0.1)
+
+        self.worker_sync_thread = threading.Thread(target=sync_loop, name='worker-sync', daemon=True)
+        self.worker_sync_thread.start()
+
+    def restart_notice(self):
+        return {
+            'type': 'server_restarting',
+            'details': 'Reconnect to resume your lobby'
+        }
+
+    def snapshot_state(self):
+        """Lobby, team and waiting-player state handed to the successor on a graceful restart"""
+        return {
+            'lobbies': self.lobby_manager.snapshot(),
+            'waiting_players': list(self.waiting_players),
+            'player_lobbies': dict(self.player_lobbies),
+            'player_slots': dict(self.player_slots),
+            'player_matches': dict(self.player_matches),
+            'udp_leases': self.port_pool.snapshot()
+        }
+
+    def restore_state(self, state):
+        """Apply a snapshot from the previous process; its players must reconnect within the grace period"""
+        self.lobby_manager.restore(state['lobbies'], self.game_server)
+        self.player_lobbies.update(state['player_lobbies'])
+        self.player_slots.update({pid: tuple(slot) for pid, slot in state['player_slots'].items()})
+        self.player_matches.update(state['player_matches'])
+        for player_id in state['waiting_players']:
+            self.waiting_players[player_id] = {
+                'client': None,
+                'player_id': player_id
+            }
+        self.port_pool.restore(state['udp_leases'])
+        self.restored_players = set(self.player_lobbies) | set(self.player_matches)
+        self.bump_state_version()
+        grace = SERVER_CONFIG['restart_reconnect_grace']
+        timer = threading.Timer(grace, self.expire_restored_players)
+        timer.daemon = True
+        timer.start()
+        logging.info(f"Restored {len(self.restored_players)} players, waiting {grace}s for them to reconnect")
+
+    def expire_restored_players(self):
+        for player_id in list(self.restored_players):
+            logging.warning(f"Player {player_id} did not reconnect after the restart")
+            self.handle_client_disconnect(player_id)
+        self.restored_players.clear()
+
+    def graceful_restart(self):
+        """Hand the listening sockets and lobby state to a new process, then drain this one.
+
+        The listening sockets stay open throughout, so connections arriving
+        while the successor starts up wait in the kernel backlog instead of
+        being refused.
+        """
+        with self.restart_lock:
+            if self.draining:
+                return
+            self.draining = True
+        snapshot_path = SERVER_CONFIG['restart_snapshot_path']
+        try:
+            self.zeroconf.unregister_all_services()
+        except Exception as e:
+            logging.warning(f"MDNS unregistration failed: {e}")
+        try:
+            self.game_server.save_matches()
+            write_snapshot(snapshot_path, self.snapshot_state())
+            sockets = {'lobby': self.server}
+            if self.api_server is not None:
+                sockets['api'] = self.api_server.socket
+            successor = spawn_successor(sockets, snapshot_path)
+        except Exception as e:
+            logging.error(f"Graceful restart failed, this process keeps serving: {e}")
+            self.draining = False
+            return
+        self.handed_off = True
+        logging.info(f"Listening sockets handed to process {successor.pid}, draining connections")
+        self.stop_accepting()
+        if self.api_server is not None:
+            self.api_server.shutdown()
+            self.api_server.server_close()
+        self.events.stop()  # subscribers reconnect to the successor
+        self.drain_sessions(SERVER_CONFIG['restart_drain_timeout'])
+
+    def stop_accepting(self):
+        self.accepting = False
+        if self.loop is not None and self.async_server is not None:
+            self.loop.call_soon_threadsafe(self.async_server.close)
+        else:
+            self._accept_wake_w.send(b'\0')
+
+    def drain_sessions(self, timeout):
+        """Tell connected clients to reconnect, then cut whoever is still here after timeout"""
+        with self.sessions_lock:
+            sessions = list(self.sessions)
+        notice = self.restart_notice()
+        for session in sessions:
+            if session.http is None:
+                self.call_in_io_thread(self.send_message, session.client, notice)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.sessions_lock:
+                if not self.sessions:
+                    break
+            time.sleep(0.1)
+        with self.sessions_lock:
+            remaining = list(self.sessions)
+        for session in remaining:
+            self.call_in_io_thread(session.client.abort)
+        logging.info(f"Drained {len(sessions)} connections, {len(remaining)} had to be closed")
+
+    def call_in_io_thread(self, callback, *args):
+        """AsyncClients may only be touched from the event loop thread"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(callback, *args)
+        else:
+            callback(*args)
+
+    def serve_threaded(self):
+        # Accept through a selector so stop_accepting() can wake this loop; the
+        # socket is non-blocking as a successor process may accept from it too
+        self.server.setblocking(False)
+        selector = selectors.DefaultSelector()
+        selector.register(self.server, selectors.EVENT_READ)
+        selector.register(self._accept_wake_r, selectors.EVENT_READ)
+        while self.accepting:
+            for key, _ in selector.select():
+                if key.fileobj is not self.server:
+                    continue
+                try:
+                    client, address = self.server.accept()
+                except (BlockingIOError, InterruptedError):
+                    continue
+                accepted = time.perf_counter()
+                client.setblocking(True)
+                reason = self.admission.admit(address[0])
+                if reason:
+                    CONNECTIONS_REJECTED.inc()
+                    self.reject_connection(client, address, reason)
+                    continue
+                logging.info(f"New connection from {address}")
+                try:
+                    threading.Thread(target=self.handle_client, args=(client, address)).start()
+                except RuntimeError as e:
+                    logging.error(f"Cannot start handler for {address}: {e}")
+                    self.admission.release()
+                    client.close()
+                    continue
+                CONNECTIONS_ACCEPTED.inc()
+                ACCEPT_SECONDS.observe(time.perf_counter() - accepted)
+        selector.close()
+
+    async def serve_async(self):
+        self.loop = asyncio.get_running_loop()
+        self.async_server = await asyncio.start_server(self.handle_client_async, sock=self.server)
+        try:
+            await self.async_server.serve_forever()
+        except asyncio.CancelledError:
+            if self.accepting:
+                raise
+        # Stopped by shutdown or a handoff: finish serving the connections still open
+        while self.handed_off and self.sessions:
+            await asyncio.sleep(0.1)
+
     def start(self):
         try:
-            # Try to register MDNS with retry logic
-            max_retries = 3
+            # Listening sockets passed down by a gracefully restarting predecessor
+            inherited = inherited_sockets()
+            self.metrics.start()
+            self.events.start()
+            
+            # Try to register MDNS with retry logic; workers advertise the port once
+            max_retries = 3 if not self.worker_id else 0
             for attempt in range(max_retries):
                 try:
                     self.register_mdns()
@@ -714,30 +2009,50 @@ class TeamLobbyServer:
                 logging.error(f"Socket creation failed: {e}")
                 raise
             
-            # Setup and start API server
+            # Setup and start API server; in worker mode worker 0 serves it for
+            # all of them, answering lobby-wide questions from the shared stores
             self.setup_api_endpoints()
-            self.start_api_server()
+            if not self.worker_id:
+                api_socket = inherited.get('api')
+                self.start_api_server(api_socket.fileno() if api_socket else None)
             
             # Start TCP server with proper cleanup
             try:
-                # Check if port is available
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                try:
-                    sock.bind((self.host, self.port))
-                except OSError as e:
-                    logging.error(f"Port {self.port} is already in use: {e}")
-                    raise
+                if 'lobby' in inherited:
+                    self.server = inherited['lobby']
+                    logging.info(f"Took over the lobby socket on {self.host}:{self.port}")
+                else:
+                    # Check if port is available
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                    if self.lobby_store:
+                        # Every worker binds the port; the kernel spreads connections over them
+                        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                    # Accepted connections inherit the keepalive probes that find dead peers
+                    enable_keepalive(sock, NETWORK_CONFIG['keepalive_idle'],
+                                     NETWORK_CONFIG['keepalive_interval'], NETWORK_CONFIG['keepalive_count'])
+                    try:
+                        sock.bind((self.host, self.port))
+                    except OSError as e:
+                        logging.error(f"Port {self.port} is already in use: {e}")
+                        raise
+                    
+                    self.server = sock
+                    self.server.listen(22)
                 
-                self.server = sock
-                self.server.listen(22)
+                # Lobby state handed over by the predecessor
+                snapshot_path = inherited_snapshot_path()
+                if snapshot_path:
+                    state = read_snapshot(snapshot_path)
+                    if state:
+                        self.restore_state(state)
                 print("\nPES server is running\n")
                 # Create proxy app for port 5740
                 proxy_app = Flask(__name__)
                 @proxy_app.route('/', defaults={'path': ''})
                 @proxy_app.route('/<path:path>')
                 def proxy(path):
-                    return redirect(f'http://{self.host}:{self.port}/api/{path}')
+                    return redirect(f'http://{self.host}:{self.api_port}/api/{path}')
                 
                 # Run both apps using DispatcherMiddleware
                 application = DispatcherMiddleware(self.api, {
@@ -745,15 +2060,21 @@ class TeamLobbyServer:
                 })
                 
                 print(f"Team Lobby Server running on {self.host}:{self.port}")
+                if not self.worker_id:
+                    print(f"API Server running on {self.host}:{self.api_port}")
                 print(f"Proxy Server running on {self.host}:{self.proxy_port}")
                 
                 # Start autosave thread
                 self.start_autosave()
+                self.reaper.start()
+                if self.lobby_store:
+                    self.start_worker_sync()
                 
-                while True:
-                    client, address = self.server.accept()
-                    logging.info(f"New connection from {address}")
-                    threading.Thread(target=self.handle_client, args=(client, address)).start()
+                logging.info(f"Serving lobby clients with the {self.io_engine} engine")
+                if self.io_engine == 'asyncio':
+                    asyncio.run(self.serve_async())
+                else:
+                    self.serve_threaded()
                     
             except PermissionError as pe:
                 logging.error(f"Permission denied for port {self.port}: {pe}")
@@ -769,12 +2090,32 @@ class TeamLobbyServer:
             if hasattr(self, 'server'):
                 self.server.close()
                 logging.info("Server socket closed")
-            self.game_server.save_matches()
+            # After a handoff the successor owns the match data
+            if not self.handed_off:
+                self.game_server.save_matches()
 
 if __name__ == "__main__":
-    server = TeamLobbyServer()
-    try:
+    parser = argparse.ArgumentParser(description='PES 2021 Team Play Lobby Server')
+    parser.add_argument('--engine', choices=TeamLobbyServer.IO_ENGINES,
+                        help="Client I/O engine (defaults to SERVER_CONFIG['io_engine'])")
+    parser.add_argument('--workers', type=int, default=SERVER_CONFIG['workers'],
+                        help="Worker processes sharing the lobby port (defaults to SERVER_CONFIG['workers'])")
+    args = parser.parse_args()
+    
+    def run_server(worker_id=None):
+        server = TeamLobbyServer(io_engine=args.engine, worker_id=worker_id, workers=args.workers)
         server.start()
+    
+    try:
+        if args.workers > 1:
+            if not reuseport_supported():
+                parser.error('--workers needs fork() and SO_REUSEPORT')
+            # Workers are forked before any of them creates threads
+            SQLiteLobbyStore.initialize(SERVER_CONFIG['lobby_store_path'])
+            print(f"Starting {args.workers} lobby workers")
+            run_workers(args.workers, run_server)
+        else:
+            run_server()
     except KeyboardInterrupt:
         print("\nServer shutting down...")
         logging.info("Server shutdown")